@@ -1,6 +1,7 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 from app.core.database import get_session
@@ -8,12 +9,18 @@ from app.core.auth import get_current_user
 from app.core.storage import minio_client
 from app.services.access_service import access_service
 from app.services.rbac_service import rbac_service
+from app.services.assertion_service import assertion_service
+from app.services.flakiness_service import flakiness_service
 from app.models import (
-    User, AuditLog, TestCase, TestCaseRead, TestCaseUpdate, TestSuite, TestRun, TestCaseResult
+    User, AuditLog, TestCase, TestCaseRead, TestCaseUpdate, TestSuite, TestRun, TestCaseResult,
+    TestCaseFlakiness, TestCaseFlakinessRead
 )
 
 router = APIRouter()
 
+class QuarantineUpdate(BaseModel):
+    quarantined: Optional[bool] = None # None returns the case to automatic quarantine
+
 @router.post("/suites/{suite_id}/cases", response_model=TestCaseRead)
 async def create_test_case(suite_id: int, case: TestCase, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
     suite = await session.get(TestSuite, suite_id)
@@ -29,6 +36,11 @@ async def create_test_case(suite_id: int, case: TestCase, session: AsyncSession
     if result.first():
         raise HTTPException(status_code=400, detail="Cannot add test case to a suite that contains sub-modules")
 
+    try:
+        case.steps = assertion_service.prepare_steps(case.steps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     case.test_suite_id = suite_id
     case.project_id = suite.project_id
     case.created_by_id = current_user.id
@@ -63,6 +75,11 @@ async def update_test_case(case_id: int, case_update: TestCaseUpdate, session: A
         raise HTTPException(status_code=403, detail="Permission denied: You cannot update test cases in this project")
 
     case_data = case_update.model_dump(exclude_unset=True)
+    if case_data.get("steps") is not None:
+        try:
+            case_data["steps"] = assertion_service.prepare_steps(case_data["steps"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     changes = {}
     for key, value in case_data.items():
         old_value = getattr(db_case, key)
@@ -85,6 +102,42 @@ async def update_test_case(case_id: int, case_update: TestCaseUpdate, session: A
         
     return db_case
 
+@router.get("/cases/{case_id}/flakiness", response_model=TestCaseFlakinessRead)
+async def get_test_case_flakiness(case_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    case = await session.get(TestCase, case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Test case not found")
+
+    if not await access_service.has_test_case_access(current_user.id, case_id, session):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    flakiness = await session.get(TestCaseFlakiness, case_id)
+    if not flakiness:
+        raise HTTPException(status_code=404, detail="No results recorded for this test case yet")
+    return flakiness_service.flakiness_read(flakiness, case.name)
+
+@router.put("/cases/{case_id}/quarantine", response_model=TestCaseFlakinessRead)
+async def set_test_case_quarantine(case_id: int, update: QuarantineUpdate, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    case = await session.get(TestCase, case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Test case not found")
+
+    if not await rbac_service.has_permission(session, current_user.id, "test:create", project_id=case.project_id):
+        raise HTTPException(status_code=403, detail="Permission denied: You cannot update test cases in this project")
+
+    flakiness = await session.get(TestCaseFlakiness, case_id)
+    if not flakiness:
+        flakiness = TestCaseFlakiness(test_case_id=case_id, project_id=case.project_id)
+    old_value = flakiness.quarantine_override
+    flakiness.quarantine_override = update.quarantined
+    session.add(flakiness)
+    audit = AuditLog(entity_type="case", entity_id=case_id, action="quarantine", user_id=current_user.id,
+                     changes={"quarantine_override": {"old": old_value, "new": update.quarantined}})
+    session.add(audit)
+    await session.commit()
+    await session.refresh(flakiness)
+    return flakiness_service.flakiness_read(flakiness, case.name)
+
 @router.delete("/cases/{case_id}")
 async def delete_test_case(case_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
     case = await session.get(TestCase, case_id)
@@ -1,29 +1,48 @@
-from typing import List, Optional, Union, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query
+import base64
+import time
+from datetime import datetime
+from typing import List, Optional, Union, Dict, Any, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select, func, or_, and_
+from sqlalchemy import insert, tuple_, union
 from sqlalchemy.orm import selectinload
+from app.core.config import settings
 from app.core.database import get_session
-from app.core.auth import get_current_user
+from app.core.auth import create_stream_token, get_current_user, get_current_user_from_stream_token, verify_engine_token
 from app.core.storage import minio_client
 from app.services.test_service import test_service
+from app.services.result_service import result_service
 from app.services.access_service import access_service
+from app.services.run_search_service import run_search_service, RUN_SEARCH_CANDIDATES
+from app.services.run_event_service import run_event_service
 from app.models import (
     User, AuditLog, AuditLogRead, Project, UserWorkspace, UserTeam, UserProjectAccess,
-    TestSuite, TestCase, TestRun, TestRunRead, TestStatus, ExecutionMode, TestCaseResult, TestCaseResultRead
+    TestSuite, TestCase, TestRun, TestRunRead, TestStatus, TestCaseResult, TestCaseResultRead,
+    RunSettingsSnapshot, TestRunSummary, UserRead, TestRunPayload, TestCaseResultPayload
 )
 
 router = APIRouter()
 
+def run_read(run: TestRun, snapshot: Optional[RunSettingsSnapshot], **fields) -> TestRunRead:
+    return TestRunRead(**{**run.model_dump(), **test_service.expand_run_settings(snapshot)}, **fields)
+
 @router.post("/runs", response_model=Union[TestRunRead, List[TestRunRead]])
 async def create_run(
     suite_id: int, 
     case_id: Optional[int] = None, 
     browser: List[str] = Query(["chromium"]), 
     device: Optional[List[str]] = Query(None), 
+    coalesce: bool = False,
     session: AsyncSession = Depends(get_session), 
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Creates and queues runs for a suite or a single case. With `coalesce`, a run
+    identical to one still PENDING (same suite, case, browser, device and
+    effective settings) attaches to that run instead of queuing a duplicate.
+    """
     suite = await session.get(TestSuite, suite_id)
     if not suite:
         raise HTTPException(status_code=404, detail="Suite not found")
@@ -32,150 +51,168 @@ async def create_run(
     if not await access_service.has_project_access(current_user.id, suite.project_id, session, min_role="editor"):
         raise HTTPException(status_code=403, detail="You do not have permission to run tests in this project")
 
-    # Get effective settings for this suite
-    effective_settings = await test_service.get_effective_settings(suite_id, session)
-
     # Normalize devices list
     target_devices = device if device else [None]
 
-    created_runs = []
-
     try:
-        # Recursive function to process suites and create runs
-        async def process_suite(s_id: int, parent_settings: Dict[str, Any]):
-            current_suite = await session.get(TestSuite, s_id)
-            if not current_suite:
-                return
-
-            # Calculate effective settings for this level
-            current_effective_settings = await test_service.get_effective_settings(s_id, session)
-            suite_path = await test_service.get_suite_path(s_id, session)
-
-            if current_suite.execution_mode == ExecutionMode.SEPARATE:
-                # 1. Create individual runs for direct test cases
-                result = await session.exec(select(TestCase).where(TestCase.test_suite_id == s_id))
-                direct_cases = result.all()
-                
-                for case in direct_cases:
-                    for target_browser in browser:
-                        for target_device in target_devices:
-                            run = TestRun(
-                                status=TestStatus.PENDING, 
-                                test_suite_id=s_id, 
-                                test_case_id=case.id,
-                                project_id=suite.project_id,
-                                suite_name=suite_path,
-                                test_case_name=case.name,
-                                request_headers=current_effective_settings.get("headers", {}),
-                                request_params=current_effective_settings.get("params", {}),
-                                allowed_domains=current_effective_settings.get("allowed_domains", []),
-                                domain_settings=current_effective_settings.get("domain_settings", {}),
-                                browser=target_browser,
-                                device=target_device,
-                                user_id=current_user.id
-                            )
-                            session.add(run)
-                            await session.flush()
-                            created_runs.append(run)
-
-                # 2. Recurse for sub-modules
-                result = await session.exec(select(TestSuite).where(TestSuite.parent_id == s_id))
-                sub_modules = result.all()
-                for sub in sub_modules:
-                    await process_suite(sub.id, current_effective_settings)
-
-            else: # CONTINUOUS
-                for target_browser in browser:
-                    for target_device in target_devices:
-                        run = TestRun(
-                            status=TestStatus.PENDING, 
-                            test_suite_id=s_id, 
-                            test_case_id=None,
-                            project_id=suite.project_id,
-                            suite_name=suite_path,
-                            test_case_name=None,
-                            request_headers=current_effective_settings.get("headers", {}),
-                            request_params=current_effective_settings.get("params", {}),
-                            allowed_domains=current_effective_settings.get("allowed_domains", []),
-                            domain_settings=current_effective_settings.get("domain_settings", {}),
-                            browser=target_browser,
-                            device=target_device,
-                            user_id=current_user.id
-                        )
-                        session.add(run)
-                        await session.flush()
-                        created_runs.append(run)
-
-                # 2. Recurse for sub-modules to find SEPARATE modules
-                async def find_and_process_separate_descendants(p_id):
-                    result = await session.exec(select(TestSuite).where(TestSuite.parent_id == p_id))
-                    subs = result.all()
-                    for sub in subs:
-                        if sub.execution_mode == ExecutionMode.SEPARATE:
-                            await process_suite(sub.id, current_effective_settings)
-                        else:
-                            await find_and_process_separate_descendants(sub.id)
-
-                await find_and_process_separate_descendants(s_id)
-
-        # If a specific case is requested, just run that case
-        if case_id:
-             for target_browser in browser:
+        # Suite tree, paths and effective settings are resolved in one pass
+        targets = await test_service.plan_run_targets(suite_id, case_id, session)
+
+        # Runs reference content-addressed settings snapshots instead of carrying their own copies
+        target_hashes = []
+        snapshot_fields = {}
+        for target in targets:
+            fields = test_service.snapshot_fields(target["settings"])
+            settings_hash = test_service.settings_fingerprint(fields)
+            snapshot_fields[settings_hash] = fields
+            target_hashes.append(settings_hash)
+        snapshot_ids = await test_service.get_settings_snapshots(snapshot_fields, session)
+        snapshots = {
+            snapshot_ids[settings_hash]: RunSettingsSnapshot(id=snapshot_ids[settings_hash], hash=settings_hash, **fields)
+            for settings_hash, fields in snapshot_fields.items()
+        }
+
+        new_runs = []
+        for target, settings_hash in zip(targets, target_hashes):
+            for target_browser in browser:
                 for target_device in target_devices:
-                    suite_path = await test_service.get_suite_path(suite_id, session)
-                    case = await session.get(TestCase, case_id)
-                    test_case_name = case.name if case else None
-                    
-                    run = TestRun(
-                        status=TestStatus.PENDING, 
-                        test_suite_id=suite_id, 
-                        test_case_id=case_id,
+                    new_runs.append(TestRun(
+                        status=TestStatus.PENDING,
+                        test_suite_id=target["suite_id"],
+                        test_case_id=target["case_id"],
                         project_id=suite.project_id,
-                        suite_name=suite_path,
-                        test_case_name=test_case_name,
-                        request_headers=effective_settings.get("headers", {}),
-                        request_params=effective_settings.get("params", {}),
-                        allowed_domains=effective_settings.get("allowed_domains", []),
-                        domain_settings=effective_settings.get("domain_settings", {}),
+                        suite_name=target["suite_path"],
+                        test_case_name=target["case_name"],
                         browser=target_browser,
                         device=target_device,
-                        user_id=current_user.id
-                    )
-                    session.add(run)
-                    await session.flush()
-                    created_runs.append(run)
-        else:
-            # Run the suite recursively
-            await process_suite(suite_id, effective_settings)
+                        user_id=current_user.id,
+                        settings_hash=settings_hash,
+                        settings_snapshot_id=snapshot_ids[settings_hash]
+                    ))
+
+        def run_key(run: TestRun):
+            return (run.test_suite_id, run.test_case_id, run.browser, run.device, run.settings_hash)
+
+        # With coalesce, a run identical to a PENDING one reuses it; all candidates are fetched with one query
+        pending_runs = {}
+        if coalesce and new_runs:
+            result = await session.exec(
+                select(TestRun).where(
+                    TestRun.status == TestStatus.PENDING,
+                    TestRun.test_suite_id.in_({run.test_suite_id for run in new_runs}),
+                    TestRun.browser.in_(browser)
+                ).order_by(TestRun.id.desc())
+            )
+            pending_runs = {run_key(run): run for run in result.all()}  # Descending, so the oldest wins
 
+        created_runs = [pending_runs.get(run_key(run), run) for run in new_runs]
+        coalesced_run_ids = {run.id for run in created_runs if run.id is not None}
+        to_insert = [run for run in created_runs if run.id is None]
+
+        if to_insert:
+            # One multi-row INSERT ... RETURNING for every new run
+            result = await session.execute(
+                insert(TestRun).returning(TestRun, sort_by_parameter_order=True),
+                [run.model_dump(exclude={"id"}) for run in to_insert]
+            )
+            inserted = iter(result.scalars().all())
+            created_runs = [run if run.id is not None else next(inserted) for run in created_runs]
+        # Serialized before the commit, which may expire the instances
+        response = [run_read(run, snapshots.get(run.settings_snapshot_id), results=[]) for run in created_runs]
+        queued_ids = [run.id for run in created_runs if run.id not in coalesced_run_ids]
+        created_events = [run_event_service.status_event(run) for run in created_runs if run.id not in coalesced_run_ids]
         await session.commit()
-        for r in created_runs: await session.refresh(r)
+        await run_event_service.publish_async(created_events)
 
-        # Queue tasks after commit
-        from app.worker import run_test_suite
-        for run in created_runs:
+        # Queue tasks after commit, as one group; coalesced runs were queued by the request that created them
+        if queued_ids:
+            from celery import group
+            from app.worker import run_test_suite
             try:
-                run_test_suite.delay(run.id)
+                group(run_test_suite.s(run_id) for run_id in queued_ids).apply_async()
             except Exception as e:
-                print(f"Failed to queue run {run.id}: {e}")
+                print(f"Failed to queue runs {queued_ids}: {e}")
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
-    return [
-        TestRunRead(
-            **run.model_dump(),
-            results=[]
-        ) for run in created_runs
+    return response
+
+# Totals are optional on GET /runs; when requested they are cached briefly per user and filter set
+RUN_COUNT_CACHE_TTL = 30.0
+RUN_COUNT_CACHE_SIZE = 1000
+_run_count_cache: Dict[tuple, Tuple[float, int]] = {}
+
+RUN_SUMMARY_COLUMNS = (
+    TestRun.id, TestRun.created_at, TestRun.status, TestRun.project_id, TestRun.suite_name, TestRun.test_case_name,
+    TestRun.total_tests, TestRun.passed_tests, TestRun.failed_tests, TestRun.duration_ms, TestRun.error_message,
+    TestRun.browser, TestRun.device, TestRun.attempt, TestRun.quarantine_mode
+)
+
+def encode_run_cursor(created_at: datetime, run_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{run_id}".encode()).decode()
+
+def decode_run_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, run_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(run_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def count_runs(cache_key: tuple, conditions: list, session: AsyncSession) -> int:
+    now = time.monotonic()
+    cached = _run_count_cache.get(cache_key)
+    if cached and now - cached[0] < RUN_COUNT_CACHE_TTL:
+        return cached[1]
+    result = await session.exec(select(func.count(TestRun.id)).where(*conditions))
+    total = result.one()
+    if len(_run_count_cache) >= RUN_COUNT_CACHE_SIZE:
+        _run_count_cache.clear()
+    _run_count_cache[cache_key] = (now, total)
+    return total
+
+def accessible_project_queries(current_user: User) -> list:
+    # Projects reachable through a workspace, a team or a direct grant
+    org_stmt = select(Project.id).join(UserWorkspace, UserWorkspace.workspace_id == Project.workspace_id).where(UserWorkspace.user_id == current_user.id)
+    from app.models import TeamProjectAccess, UserTeam, UserProjectAccess
+    team_stmt = select(Project.id).join(TeamProjectAccess, TeamProjectAccess.project_id == Project.id).join(UserTeam, UserTeam.team_id == TeamProjectAccess.team_id).where(UserTeam.user_id == current_user.id)
+    user_stmt = select(Project.id).join(UserProjectAccess, UserProjectAccess.project_id == Project.id).where(UserProjectAccess.user_id == current_user.id)
+    return [org_stmt, team_stmt, user_stmt]
+
+async def run_access_conditions(project_id: Optional[int], session: AsyncSession, current_user: User) -> list:
+    # Build query with filters and security join
+    conditions = [
+        or_(*(TestRun.project_id.in_(stmt) for stmt in accessible_project_queries(current_user)))
     ]
+    
+    if project_id:
+        if not await access_service.has_project_access(current_user.id, project_id, session):
+            raise HTTPException(status_code=403, detail="Access denied")
+        conditions.append(TestRun.project_id == project_id)
+    return conditions
+
+def run_summaries(rows) -> List[TestRunSummary]:
+    runs = []
+    for row in rows:
+        fields = dict(zip((column.key for column in RUN_SUMMARY_COLUMNS), row))
+        user = UserRead(id=row.user_id, email=row.user_email, full_name=row.user_full_name) if row.user_id else None
+        runs.append(TestRunSummary(**fields, user=user))
+    return runs
+
+def run_summary_query():
+    return (
+        select(*RUN_SUMMARY_COLUMNS, User.id.label("user_id"), User.email.label("user_email"), User.full_name.label("user_full_name"))
+        .outerjoin(User, User.id == TestRun.user_id)
+    )
 
 @router.get("/runs")
 async def get_runs(
     project_id: Optional[int] = None,
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     search: Optional[str] = None,
     status: Optional[str] = None,
     browser: Optional[str] = None,
@@ -183,66 +220,141 @@ async def get_runs(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    # Build query with filters and security join
-    org_stmt = select(Project.id).join(UserWorkspace, UserWorkspace.workspace_id == Project.workspace_id).where(UserWorkspace.user_id == current_user.id)
-    from app.models import TeamProjectAccess, UserTeam, UserProjectAccess
-    team_stmt = select(Project.id).join(TeamProjectAccess, TeamProjectAccess.project_id == Project.id).join(UserTeam, UserTeam.team_id == TeamProjectAccess.team_id).where(UserTeam.user_id == current_user.id)
-    user_stmt = select(Project.id).join(UserProjectAccess, UserProjectAccess.project_id == Project.id).where(UserProjectAccess.user_id == current_user.id)
-    
-    query = select(TestRun).where(
-        or_(
-            TestRun.project_id.in_(org_stmt),
-            TestRun.project_id.in_(team_stmt),
-            TestRun.project_id.in_(user_stmt)
-        )
-    )
-    
-    if project_id:
-        if not await access_service.has_project_access(current_user.id, project_id, session):
-            raise HTTPException(status_code=403, detail="Access denied")
-        query = query.where(TestRun.project_id == project_id)
+    """
+    Newest-first run summaries, keyset-paginated on (created_at, id): pass the
+    returned `next_cursor` to fetch the following page. Results, logs and
+    settings are only served by GET /runs/{id}. `total` is computed (and
+    cached for RUN_COUNT_CACHE_TTL seconds) only with `include_total`.
+    """
+    conditions = await run_access_conditions(project_id, session, current_user)
 
     # Apply filters
     if search:
-        query = query.where(
-            (TestRun.suite_name.contains(search)) | 
-            (TestRun.test_case_name.contains(search))
-        )
+        conditions.append(run_search_service.matches(search))
     if status:
-        query = query.where(TestRun.status == status)
+        conditions.append(TestRun.status == status)
     if browser:
-        query = query.where(TestRun.browser == browser)
+        conditions.append(TestRun.browser == browser)
     if device:
-        query = query.where(TestRun.device == device)
-    
-    # Get total count with filters
-    count_query = select(func.count()).select_from(query.subquery())
-    count_result = await session.exec(count_query)
-    total = count_result.one()
-    
-    # Get paginated runs with eager loaded results and user
-    query = query.order_by(TestRun.created_at.desc()).limit(limit).offset(offset).options(selectinload(TestRun.results), selectinload(TestRun.user))
+        conditions.append(TestRun.device == device)
+
+    total = None
+    if include_total:
+        total = await count_runs((current_user.id, project_id, search, status, browser, device), conditions, session)
+
+    query = run_summary_query().where(*conditions)
+    if cursor:
+        query = query.where(tuple_(TestRun.created_at, TestRun.id) < decode_run_cursor(cursor))
+    # One extra row tells whether another page follows
+    query = query.order_by(TestRun.created_at.desc(), TestRun.id.desc()).limit(limit + 1)
     result = await session.exec(query)
-    runs = result.all()
-    
+    rows = result.all()
+
+    runs = run_summaries(rows[:limit])
+
     return {
-        "runs": [
-            TestRunRead(
-                **run.model_dump(),
-                results=[TestCaseResultRead.model_validate(r) for r in run.results],
-                user=run.user
-            ) for run in runs
-        ],
+        "runs": runs,
+        "next_cursor": encode_run_cursor(runs[-1].created_at, runs[-1].id) if len(rows) > limit else None,
         "total": total,
-        "limit": limit,
-        "offset": offset
+        "limit": limit
     }
 
+@router.get("/runs/search")
+async def search_runs(
+    q: str = Query(..., min_length=3),
+    project_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Runs whose suite path, case name or error message contain `q`, best match
+    first: names starting with `q`, then names with a word starting with `q`,
+    then by trigram word similarity and recency. The nearest
+    RUN_SEARCH_CANDIDATES matches come straight from the trigram index and
+    only those are ranked.
+    """
+    conditions = await run_access_conditions(project_id, session, current_user)
+    candidates = (
+        select(TestRun.id)
+        .where(*conditions, run_search_service.matches(q))
+        .order_by(run_search_service.distance(q))
+        .limit(RUN_SEARCH_CANDIDATES)
+        .subquery()
+    )
+    query = (
+        run_summary_query()
+        .where(TestRun.id.in_(select(candidates.c.id)))
+        .order_by(run_search_service.prefix_rank(q), run_search_service.distance(q), TestRun.created_at.desc(), TestRun.id.desc())
+        .limit(limit)
+    )
+    result = await session.exec(query)
+    return {"runs": run_summaries(result.all())}
+
+# Live progress. EventSource cannot set headers, so these authenticate with ?stream_token=, a
+# short-lived token from POST /runs/events/token rather than the login token, which would end up in access logs
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@router.post("/runs/events/token")
+async def create_run_events_token(current_user: User = Depends(get_current_user)):
+    return {"stream_token": create_stream_token(current_user), "expires_in": settings.RUN_EVENTS_TOKEN_EXPIRE_SECONDS}
+
+@router.get("/runs/events")
+async def stream_run_list_events(
+    project_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user_from_stream_token)
+):
+    """
+    Server-Sent Events for run lists: a `status` event with the run's summary
+    whenever a run in one of the user's projects (or `project_id`) is created,
+    changes status or records results.
+    """
+    if not run_event_service.enabled():
+        raise HTTPException(status_code=503, detail="Live run events are not configured")
+    if project_id:
+        if not await access_service.has_project_access(current_user.id, project_id, session):
+            raise HTTPException(status_code=403, detail="Access denied")
+        project_ids = [project_id]
+    else:
+        result = await session.execute(union(*accessible_project_queries(current_user)))
+        project_ids = sorted(result.scalars().all())
+    # Nothing to follow; 204 also tells EventSource not to reconnect
+    if not project_ids:
+        return Response(status_code=204)
+
+    pubsub = await run_event_service.subscribe([run_event_service.project_channel(pid) for pid in project_ids])
+    # The stream outlives the request; don't hold a database connection for it
+    await session.close()
+    return StreamingResponse(run_event_service.stream(pubsub), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/runs/{run_id}/events")
+async def stream_run_events(run_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_stream_token)):
+    """
+    Server-Sent Events for one run: its current `status` first, then `status`
+    transitions and counters, each finished case as a `result` and per-step
+    `step` progress while the run executes.
+    """
+    if not run_event_service.enabled():
+        raise HTTPException(status_code=503, detail="Live run events are not configured")
+    run = await get_accessible_run(run_id, session, current_user)
+
+    pubsub = await run_event_service.subscribe([run_event_service.run_channel(run_id)])
+    try:
+        # Read after subscribing, so a transition in between is not lost
+        await session.refresh(run)
+        initial = [run_event_service.status_event(run)]
+        await session.close()
+    except Exception:
+        await pubsub.aclose()
+        raise
+    return StreamingResponse(run_event_service.stream(pubsub, initial), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/runs/{run_id}", response_model=TestRunRead)
 async def get_run(run_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
     try:
         # Eager load results and user
-        query = select(TestRun).where(TestRun.id == run_id).options(selectinload(TestRun.results), selectinload(TestRun.user))
+        query = select(TestRun).where(TestRun.id == run_id).options(selectinload(TestRun.results), selectinload(TestRun.user), selectinload(TestRun.settings_snapshot))
         result = await session.exec(query)
         run = result.first()
         
@@ -253,8 +365,8 @@ async def get_run(run_id: int, session: AsyncSession = Depends(get_session), cur
             raise HTTPException(status_code=403, detail="Access denied")
 
         # Manually construct response to avoid validation issues with lazy/eager loading
-        response = TestRunRead(
-            **run.model_dump(),
+        response = run_read(
+            run, run.settings_snapshot,
             results=[TestCaseResultRead.model_validate(r) for r in run.results],
             user=run.user
         )
@@ -264,6 +376,127 @@ async def get_run(run_id: int, session: AsyncSession = Depends(get_session), cur
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+async def get_accessible_run(run_id: int, session: AsyncSession, current_user: User) -> TestRun:
+    run = await session.get(TestRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if not await access_service.has_project_access(current_user.id, run.project_id, session):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return run
+
+@router.get("/runs/{run_id}/payload")
+async def get_run_payload(run_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """Request/response headers captured for the run's main navigation."""
+    run = await get_accessible_run(run_id, session, current_user)
+    result = await session.exec(select(TestRunPayload.request_headers, TestRunPayload.response_headers).where(TestRunPayload.run_id == run_id))
+    payload = result.first()
+    request_headers, response_headers = payload if payload else (None, None)
+    if request_headers is None and run.settings_snapshot_id:
+        # Until the engine reports the headers it sent, show the configured ones
+        snapshot = await session.get(RunSettingsSnapshot, run.settings_snapshot_id)
+        request_headers = snapshot.headers if snapshot else None
+    return {"request_headers": request_headers, "response_headers": response_headers}
+
+@router.get("/runs/{run_id}/network-events")
+async def get_run_network_events(
+    run_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = None,
+    test_case_id: Optional[int] = None,
+    resource_type: Optional[str] = None,
+    failed: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    One page of the run's inline network events, filtered server-side. `search`
+    matches URL, method or status; `failed` keeps status >= 400 and failed requests.
+    Logs that outgrew the inline buffer are complete at `network_log_url`.
+    """
+    run = await get_accessible_run(run_id, session, current_user)
+    result = await session.exec(select(TestRunPayload.network_events).where(TestRunPayload.run_id == run_id))
+    events = result.first() or []
+
+    term = search.lower() if search else None
+
+    def matches(event: Dict[str, Any]) -> bool:
+        if test_case_id is not None and event.get("testCaseId") != test_case_id:
+            return False
+        if resource_type and event.get("resourceType") != resource_type:
+            return False
+        if failed and not (event.get("error") or (event.get("status") or 0) >= 400):
+            return False
+        if term and not (
+            term in (event.get("url") or "").lower()
+            or term in (event.get("method") or "").lower()
+            or term in str(event.get("status"))
+        ):
+            return False
+        return True
+
+    filtered = [event for event in events if matches(event)] if (term or test_case_id is not None or resource_type or failed) else events
+    return {
+        "events": filtered[offset:offset + limit],
+        "total": len(filtered),
+        "offset": offset,
+        "limit": limit,
+        "network_log_url": run.network_log_url
+    }
+
+@router.get("/runs/{run_id}/execution-log")
+async def get_run_execution_log(
+    run_id: int,
+    test_case_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    await get_accessible_run(run_id, session, current_user)
+    result = await session.exec(select(TestRunPayload.execution_log).where(TestRunPayload.run_id == run_id))
+    entries = result.first() or []
+    if test_case_id is not None:
+        entries = [entry for entry in entries if entry.get("testCaseId") == test_case_id]
+    return {"entries": entries}
+
+@router.get("/runs/{run_id}/results/{result_id}/payload")
+async def get_result_payload(run_id: int, result_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """Headers and bodies captured for one test case result."""
+    await get_accessible_run(run_id, session, current_user)
+    result = await session.exec(
+        select(TestCaseResultPayload)
+        .join(TestCaseResult, TestCaseResult.id == TestCaseResultPayload.result_id)
+        .where(TestCaseResultPayload.result_id == result_id, TestCaseResult.test_run_id == run_id)
+    )
+    payload = result.first()
+    return {
+        "request_headers": payload.request_headers if payload else {},
+        "request_body": payload.request_body if payload else None,
+        "response_headers": payload.response_headers if payload else {},
+        "response_body": payload.response_body if payload else None,
+        "response_body_truncated": bool(payload and payload.response_body_truncated)
+    }
+
+@router.post("/runs/{run_id}/results", dependencies=[Depends(verify_engine_token)])
+async def report_run_result(run_id: int, event: Dict[str, Any], session: AsyncSession = Depends(get_session)):
+    # Engine callback: one finished test case of a run dispatched in callback mode
+    case_res = event.get("result", event)
+    if not await session.run_sync(lambda s: result_service.ingest_case_result(s, run_id, case_res)):
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"status": "ok"}
+
+@router.post("/runs/{run_id}/progress", dependencies=[Depends(verify_engine_token)])
+async def report_run_progress(run_id: int, event: Dict[str, Any]):
+    # Engine callback: per-step progress, relayed to the run's subscribers without touching the database
+    await run_event_service.publish_async([run_event_service.step_event(run_id, event.get("step", event))])
+    return {"status": "ok"}
+
+@router.post("/runs/{run_id}/complete", dependencies=[Depends(verify_engine_token)])
+async def complete_run(run_id: int, event: Dict[str, Any], session: AsyncSession = Depends(get_session)):
+    # Engine callback: final `complete` or `error` event of a run dispatched in callback mode
+    if not await session.run_sync(lambda s: result_service.complete_run(s, run_id, event)):
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"status": "ok"}
+
 @router.delete("/runs/{run_id}")
 async def delete_run(run_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
     run = await session.get(TestRun, run_id)
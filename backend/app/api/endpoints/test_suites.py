@@ -8,6 +8,7 @@ from app.core.database import get_session
 from app.core.auth import get_current_user
 from app.services.test_service import test_service
 from app.services.access_service import access_service
+from app.services.assertion_service import assertion_service
 from app.services.rbac_service import rbac_service
 from app.models import (
     User, AuditLog, Project, UserWorkspace, UserTeam, UserProjectAccess, UserSystemRole, Role, Workspace, TeamProjectAccess,
@@ -311,9 +312,14 @@ async def create_suite_from_data(data: Dict[str, Any], parent_id: Optional[int],
     await session.flush()
     
     for case_data in data.get("test_cases", []):
+        # Imported steps are validated like saved ones, and any fingerprints they carry are recomputed
+        try:
+            steps = assertion_service.prepare_steps(case_data.get("steps", []))
+        except ValueError as e:
+            raise ValueError(f"Test case '{case_data.get('name')}': {e}")
         new_case = TestCase(
             name=case_data.get("name"),
-            steps=case_data.get("steps", []),
+            steps=steps,
             test_suite_id=new_suite.id,
             project_id=project_id,
             created_by_id=user_id,
@@ -359,7 +365,11 @@ async def import_top_level_suite(suite_data: Dict[str, Any], project_id: int, se
     if not await access_service.has_project_access(current_user.id, project_id, session, min_role="editor"):
         raise HTTPException(status_code=403, detail="Access denied")
 
-    new_suite = await create_suite_from_data(suite_data, None, project_id, session, current_user.id)
+    try:
+        new_suite = await create_suite_from_data(suite_data, None, project_id, session, current_user.id)
+    except ValueError as e:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     await session.commit()
     
     audit = AuditLog(entity_type="suite", entity_id=new_suite.id, action="import", user_id=current_user.id, changes={"source": "import"})
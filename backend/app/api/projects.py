@@ -1,13 +1,15 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select, or_
 from app.core.database import get_session
 from app.core.auth import get_current_user
-from app.models import User, Project, Workspace, UserWorkspace, ProjectReadWithAccess, TeamProjectAccess, UserTeam, UserProjectAccess, Tenant
+from app.models import User, Project, Workspace, UserWorkspace, ProjectReadWithAccess, TeamProjectAccess, UserTeam, UserProjectAccess, Tenant, TestCaseFlakinessRead
 from app.services.workspace_service import workspace_service
 from app.services.access_service import access_service
 from app.services.rbac_service import rbac_service
+from app.services.run_stats_service import run_stats_service, STATS_GROUPS
+from app.services.flakiness_service import flakiness_service
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -103,6 +105,50 @@ async def get_project_teams(project_id: int, session: AsyncSession = Depends(get
         
     return await workspace_service.get_project_teams(project_id, session)
 
+@router.get("/projects/{project_id}/stats")
+async def get_project_stats(
+    project_id: int,
+    days: int = Query(30, ge=1, le=365),
+    test_suite_id: Optional[int] = None,
+    test_case_id: Optional[int] = None,
+    browser: Optional[str] = None,
+    device: Optional[str] = Query(None, description='"" selects runs without device emulation'),
+    group_by: Optional[str] = Query(None, description="suite, case, browser or device"),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    # Served from the daily rollups; runs count once they finish
+    role = await access_service.get_project_role(current_user.id, project_id, session)
+    if not role:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if group_by and group_by not in STATS_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(STATS_GROUPS)}")
+
+    return await run_stats_service.project_stats(
+        project_id, days, session,
+        test_suite_id=test_suite_id,
+        test_case_id=test_case_id,
+        browser=browser,
+        device=device,
+        group_by=group_by
+    )
+
+@router.get("/projects/{project_id}/flaky-cases", response_model=List[TestCaseFlakinessRead])
+async def list_flaky_cases(
+    project_id: int,
+    quarantined_only: bool = False,
+    min_flip_rate: float = Query(0, ge=0, le=1),
+    limit: int = Query(100, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    # Most flaky first
+    role = await access_service.get_project_role(current_user.id, project_id, session)
+    if not role:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return await flakiness_service.list_project_flakiness(project_id, session, quarantined_only=quarantined_only, min_flip_rate=min_flip_rate, limit=limit)
+
 @router.get("/projects/{project_id}/users")
 async def get_project_members(project_id: int, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user)):
     # Check if user has context access to the project
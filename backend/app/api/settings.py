@@ -48,7 +48,7 @@ async def update_user_settings(
         session.add(settings)
     
     # Update only provided fields
-    update_data = settings_update.model_dump(exclude_unset=True)
+    update_data = settings_update.model_dump(exclude_unset=True, mode="json")
     for key, value in update_data.items():
         setattr(settings, key, value)
     
@@ -1,8 +1,9 @@
+import hmac
 from datetime import datetime, timedelta
 from typing import Optional, Union, Any
 from jose import jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Header, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
@@ -16,6 +17,9 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
+# Scope of the short-lived tokens run event streams authenticate with; login tokens carry none
+RUN_EVENTS_SCOPE = "run-events"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
@@ -36,6 +40,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)) -> User:
+    return await user_from_token(token, session)
+
+def create_stream_token(user: User) -> str:
+    """Short-lived token for run event streams, which take it in the query string."""
+    return create_access_token(
+        {"sub": user.email, "scope": RUN_EVENTS_SCOPE},
+        expires_delta=timedelta(seconds=settings.RUN_EVENTS_TOKEN_EXPIRE_SECONDS)
+    )
+
+async def get_current_user_from_stream_token(stream_token: str = Query(...), session: AsyncSession = Depends(get_session)) -> User:
+    """For EventSource streams, which cannot send an Authorization header."""
+    return await user_from_token(stream_token, session, scope=RUN_EVENTS_SCOPE)
+
+async def user_from_token(token: str, session: AsyncSession, scope: Optional[str] = None) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,7 +62,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSe
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        # Stream tokens only open streams, and streams never take a login token
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
     except Exception:
         raise credentials_exception
@@ -54,3 +73,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSe
     if user is None:
         raise credentials_exception
     return user
+
+def verify_engine_token(x_engine_token: Optional[str] = Header(None)):
+    """Authenticates execution engine callbacks against ENGINE_CALLBACK_SECRET."""
+    if not settings.ENGINE_CALLBACK_SECRET or not x_engine_token or not hmac.compare_digest(x_engine_token, settings.ENGINE_CALLBACK_SECRET):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid engine token")
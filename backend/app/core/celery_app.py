@@ -9,5 +9,15 @@ celery_app = Celery(
 )
 
 celery_app.conf.task_routes = {
-    "app.worker.run_test_suite": "main-queue"
+    "app.worker.run_test_suite": "main-queue",
+    "app.worker.reap_stale_runs": "main-queue",
 }
+
+# Run by the celery_beat service
+celery_app.conf.beat_schedule = {
+    "reap-stale-runs": {"task": "app.worker.reap_stale_runs", "schedule": 300.0},
+}
+
+# Workers listen on "-Q main-queue,quarantine-queue"; with the Redis broker they drain the
+# queues in that order, so split-off quarantine runs only take capacity main-queue leaves idle
+celery_app.conf.broker_transport_options = {"queue_order_strategy": "priority"}
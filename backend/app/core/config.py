@@ -11,6 +11,38 @@ class Settings(BaseSettings):
     MINIO_BUCKET_NAME: str = "test-artifacts"
     OPENAI_API_KEY: str = ""
     EXECUTION_ENGINE_URL: str = "http://execution-engine:3000/run"
+    # "engine": runs execute in the Node execution engine at EXECUTION_ENGINE_URL.
+    # "python": runs execute inside the worker on async Playwright (app.runner); no HTTP hop,
+    # and one event loop per worker process drives all of its runs' browser contexts.
+    EXECUTION_BACKEND: str = "engine"
+    # "sync": the worker streams results from the engine and holds the task until the run ends.
+    # "callback": the worker hands the run off and the engine reports back to ENGINE_CALLBACK_URL.
+    EXECUTION_DISPATCH_MODE: str = "sync"
+    ENGINE_CALLBACK_URL: str = "http://backend:8000/api"
+    ENGINE_CALLBACK_SECRET: str = ""
+    # A callback run that reports no case result for this long is marked ERROR by reap_stale_runs, in seconds
+    ENGINE_CALLBACK_TIMEOUT: int = 1800
+    # How long the worker keeps retrying while the engine answers 429 (at capacity), in seconds
+    ENGINE_BUSY_TIMEOUT: int = 900
+    # In-process Playwright runner: browsers kept warm per type, recycled after BROWSER_POOL_MAX_USES leases
+    BROWSER_POOL_SIZE: int = 2
+    BROWSER_POOL_MAX_USES: int = 50
+    # How long a run may wait for a free pooled browser before failing, in seconds
+    BROWSER_POOL_ACQUIRE_TIMEOUT: int = 300
+    # Redis used to fan live run events out to SSE clients; empty reuses CELERY_BROKER_URL when it is Redis
+    RUN_EVENTS_REDIS_URL: str = ""
+    # Run event streams open with a token from POST /runs/events/token valid this long, and are closed
+    # after RUN_EVENTS_STREAM_SECONDS so clients reconnect with a new one, re-checking login and access
+    RUN_EVENTS_TOKEN_EXPIRE_SECONDS: int = 60
+    RUN_EVENTS_STREAM_SECONDS: int = 300
+    # Flaky-case detection: a case is quarantined once at least FLAKY_MIN_OUTCOMES of its last
+    # FLAKY_WINDOW outcomes flip between pass and fail at FLAKY_QUARANTINE_RATE or more,
+    # and released when the rate falls below half of that
+    FLAKY_WINDOW: int = 20
+    FLAKY_MIN_OUTCOMES: int = 6
+    FLAKY_QUARANTINE_RATE: float = 0.3
+    # Celery queue for runs of quarantined cases split off a run (quarantine_mode "separate")
+    QUARANTINE_QUEUE: str = "quarantine-queue"
     BACKEND_CORS_ORIGINS: list[str] = ["*"]
     
     # Security
@@ -22,6 +54,11 @@ class Settings(BaseSettings):
     def cors_origins(self) -> list[str]:
         return self.BACKEND_CORS_ORIGINS
 
+    @property
+    def run_events_url(self) -> str:
+        url = self.RUN_EVENTS_REDIS_URL or self.CELERY_BROKER_URL
+        return url if url.startswith(("redis://", "rediss://")) else ""
+
 
     class Config:
         env_file = ".env"
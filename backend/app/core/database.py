@@ -1,9 +1,9 @@
-from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 # SQLite optimization: Enable WAL mode for concurrency
 from sqlalchemy import event
@@ -13,10 +13,86 @@ import sqlite3
 
 engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
 
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+# Revision matching the schema create_all built before migrations were introduced
+BASELINE_REVISION = "0001"
+# pg_advisory_lock key, so API replicas starting together migrate one at a time
+MIGRATION_LOCK_ID = 72_410_001
+
+def baseline_schema() -> dict:
+    """Tables and columns of the baseline revision, reflected from a scratch SQLite database built by it."""
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine, inspect
+
+    scratch = create_engine("sqlite://")
+    with scratch.connect() as connection:
+        config = Config(str(ALEMBIC_INI))
+        config.attributes["connection"] = connection
+        command.upgrade(config, BASELINE_REVISION)
+        inspector = inspect(connection)
+        return {
+            table: {column["name"] for column in inspector.get_columns(table)}
+            for table in inspector.get_table_names() if table != "alembic_version"
+        }
+
+def check_baseline_schema(connection):
+    """
+    Refuses to adopt a create_all database as the baseline unless it has exactly
+    the baseline's tables and columns, i.e. every scripts/migrate_*.py upgrade
+    has run on it. Stamping a half-migrated database would make later revisions
+    fail or silently diverge.
+    """
+    from sqlalchemy import inspect
+
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    problems = []
+    for table, expected_columns in sorted(baseline_schema().items()):
+        if table not in existing_tables:
+            problems.append(f"missing table {table}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        problems += [f"missing column {table}.{column}" for column in sorted(expected_columns - columns)]
+        problems += [f"unexpected column {table}.{column}" for column in sorted(columns - expected_columns)]
+    if problems:
+        raise RuntimeError(
+            f"Database has no migration history but does not match baseline revision {BASELINE_REVISION}: "
+            + "; ".join(problems)
+            + ". Run the pending backend/scripts/migrate_*.py upgrades on it before starting the API."
+        )
+
+def run_migrations(connection):
+    """Upgrades the schema to the latest Alembic revision on `connection`."""
+    from alembic import command
+    from alembic.config import Config
+    from alembic.migration import MigrationContext
+    from sqlalchemy import inspect, text
+
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["connection"] = connection
+    postgres = connection.dialect.name == "postgresql"
+    if postgres:
+        # Session-level lock: held across the per-revision transactions Alembic commits
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+    try:
+        legacy = MigrationContext.configure(connection).get_current_revision() is None and inspect(connection).has_table("testrun")
+        if legacy:
+            check_baseline_schema(connection)
+        # Alembic begins (and, around CONCURRENTLY index builds, commits) its own transactions
+        connection.commit()
+        if legacy:
+            # Created by create_all: adopt it as the baseline rather than creating its tables again
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+    finally:
+        if postgres:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+
 async def init_db():
-    async with engine.begin() as conn:
-        # In production, use Alembic. For now, create tables directly.
-        await conn.run_sync(SQLModel.metadata.create_all)
+    async with engine.connect() as conn:
+        await conn.run_sync(run_migrations)
 
     # Initialize RBAC
     from app.core.rbac_init import init_rbac
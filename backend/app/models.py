@@ -1,8 +1,8 @@
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, JSON, String, Enum as SAEnum
+from sqlalchemy import Column, ForeignKey, Index, Integer, JSON, String, UniqueConstraint, Enum as SAEnum, false
 from enum import Enum
 
 # Import settings models
@@ -141,6 +141,11 @@ class TestSuiteBase(SQLModel):
     updated_by_id: Optional[int] = Field(default=None, foreign_key="users.id")
 
 class TestSuite(TestSuiteBase, table=True):
+    __table_args__ = (
+        Index("ix_testsuite_project_id", "project_id"), # list_test_suites access filter
+        Index("ix_testsuite_parent_id", "parent_id"), # Sub-module lookups and the suite-tree CTEs
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     
     test_cases: List["TestCase"] = Relationship(back_populates="test_suite")
@@ -194,6 +199,10 @@ class TestCaseBase(SQLModel):
     updated_by_id: Optional[int] = Field(default=None, foreign_key="users.id")
 
 class TestCase(TestCaseBase, table=True):
+    __table_args__ = (
+        Index("ix_testcase_suite_id", "test_suite_id", "id"), # Cases of a suite, in creation order
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     test_suite: Optional[TestSuite] = Relationship(back_populates="test_cases")
     project: Optional["Project"] = Relationship()
@@ -229,16 +238,23 @@ class TestRunBase(SQLModel):
     video_url: Optional[str] = Field(default=None)
     screenshots: Optional[List[str]] = Field(default=[], sa_column=Column(JSON))
     response_status: Optional[int] = Field(default=None)
-    request_headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
-    request_params: Optional[dict] = Field(default={}, sa_column=Column(JSON))
-    response_headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
-    allowed_domains: Optional[List[Any]] = Field(default=[], sa_column=Column(JSON))
-    domain_settings: Optional[dict] = Field(default={}, sa_column=Column(JSON))
-    network_events: Optional[List[dict]] = Field(default=[], sa_column=Column(JSON))
-    execution_log: Optional[List[dict]] = Field(default=[], sa_column=Column(JSON))
+    settings_snapshot_id: Optional[int] = Field(default=None, foreign_key="runsettingssnapshot.id", index=True) # Effective settings the run executes with
+    network_log_url: Optional[str] = Field(default=None) # Complete NDJSON network log when it outgrew the inline network events
     browser: str = Field(default="chromium")
     device: Optional[str] = Field(default=None)
     user_id: Optional[int] = Field(default=None, foreign_key="users.id")
+    shard_count: int = Field(default=1) # Parallel engine invocations the run's cases were split into
+    completed_shards: int = Field(default=0)
+    attempt: int = Field(default=1) # 1 = initial execution, >1 = auto-retry of failed cases
+    retry_case_ids: Optional[List[int]] = Field(default=None, sa_column=Column(JSON))
+    callback_deadline_at: Optional[datetime] = Field(default=None) # Callback mode: reaped as ERROR if the engine has not reported by then
+    settings_hash: Optional[str] = Field(default=None, index=True) # Fingerprint of the run's effective settings, used to coalesce duplicate runs
+    # Known-flaky cases at the start of the run, see FlakinessService.plan_quarantine:
+    # "non_blocking" runs them without letting them fail the run, "separate" leaves them to
+    # a "quarantine" run (quarantine_of_id = this run) that executes only them
+    quarantine_mode: Optional[str] = Field(default=None)
+    quarantined_case_ids: Optional[List[int]] = Field(default=None, sa_column=Column(JSON))
+    quarantine_of_id: Optional[int] = Field(default=None, sa_column=Column(Integer, ForeignKey("testrun.id", ondelete="SET NULL", name="fk_testrun_quarantine_of_id")))
 
 class UserRead(SQLModel):
     id: int
@@ -252,36 +268,143 @@ class UserReadDetailed(UserRead):
     status: str = "active"
     workspace: Optional[str] = None # For Tenant Admin view
 
+# Resolved effective settings, stored once and shared by every run created with them
+class RunSettingsSnapshot(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    hash: str = Field(unique=True, index=True) # TestService.settings_fingerprint of the fields below
+    headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
+    params: Optional[dict] = Field(default={}, sa_column=Column(JSON))
+    allowed_domains: Optional[List[Any]] = Field(default=[], sa_column=Column(JSON))
+    domain_settings: Optional[dict] = Field(default={}, sa_column=Column(JSON))
+    network_capture: Optional[str] = Field(default=None) # Capture level, see app.runner.network_capture
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class TestRun(TestRunBase, table=True):
+    # Laid out for GET /runs: filters on the left, then the (created_at, id) keyset order
+    __table_args__ = (
+        Index("ix_testrun_created", "created_at", "id"),
+        Index("ix_testrun_project_created", "project_id", "created_at", "id"),
+        Index("ix_testrun_project_status_created", "project_id", "status", "created_at", "id"),
+        Index("ix_testrun_project_browser_created", "project_id", "browser", "created_at", "id"),
+        Index("ix_testrun_suite_status", "test_suite_id", "status"), # Coalescing PENDING runs, suite deletion
+        Index("ix_testrun_test_case_id", "test_case_id"),
+        Index("ix_testrun_callback_deadline", "callback_deadline_at"), # reap_stale_runs
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    stats_recorded: bool = Field(default=False, sa_column_kwargs={"server_default": false()}) # Counted in rundailystats; set once the run finishes
+    settings_snapshot: Optional[RunSettingsSnapshot] = Relationship()
+    payload: Optional["TestRunPayload"] = Relationship(sa_relationship_kwargs={"uselist": False, "cascade": "all, delete-orphan", "passive_deletes": True})
     results: List["TestCaseResult"] = Relationship(back_populates="test_run", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
     user: Optional["User"] = Relationship(back_populates="test_runs")
     project: Optional["Project"] = Relationship()
 
 class TestCaseResultRead(SQLModel):
     id: int
+    test_case_id: Optional[int] = None
     test_name: str
     status: TestStatus
     duration_ms: float
     error_message: Optional[str] = None
     screenshots: Optional[List[str]] = []
     response_status: Optional[int] = None
-    response_headers: Optional[dict] = {}
-    response_body: Optional[str] = None
-    request_headers: Optional[dict] = {}
-    request_body: Optional[str] = None
     request_url: Optional[str] = None
     request_method: Optional[str] = None
     request_params: Optional[dict] = {}
+    retry_count: int = 0
+    attempts: Optional[List[dict]] = []
 
 class TestRunRead(TestRunBase):
     id: int
+    # Expanded from the run's settings snapshot
+    request_params: Optional[dict] = {}
+    allowed_domains: Optional[List[Any]] = []
+    domain_settings: Optional[dict] = {}
     results: List[TestCaseResultRead] = []
     user: Optional[UserRead] = None
 
+class TestRunSummary(SQLModel):
+    # Row of the GET /runs list: list columns and counters only, no logs or results
+    id: int
+    created_at: datetime
+    status: TestStatus
+    project_id: Optional[int] = None
+    suite_name: Optional[str] = None
+    test_case_name: Optional[str] = None
+    total_tests: int = 0
+    passed_tests: int = 0
+    failed_tests: int = 0
+    duration_ms: Optional[float] = None
+    error_message: Optional[str] = None
+    browser: str = "chromium"
+    device: Optional[str] = None
+    attempt: int = 1
+    quarantine_mode: Optional[str] = None
+    user: Optional[UserRead] = None
+
+# Finished runs rolled up per project, suite, case, browser, device and day, so
+# trend charts read a few hundred rows instead of scanning testrun/testcaseresult.
+# Rows with test_case_id = 0 count whole runs; the others count that case's results.
+class RunDailyStats(SQLModel, table=True):
+    __table_args__ = (
+        UniqueConstraint("project_id", "day", "test_suite_id", "test_case_id", "browser", "device", name="uq_rundailystats_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(sa_column=Column(Integer, ForeignKey("project.id", ondelete="CASCADE"), nullable=False))
+    day: date # UTC day the run was created
+    test_suite_id: int # Suite the run was started from; no FK, stats outlive deleted suites
+    test_case_id: int = Field(default=0)
+    browser: str
+    device: str = Field(default="") # "" when the run had no device emulation
+    passed: int = Field(default=0)
+    failed: int = Field(default=0)
+    error: int = Field(default=0)
+    duration_count: int = Field(default=0) # Outcomes that reported a duration
+    duration_sum_ms: float = Field(default=0)
+    duration_sketch: Optional[dict] = Field(default={}, sa_column=Column(JSON)) # RunStatsService sketch buckets
+
+# Sliding window of each case's latest outcomes, updated as results are written. The flip
+# rate tells flaky cases (pass/fail alternating) from broken ones (failing every time)
+class TestCaseFlakiness(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_testcaseflakiness_project_rate", "project_id", "flip_rate"),
+    )
+
+    test_case_id: int = Field(sa_column=Column(Integer, ForeignKey("testcase.id", ondelete="CASCADE"), primary_key=True))
+    project_id: Optional[int] = Field(default=None, sa_column=Column(Integer, ForeignKey("project.id", ondelete="CASCADE")))
+    outcomes: str = Field(default="") # Last FLAKY_WINDOW outcomes, oldest first: P = passed, F = failed
+    flips: int = Field(default=0) # Pass/fail changes between consecutive outcomes in the window
+    flip_rate: float = Field(default=0)
+    failure_streak: int = Field(default=0) # Consecutive failures up to the latest outcome; 1 = a new failure
+    total_outcomes: int = Field(default=0)
+    quarantined: bool = Field(default=False) # Maintained from flip_rate
+    quarantine_override: Optional[bool] = Field(default=None) # Set by hand; overrides `quarantined` while not None
+    quarantined_at: Optional[datetime] = Field(default=None)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class TestCaseFlakinessRead(SQLModel):
+    test_case_id: int
+    test_name: Optional[str] = None
+    project_id: Optional[int] = None
+    outcomes: str
+    flips: int
+    flip_rate: float
+    failure_streak: int
+    total_outcomes: int
+    quarantined: bool # Effective: the override when set, else the automatic verdict
+    quarantine_override: Optional[bool] = None
+    quarantined_at: Optional[datetime] = None
+    updated_at: datetime
+
 class TestCaseResult(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_testcaseresult_run_case", "test_run_id", "test_case_id"), # Results of a run, retries by case
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     test_run_id: int = Field(foreign_key="testrun.id")
+    test_case_id: Optional[int] = Field(default=None) # No FK: results outlive deleted cases
     test_name: str
     status: TestStatus
     duration_ms: float
@@ -290,16 +413,32 @@ class TestCaseResult(SQLModel, table=True):
     video_url: Optional[str] = None
     screenshots: Optional[List[str]] = Field(default=[], sa_column=Column(JSON))
     response_status: Optional[int] = Field(default=None)
-    response_headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
-    response_body: Optional[str] = Field(default=None)
-    request_headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
-    request_body: Optional[str] = Field(default=None)
     request_url: Optional[str] = Field(default=None)
     request_method: Optional[str] = Field(default=None)
     request_params: Optional[dict] = Field(default={}, sa_column=Column(JSON))
     ai_analysis: Optional[str] = None
+    retry_count: int = Field(default=0)
+    attempts: Optional[List[dict]] = Field(default=[], sa_column=Column(JSON)) # Earlier attempts, oldest first
     
     test_run: TestRun = Relationship(back_populates="results")
+    payload: Optional["TestCaseResultPayload"] = Relationship(sa_relationship_kwargs={"uselist": False, "cascade": "all, delete-orphan", "passive_deletes": True})
+
+# Bulky run and result data lives in side tables so list and status queries never read it;
+# it is served by the dedicated /runs/{id}/... endpoints
+class TestRunPayload(SQLModel, table=True):
+    run_id: int = Field(sa_column=Column(Integer, ForeignKey("testrun.id", ondelete="CASCADE"), primary_key=True))
+    request_headers: Optional[dict] = Field(default=None, sa_column=Column(JSON)) # Captured by the engine; None until the run reports
+    response_headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
+    network_events: Optional[List[dict]] = Field(default=[], sa_column=Column(JSON))
+    execution_log: Optional[List[dict]] = Field(default=[], sa_column=Column(JSON))
+
+class TestCaseResultPayload(SQLModel, table=True):
+    result_id: int = Field(sa_column=Column(Integer, ForeignKey("testcaseresult.id", ondelete="CASCADE"), primary_key=True))
+    response_headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
+    response_body: Optional[str] = Field(default=None)
+    response_body_truncated: Optional[bool] = Field(default=False) # Feed checks store only the part read before the assertions were decided
+    request_headers: Optional[dict] = Field(default={}, sa_column=Column(JSON))
+    request_body: Optional[str] = Field(default=None)
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
@@ -321,6 +460,12 @@ class User(SQLModel, table=True):
     last_login_at: Optional[datetime] = Field(default=None)
 
 class AuditLog(SQLModel, table=True):
+    # get_audit_log filters by entity (or by user) and returns the newest entries first
+    __table_args__ = (
+        Index("ix_auditlog_entity_timestamp", "entity_type", "entity_id", "timestamp"),
+        Index("ix_auditlog_user_timestamp", "user_id", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     entity_type: str # 'suite', 'case', 'workspace', 'team', 'project'
     entity_id: int
@@ -1,23 +1,32 @@
 import os
-from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+from typing import Optional
+from playwright.async_api import Browser, BrowserContext
+from app.core.config import settings
+from app.runner.browser_pool import browser_pool, BrowserLease
 
 class BrowserManager:
-    def __init__(self, headless: bool = True):
-        self.headless = headless
-        self.playwright: Playwright = None
+    def __init__(self, browser_type: str = "chromium"):
+        self.browser_type = browser_type
+        self.lease: Optional[BrowserLease] = None
         self.browser: Browser = None
         self.context: BrowserContext = None
 
     async def start(self):
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        # Lease a warm browser from the shared pool instead of launching one per run
+        self.lease = await browser_pool.acquire(self.browser_type, timeout=settings.BROWSER_POOL_ACQUIRE_TIMEOUT)
+        self.browser = self.lease.browser
 
-    async def create_context(self, video_dir: str = None) -> BrowserContext:
-        self.context = await self.browser.new_context(
+    async def create_context(self, video_dir: str = None, **options) -> BrowserContext:
+        self.context = await self.new_context(video_dir, **options)
+        return self.context
+
+    async def new_context(self, video_dir: str = None, **options) -> BrowserContext:
+        """A context on the leased browser that is not tracked as the manager's main context."""
+        return await self.browser.new_context(
             record_video_dir=video_dir,
-            record_video_size={"width": 1280, "height": 720}
+            record_video_size={"width": 1280, "height": 720},
+            **options
         )
-        return self.context
 
     async def start_tracing(self):
         if self.context:
@@ -30,7 +39,8 @@ class BrowserManager:
     async def close(self):
         if self.context:
             await self.context.close()
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+            self.context = None
+        if self.lease:
+            await browser_pool.release(self.lease)
+            self.lease = None
+            self.browser = None
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from playwright.async_api import async_playwright, APIRequestContext, Browser, Playwright
+from app.core.config import settings
+
+@dataclass
+class PooledBrowser:
+    browser: Browser
+    uses: int = 0
+    busy: bool = False
+
+@dataclass
+class BrowserLease:
+    browser: Browser
+    browser_type: str
+    wait_ms: float
+    launch_ms: float
+    lease_ms: float
+    _entry: PooledBrowser = field(repr=False, default=None)
+
+class BrowserPool:
+    """
+    Keeps up to `size` launched browsers per browser type and hands them out as
+    leases. A browser is recycled after `max_uses` leases or when it disconnects.
+    """
+    def __init__(self, size: int = settings.BROWSER_POOL_SIZE, max_uses: int = settings.BROWSER_POOL_MAX_USES, headless: bool = True):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.playwright: Optional[Playwright] = None
+        self.browsers: Dict[str, List[PooledBrowser]] = {}
+        self.launching: Dict[str, int] = {}
+        self.condition: Optional[asyncio.Condition] = None
+        self.stats = {"leases": 0, "launches": 0, "recycled": 0, "crashed": 0, "total_wait_ms": 0.0, "total_launch_ms": 0.0}
+
+    async def acquire(self, browser_type: str = "chromium", timeout: Optional[float] = None) -> BrowserLease:
+        """Leases a browser, raising TimeoutError if none is free within `timeout` seconds."""
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        requested_at = time.perf_counter()
+        wait_ms = 0.0
+
+        async with self.condition:
+            while True:
+                entries = self.browsers.setdefault(browser_type, [])
+                idle = next((entry for entry in entries if not entry.busy and entry.browser.is_connected()), None)
+                if idle:
+                    idle.busy = True
+                    return self._lease(browser_type, idle, requested_at, wait_ms, 0.0)
+
+                if len(entries) + self.launching.get(browser_type, 0) < self.size:
+                    break
+
+                wait_start = time.perf_counter()
+                remaining = None if timeout is None else max(timeout - (wait_start - requested_at), 0)
+                try:
+                    await asyncio.wait_for(self.condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Timed out after {timeout}s waiting for a {browser_type} browser")
+                wait_ms += (time.perf_counter() - wait_start) * 1000
+            self.launching[browser_type] = self.launching.get(browser_type, 0) + 1
+
+        # Launch outside the lock so other leases are not held up by browser startup
+        launch_start = time.perf_counter()
+        try:
+            entry = PooledBrowser(browser=await self._launch(browser_type), busy=True)
+        finally:
+            async with self.condition:
+                self.launching[browser_type] -= 1
+                # A failed launch frees its slot: wake a waiter to launch in its place
+                self.condition.notify()
+        launch_ms = (time.perf_counter() - launch_start) * 1000
+        self.stats["launches"] += 1
+        self.stats["total_launch_ms"] += launch_ms
+        entry.browser.on("disconnected", lambda _: asyncio.ensure_future(self._evict(browser_type, entry, crashed=True)))
+
+        async with self.condition:
+            self.browsers.setdefault(browser_type, []).append(entry)
+        return self._lease(browser_type, entry, requested_at, wait_ms, launch_ms)
+
+    async def release(self, lease: BrowserLease):
+        entry = lease._entry
+        entry.busy = False
+        if entry.uses >= self.max_uses or not entry.browser.is_connected():
+            self.stats["recycled"] += 1
+            await self._evict(lease.browser_type, entry, crashed=False)
+            try:
+                await entry.browser.close()
+            except Exception:
+                pass
+        async with self.condition:
+            self.condition.notify()
+
+    async def get_playwright(self) -> Playwright:
+        if self.playwright is None:
+            self.playwright = await async_playwright().start()
+        return self.playwright
+
+    async def new_request_context(self) -> APIRequestContext:
+        """A browserless context for HTTP-only test cases; it holds no pool slot."""
+        return await (await self.get_playwright()).request.new_context()
+
+    async def close(self):
+        entries = [entry for entries in self.browsers.values() for entry in entries]
+        self.browsers.clear()
+        for entry in entries:
+            try:
+                await entry.browser.close()
+            except Exception:
+                pass
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    async def _launch(self, browser_type: str) -> Browser:
+        playwright = await self.get_playwright()
+        print(f"Launching browser: {browser_type}")
+        launcher = getattr(playwright, browser_type, playwright.chromium)
+        if launcher is playwright.chromium:
+            return await launcher.launch(headless=self.headless, args=["--no-sandbox", "--disable-setuid-sandbox"])
+        return await launcher.launch(headless=self.headless)
+
+    def _lease(self, browser_type: str, entry: PooledBrowser, requested_at: float, wait_ms: float, launch_ms: float) -> BrowserLease:
+        entry.uses += 1
+        self.stats["leases"] += 1
+        self.stats["total_wait_ms"] += wait_ms
+        lease_ms = (time.perf_counter() - requested_at) * 1000
+        print(f"Leased {browser_type} browser (use {entry.uses}/{self.max_uses}) in {lease_ms:.0f}ms (wait {wait_ms:.0f}ms, launch {launch_ms:.0f}ms)")
+        return BrowserLease(browser=entry.browser, browser_type=browser_type, wait_ms=wait_ms, launch_ms=launch_ms, lease_ms=lease_ms, _entry=entry)
+
+    async def _evict(self, browser_type: str, entry: PooledBrowser, crashed: bool):
+        entries = self.browsers.get(browser_type, [])
+        if entry not in entries:
+            return
+        entries.remove(entry)
+        if crashed:
+            print(f"{browser_type} browser disconnected; removing it from the pool")
+            self.stats["crashed"] += 1
+        if self.condition:
+            async with self.condition:
+                self.condition.notify()
+
+browser_pool = BrowserPool()
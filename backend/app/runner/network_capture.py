@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, TextIO
+from weakref import WeakKeyDictionary
+from playwright.async_api import BrowserContext, Request, Response
+
+# off: nothing; summary: every request without headers; failures: status >= 400 or failed requests;
+# xhr: XHR/fetch requests only; full: every request with request/response headers
+CAPTURE_LEVELS = ("off", "summary", "failures", "xhr", "full")
+SPILL_CHUNK_SIZE = 500
+
+def parse_level(level: Optional[str]) -> str:
+    if level in CAPTURE_LEVELS:
+        return level
+    default = os.getenv("NETWORK_CAPTURE_DEFAULT", "full")
+    return default if default in CAPTURE_LEVELS else "full"
+
+class NetworkCapture:
+    """
+    Bounded network log for one run: the first `inline_limit` events stay in
+    memory, and once that overflows the complete log is written to an NDJSON
+    spill file. Mirrors the engine's network-capture.ts.
+    """
+    def __init__(self, spill_path: str, inline_limit: int = None, level: Optional[str] = None):
+        self.spill_path = spill_path
+        self.inline_limit = inline_limit if inline_limit is not None else int(os.getenv("NETWORK_CAPTURE_BUFFER", "2000"))
+        self.level = parse_level(level)
+        self.start_times: "WeakKeyDictionary[Request, float]" = WeakKeyDictionary()
+        self.inline: List[Dict[str, Any]] = []
+        self.chunk: List[str] = []
+        self.spill: Optional[TextIO] = None
+        self.total = 0
+
+    def attach(self, context: BrowserContext, test_case_context: Dict[str, Any]):
+        def on_request(request: Request):
+            if self.level != "off":
+                self.start_times[request] = time.time() * 1000
+
+        async def on_response(response: Response):
+            if not self._should_capture(response.request, response.status):
+                return
+            try:
+                self._record(await self._build_event(response.request, response, test_case_context))
+            except Exception as e:
+                print(f"Error capturing network event: {e}")
+
+        async def on_request_failed(request: Request):
+            if not self._should_capture(request, None):
+                return
+            try:
+                event = await self._build_event(request, None, test_case_context)
+                event["error"] = request.failure or "failed"
+                self._record(event)
+            except Exception as e:
+                print(f"Error capturing network event: {e}")
+
+        context.on("request", on_request)
+        context.on("response", on_response)
+        context.on("requestfailed", on_request_failed)
+
+    def finish(self) -> Dict[str, Any]:
+        """Inline events plus the spill file path when the complete log did not fit in memory."""
+        if not self.spill:
+            return {"events": self.inline, "total": self.total, "spill_path": None}
+        self._flush_chunk()
+        self.spill.close()
+        return {"events": self.inline, "total": self.total, "spill_path": self.spill_path}
+
+    def _should_capture(self, request: Request, status: Optional[int]) -> bool:
+        if self.level == "off":
+            return False
+        if self.level == "failures":
+            return status is None or status >= 400
+        if self.level == "xhr":
+            return request.resource_type in ("xhr", "fetch")
+        return True
+
+    async def _build_event(self, request: Request, response: Optional[Response], test_case_context: Dict[str, Any]) -> Dict[str, Any]:
+        end_time = time.time() * 1000
+        start_time = self.start_times.pop(request, end_time)
+        event = {
+            "testCaseId": test_case_context.get("id"),
+            "testCaseName": test_case_context.get("name"),
+            "url": request.url,
+            "method": request.method,
+            "resourceType": request.resource_type,
+            "status": response.status if response else None,
+            "startTime": int(start_time),
+            "endTime": int(end_time),
+            "duration": int(end_time - start_time)
+        }
+        # Header collection costs a protocol round trip per call, so summary mode skips it
+        if self.level != "summary":
+            event["requestHeaders"] = await request.all_headers()
+            event["responseHeaders"] = await response.all_headers() if response else {}
+        return event
+
+    def _record(self, event: Dict[str, Any]):
+        self.total += 1
+        if len(self.inline) < self.inline_limit:
+            self.inline.append(event)
+            return
+        if not self.spill:
+            # First overflow: the spill file starts with everything captured so far
+            self.spill = open(self.spill_path, "w")
+            self.chunk = [json.dumps(e) for e in self.inline]
+        self.chunk.append(json.dumps(event))
+        if len(self.chunk) >= SPILL_CHUNK_SIZE:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if self.spill and self.chunk:
+            self.spill.write("\n".join(self.chunk) + "\n")
+            self.chunk = []
@@ -0,0 +1,122 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+@dataclass
+class DomainRule:
+    order: int  # Position in allowed_domains; the first listed match wins
+    headers: bool
+    params: bool
+
+@dataclass
+class TrieNode:
+    children: Dict[str, "TrieNode"] = field(default_factory=dict)
+    rule: Optional[DomainRule] = None
+
+def get_domain(url: str) -> str:
+    try:
+        return urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+
+def append_params(target_url: str, params: Dict[str, Any]) -> str:
+    try:
+        parts = urlsplit(target_url)
+    except ValueError:
+        return target_url
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    for key, value in params.items():
+        value = str(value).lower() if isinstance(value, bool) else str(value)
+        if (key, value) not in query:
+            query.append((key, value))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def _is_subdomain_of(hostname: str, domain: str) -> bool:
+    return hostname == domain or hostname.endswith(f".{domain}")
+
+class CompiledRouteRules:
+    """
+    Header/param injection rules compiled once per settings snapshot; the
+    in-process counterpart of the engine's route-rules.ts.
+    """
+    def __init__(self, settings: Optional[Dict[str, Any]]):
+        settings = settings or {}
+        self.global_headers = settings.get("headers") or {}
+        self.global_params = settings.get("params") or {}
+        self.domain_settings = settings.get("domain_settings") or {}
+        self.allowed_domains = TrieNode()  # Hostname labels, right to left
+
+        for order, entry in enumerate(settings.get("allowed_domains") or []):
+            if isinstance(entry, str):
+                domain, rule = entry, DomainRule(order, headers=True, params=False)
+            else:
+                entry = entry or {}
+                domain = entry.get("domain")
+                rule = DomainRule(order, headers=entry.get("headers") is not False, params=entry.get("params") is True)
+            if not domain:
+                continue
+            node = self.allowed_domains
+            for label in reversed(domain.split(".")):
+                node = node.children.setdefault(label, TrieNode())
+            if node.rule is None or node.rule.order > order:
+                node.rule = rule
+
+    def _match_allowed_domain(self, hostname: str) -> Optional[DomainRule]:
+        node, match = self.allowed_domains, None
+        for label in reversed(hostname.split(".")):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.rule and (match is None or node.rule.order < match.order):
+                match = node.rule
+        return match
+
+    def may_modify(self, hostname: str, source_domain: Optional[str]) -> bool:
+        """Cheap pre-filter: False means apply() would leave the request untouched."""
+        if hostname in self.domain_settings:
+            return True
+        source_overlay = self.domain_settings.get(source_domain) if source_domain else None
+        if not self.global_headers and not self.global_params and not source_overlay:
+            return False
+        return (source_domain is not None and _is_subdomain_of(hostname, source_domain)) or self._match_allowed_domain(hostname) is not None
+
+    def apply(self, url: str, request_headers: Dict[str, str], source_domain: Optional[str]) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+        """Returns (headers, url) overrides for a request, each None when unchanged."""
+        hostname = get_domain(url)
+        headers = dict(request_headers)
+        modified_headers = False
+        new_url = url
+
+        # 1. Domain-specific settings first
+        specific = self.domain_settings.get(hostname)
+        if specific:
+            if specific.get("headers"):
+                headers.update(specific["headers"])
+                modified_headers = True
+            if specific.get("params"):
+                new_url = append_params(new_url, specific["params"])
+
+        # 2. Source domain or allowed domains
+        matched = self._match_allowed_domain(hostname)
+        is_source_domain = source_domain is not None and _is_subdomain_of(hostname, source_domain)
+        if is_source_domain or matched:
+            allow_headers = is_source_domain or matched.headers
+            allow_params = is_source_domain or matched.params
+
+            if allow_headers and self.global_headers:
+                headers.update(self.global_headers)
+                modified_headers = True
+
+            source_overlay = self.domain_settings.get(source_domain) if source_domain and hostname != source_domain else None
+            if source_overlay:
+                if allow_headers and source_overlay.get("headers"):
+                    headers.update(source_overlay["headers"])
+                    modified_headers = True
+                if allow_params and source_overlay.get("params"):
+                    new_url = append_params(new_url, source_overlay["params"])
+
+            if allow_params and self.global_params:
+                new_url = append_params(new_url, self.global_params)
+
+        changed_url = new_url if new_url != url else None
+        return (headers if modified_headers or changed_url else None), changed_url
@@ -1,10 +1,131 @@
-import os
 import asyncio
-from playwright.async_api import BrowserContext
-from app.runner.browser_manager import BrowserManager
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Union
+from weakref import WeakKeyDictionary
+from playwright.async_api import APIRequestContext, BrowserContext, FrameLocator, Page, Request, Route
 from app.core.storage import minio_client
+from app.runner.browser_manager import BrowserManager
+from app.runner.browser_pool import browser_pool
+from app.runner.network_capture import NetworkCapture, parse_level
+from app.runner.route_rules import CompiledRouteRules, get_domain
+from app.runner.test_executor import TestExecutor
+
+API_STEP_TYPES = {"http-request", "feed-check"}
+ARTIFACT_UPLOAD_CONCURRENCY = int(os.getenv("ARTIFACT_UPLOAD_CONCURRENCY", "4"))
+DEFAULT_TIMEOUT = int(os.getenv("DEFAULT_TIMEOUT", "30000"))
+
+IOS_USER_AGENTS = {
+    "chromium": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/120.0.6099.119 Mobile/15E148 Safari/604.1",
+    "firefox": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) FxiOS/120.0 Mobile/15E148 Safari/605.1.15",
+}
+ANDROID_FIREFOX_USER_AGENT = "Mozilla/5.0 (Android 14; Mobile; rv:120.0) Gecko/120.0 Firefox/120.0"
+
+# Compiled injection rules per context; the route handler is registered once and reads the current rules
+_route_rules: "WeakKeyDictionary[BrowserContext, Dict[str, CompiledRouteRules]]" = WeakKeyDictionary()
+# Fire-and-forget tasks (artifact uploads) must stay referenced until they finish
+_background_tasks: set = set()
+_upload_slots: Optional[asyncio.Semaphore] = None
+
+def _case_result(test_case: Dict[str, Any], status: str, duration_ms: int, error: Optional[str], last_step_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    last = last_step_result or {}
+    request = last.get("request") or {}
+    return {
+        "test_case_id": test_case.get("id"),
+        "test_name": test_case.get("name"), "status": status, "duration_ms": duration_ms, "error": error,
+        "response_status": last.get("status"), "response_headers": last.get("headers"), "response_body": last.get("body"),
+        "response_body_truncated": last.get("body_truncated", False),
+        "request_headers": request.get("headers"), "request_body": request.get("body"), "request_url": request.get("url"),
+        "request_method": request.get("method"), "request_params": request.get("params")
+    }
+
+def _step_event(test_case: Dict[str, Any], index: int, step: Dict[str, Any], status: str, started: float, shard: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    # Live progress for the run's subscribers: one event per finished step, never stored
+    return {"type": "step", "step": {
+        "test_case_id": test_case.get("id"), "test_name": test_case.get("name"), "index": index,
+        "count": len(test_case.get("steps") or []), "type": step.get("type"), "status": status,
+        "duration_ms": int((time.time() - started) * 1000), "shard": shard
+    }}
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+class ArtifactUploads:
+    """The uploads of one run. Each starts as soon as its file is on disk, bounded per worker process."""
+    def __init__(self):
+        self.tasks: List[asyncio.Task] = []
+        self.files = set()
+
+    def add(self, key: str, file_path: str) -> str:
+        if file_path not in self.files:
+            self.files.add(file_path)
+            self.tasks.append(_spawn(self._upload(key, file_path)))
+        return key
+
+    def has(self, file_path: str) -> bool:
+        return file_path in self.files
+
+    async def settled(self) -> bool:
+        return all(await asyncio.gather(*self.tasks))
+
+    async def _upload(self, key: str, file_path: str) -> bool:
+        global _upload_slots
+        if _upload_slots is None:
+            _upload_slots = asyncio.Semaphore(ARTIFACT_UPLOAD_CONCURRENCY)
+        async with _upload_slots:
+            try:
+                await asyncio.to_thread(minio_client.upload_file, file_path, key)
+                return True
+            except Exception as e:
+                print(f"Failed to upload {key}: {e}")
+                return False
+
+async def setup_route_interception(context: BrowserContext, current_settings: Dict[str, Any], source_domain: Dict[str, Optional[str]]):
+    holder = _route_rules.get(context)
+    if holder:
+        holder["rules"] = CompiledRouteRules(current_settings)
+        return
+    holder = {"rules": CompiledRouteRules(current_settings)}
+    _route_rules[context] = holder
+
+    # The source domain is inferred from the first navigation, before any routing decision depends on it
+    def infer_source_domain(request: Request):
+        if not source_domain["value"] and request.is_navigation_request():
+            source_domain["value"] = get_domain(request.url)
+            print(f"Inferred source domain: {source_domain['value']}")
+
+    async def handle(route: Route):
+        request = route.request
+        infer_source_domain(request)
+        headers, url = holder["rules"].apply(request.url, request.headers, source_domain["value"])
+        if headers is not None:
+            options = {"headers": {key: str(value) for key, value in headers.items()}}
+            if url:
+                options["url"] = url
+            await route.continue_(**options)
+        else:
+            await route.continue_()
+
+    context.on("request", infer_source_domain)
+    # Requests the current rules cannot modify never enter the route handler
+    await context.route(
+        lambda url: not source_domain["value"] or holder["rules"].may_modify(get_domain(url), source_domain["value"]),
+        handle
+    )
 
 class AsyncPlaywrightRunner:
+    """
+    Executes a run's test cases inside the worker process: the in-process
+    alternative to the Node execution engine, returning the same result and
+    event shapes so the worker records them identically.
+    """
     def __init__(self):
         self.browser_manager = BrowserManager()
 
@@ -17,76 +138,330 @@ class AsyncPlaywrightRunner:
         # await api.post("https://example.com/api/login", ...)
         pass
 
-    async def run_test(self, run_id: int):
+    @staticmethod
+    def is_api_only(test_cases: List[Dict[str, Any]]) -> bool:
+        return bool(test_cases) and all(
+            step.get("type") in API_STEP_TYPES for test_case in test_cases for step in test_case.get("steps") or []
+        )
+
+    async def run_test(self, run_id: int, test_cases: List[Dict[str, Any]], browser_type: str = "chromium", global_settings: Dict[str, Any] = None,
+                       device: Optional[str] = None, on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       shard: Optional[Dict[str, int]] = None, attempt: int = 1) -> Dict[str, Any]:
+        global_settings = global_settings or {}
+        if self.is_api_only(test_cases):
+            return await self._execute_api_only(test_cases, global_settings, on_event, shard)
+
+        self.browser_manager.browser_type = browser_type
         await self.browser_manager.start()
-        
-        # Create artifacts directory
-        artifacts_dir = f"/tmp/artifacts/{run_id}"
-        os.makedirs(artifacts_dir, exist_ok=True)
-        
         try:
-            context = await self.browser_manager.create_context(video_dir=artifacts_dir)
-            
-            # Hybrid Context Setup
-            await self.setup_hybrid_context(context)
-            
-            await self.browser_manager.start_tracing()
-            
-            page = await context.new_page()
-            
-            # TODO: In a real app, we would inject the test code here.
-            # For this MVP, we'll hardcode a simple test that visits example.com
-            
-            print(f"Running test for run_id: {run_id}")
-            start_time = asyncio.get_event_loop().time()
-            
-            await page.goto("https://example.com")
-            
-            # Simulate some interaction
-            # await page.click("text=More information...")
-            
-            end_time = asyncio.get_event_loop().time()
-            duration_ms = (end_time - start_time) * 1000
-            
-            # Stop tracing
-            trace_path = os.path.join(artifacts_dir, "trace.zip")
-            await self.browser_manager.stop_tracing(path=trace_path)
-            
-            # Upload artifacts
-            trace_key = f"runs/{run_id}/trace.zip"
-            minio_client.upload_file(trace_path, trace_key)
-            
-            # Find video file
-            video_key = None
-            # Close context to ensure video is saved
-            await self.browser_manager.context.close()
-            
-            # Now upload video
-            video_files = [f for f in os.listdir(artifacts_dir) if f.endswith(".webm")]
-            if video_files:
-                video_path = os.path.join(artifacts_dir, video_files[0])
-                video_key = f"runs/{run_id}/video.webm"
-                minio_client.upload_file(video_path, video_key)
+            result = await self._execute(run_id, test_cases, browser_type, global_settings, device, on_event, shard, attempt)
+            lease = self.browser_manager.lease
+            result["browser_pool"] = {"wait_ms": lease.wait_ms, "launch_ms": lease.launch_ms, "lease_ms": lease.lease_ms}
+            return result
+        finally:
+            await self.browser_manager.close()
 
+    async def _context_options(self, browser_type: str, device: Optional[str]):
+        if not device:
+            return {}, None
+        devices = (await browser_pool.get_playwright()).devices
+        if device == "Mobile (Generic)":
             return {
-                "status": "passed",
-                "trace": trace_key,
-                "video": video_key,
-                "duration_ms": duration_ms
+                "viewport": {"width": 375, "height": 667},
+                "device_scale_factor": 2,
+                "is_mobile": browser_type != "firefox",
+                "has_touch": True,
+            }, None
+        descriptor = devices.get(device)
+        if not descriptor:
+            return {}, None
+        default_browser_type = descriptor.get("default_browser_type")
+        if default_browser_type and default_browser_type != browser_type:
+            options = {
+                "viewport": descriptor.get("viewport"),
+                "device_scale_factor": descriptor.get("device_scale_factor"),
+                "has_touch": descriptor.get("has_touch"),
+                "is_mobile": browser_type != "firefox",
             }
-            
+            if default_browser_type == "webkit" or "iPhone" in device or "iPad" in device:
+                if browser_type in IOS_USER_AGENTS:
+                    options["user_agent"] = IOS_USER_AGENTS[browser_type]
+            elif browser_type == "firefox":
+                options["user_agent"] = ANDROID_FIREFOX_USER_AGENT
+            return options, None
+        options = {key: value for key, value in descriptor.items() if key != "default_browser_type"}
+        if browser_type == "firefox":
+            options.pop("is_mobile", None)
+        return options, default_browser_type
+
+    async def _execute(self, run_id: int, test_cases: List[Dict[str, Any]], browser_type: str, global_settings: Dict[str, Any],
+                       device: Optional[str], on_event, shard: Optional[Dict[str, int]], attempt: int) -> Dict[str, Any]:
+        # Retry attempts and concurrently executing shards of one run each get their own artifacts directory and object prefix
+        artifact_id = "/".join(part for part in (
+            str(run_id), f"attempt-{attempt}" if attempt > 1 else None, f"shard-{shard['index']}" if shard else None
+        ) if part)
+        artifacts_dir = os.path.join(os.getenv("ARTIFACTS_DIR", "/tmp/artifacts"), artifact_id)
+        os.makedirs(artifacts_dir, exist_ok=True)
+
+        context_options, emulated_as = await self._context_options(browser_type, device)
+        shared_context = await self.browser_manager.create_context(video_dir=artifacts_dir, **context_options)
+        await self.setup_hybrid_context(shared_context)
+        network_capture = NetworkCapture(os.path.join(artifacts_dir, "network.ndjson"), level=global_settings.get("network_capture"))
+        test_case_context = {"id": None, "name": None}
+        source_domain = {"value": None}
+        network_capture.attach(shared_context, test_case_context)
+
+        current_settings = {
+            "headers": global_settings.get("headers") or {},
+            "params": global_settings.get("params") or {},
+            "allowed_domains": global_settings.get("allowed_domains") or [],
+            "domain_settings": global_settings.get("domain_settings") or {},
+        }
+        await setup_route_interception(shared_context, current_settings, source_domain)
+
+        trace_path = os.path.join(artifacts_dir, "trace.zip")
+        await self.browser_manager.start_tracing()
+
+        page = await shared_context.new_page()
+        start_time = time.time()
+        status, error = "passed", None
+        execution_log, test_results, screenshots = [], [], []
+        trace_key = video_key = network_log_key = None
+
+        # Artifacts upload as soon as they are on disk; object keys are deterministic so results never wait for them
+        uploads = ArtifactUploads()
+
+        def upload_new_screenshots():
+            for file_name in os.listdir(artifacts_dir):
+                file_path = os.path.join(artifacts_dir, file_name)
+                if file_name.endswith(".png") and not uploads.has(file_path):
+                    screenshots.append(uploads.add(f"runs/{artifact_id}/screenshots/{file_name}", file_path))
+
+        try:
+            if not test_cases:
+                raise ValueError("No test cases provided")
+
+            for test_case in test_cases:
+                case_start = time.time()
+                case_status, case_error = "passed", None
+                last_step_result = None
+                temp_context: Optional[BrowserContext] = None
+
+                try:
+                    test_case_context["id"] = test_case.get("id")
+                    test_case_context["name"] = test_case.get("name")
+                    case_settings = test_case.get("settings")
+                    if case_settings:
+                        current_settings = {
+                            "headers": case_settings.get("headers") or {},
+                            "params": case_settings.get("params") or {},
+                            "allowed_domains": case_settings.get("allowed_domains") or [],
+                            "domain_settings": case_settings.get("domain_settings") or {},
+                        }
+                    # Capture level follows the case's suite settings, falling back to the run's
+                    network_capture.level = parse_level((case_settings or {}).get("network_capture") or global_settings.get("network_capture"))
+                    source_domain["value"] = None
+
+                    if (test_case.get("executionMode") or "continuous") == "separate":
+                        temp_context = await self.browser_manager.new_context(artifacts_dir, **context_options)
+                        page = await temp_context.new_page()
+                        network_capture.attach(temp_context, test_case_context)
+                        await setup_route_interception(temp_context, current_settings, source_domain)
+                    else:
+                        pages = shared_context.pages
+                        page = pages[0] if pages and not pages[0].is_closed() else await shared_context.new_page()
+                        await setup_route_interception(shared_context, current_settings, source_domain)
+
+                    try:
+                        page.set_default_timeout(DEFAULT_TIMEOUT)
+                        await page.goto("about:blank", wait_until="domcontentloaded", timeout=5000)
+                        await page.evaluate("name => { window.__TRACEIQ_TEST_NAME__ = name; }", test_case.get("name"))
+                    except Exception:
+                        pass
+
+                    current_frame: Union[Page, FrameLocator] = page
+                    for index, step in enumerate(test_case.get("steps") or []):
+                        step_start = time.time()
+                        try:
+                            if step.get("type") == "switch-frame":
+                                current_frame = await self._switch_frame(page, current_frame, step)
+                            else:
+                                step_result = await TestExecutor.execute_step(page, current_frame, step, current_settings)
+                                if step_result and step.get("type") in API_STEP_TYPES:
+                                    last_step_result = step_result
+                        except Exception:
+                            if on_event:
+                                on_event(_step_event(test_case, index, step, "failed", step_start, shard))
+                            raise
+                        if on_event:
+                            on_event(_step_event(test_case, index, step, "passed", step_start, shard))
+                except Exception as e:
+                    case_status, case_error = "failed", str(e)
+                    if getattr(e, "step_result", None):
+                        last_step_result = e.step_result
+                finally:
+                    case_end = time.time()
+                    execution_log.append({
+                        "testCaseId": test_case.get("id"), "testCaseName": test_case.get("name"),
+                        "startTime": int(case_start * 1000), "endTime": int(case_end * 1000), "status": case_status, "error": case_error
+                    })
+                    case_result = _case_result(test_case, case_status, int((case_end - case_start) * 1000), case_error, last_step_result)
+                    if on_event:
+                        on_event({"type": "result", "result": case_result})
+                    else:
+                        test_results.append(case_result)
+                    if temp_context:
+                        await temp_context.close()
+                    try:
+                        upload_new_screenshots()
+                    except Exception as upload_error:
+                        print(f"Error queuing screenshot uploads: {upload_error}")
         except Exception as e:
-            # Capture trace on failure too
-            trace_path = os.path.join(artifacts_dir, "trace.zip")
+            status, error = "failed", str(e)
+        finally:
+            duration_ms = int((time.time() - start_time) * 1000)
             await self.browser_manager.stop_tracing(path=trace_path)
-            trace_key = f"runs/{run_id}/trace.zip"
-            minio_client.upload_file(trace_path, trace_key)
-            return {
-                "status": "failed",
-                "error": str(e),
-                "trace": trace_key,
-                "duration_ms": 0
-            }
-            
+            await shared_context.close()
+            self.browser_manager.context = None
+
+            network = {"events": [], "total": 0, "spill_path": None}
+            try:
+                network = network_capture.finish()
+            except Exception as capture_error:
+                print(f"Error finishing network capture: {capture_error}")
+
+            try:
+                if os.path.exists(trace_path):
+                    trace_key = uploads.add(f"runs/{artifact_id}/trace.zip", trace_path)
+                upload_new_screenshots()
+                if network["spill_path"]:
+                    network_log_key = uploads.add(f"runs/{artifact_id}/network.ndjson", network["spill_path"])
+                video_file = next((name for name in os.listdir(artifacts_dir) if name.endswith(".webm")), None)
+                if video_file:
+                    video_key = uploads.add(f"runs/{artifact_id}/video.webm", os.path.join(artifacts_dir, video_file))
+                # Remove the local copies once every upload for this run has finished, without holding up the result
+                _spawn(self._cleanup_after(uploads, artifacts_dir))
+            except Exception as cleanup_error:
+                print(f"Error during artifact cleanup: {cleanup_error}")
+
+        return {
+            "status": status, "duration_ms": duration_ms, "error": error, "trace": trace_key, "video": video_key, "screenshots": screenshots,
+            "network_events": network["events"], "network_events_total": network["total"], "network_log": network_log_key,
+            "execution_log": execution_log, "results": test_results, "shard": shard
+        }
+
+    async def _switch_frame(self, page: Page, current: Union[Page, FrameLocator], step: Dict[str, Any]) -> Union[Page, FrameLocator]:
+        frame_selector = step.get("selector") or step.get("value")
+        if frame_selector in ("main", "top"):
+            return page
+        if not frame_selector:
+            return current
+        if (step.get("options") or {}).get("strict_lifecycle"):
+            frame_element = current.locator(frame_selector).first
+            await frame_element.wait_for(state="attached", timeout=30000)
+            element_handle = await frame_element.element_handle()
+            content_frame = await element_handle.content_frame() if element_handle else None
+            if content_frame:
+                await content_frame.wait_for_load_state("domcontentloaded", timeout=30000)
+        return current.frame_locator(frame_selector)
+
+    async def _cleanup_after(self, uploads: ArtifactUploads, artifacts_dir: str):
+        try:
+            await uploads.settled()
+            shutil.rmtree(artifacts_dir, ignore_errors=True)
+        except Exception as e:
+            print(f"Error removing artifacts directory: {e}")
+
+    async def _execute_api_only(self, test_cases: List[Dict[str, Any]], global_settings: Dict[str, Any], on_event,
+                                shard: Optional[Dict[str, int]]) -> Dict[str, Any]:
+        """HTTP-only runs: a request context instead of a leased browser, with no video, trace or screenshots."""
+        start_time = time.time()
+        execution_log, test_results = [], []
+        shared_request = await browser_pool.new_request_context()
+        current_settings = {"headers": global_settings.get("headers") or {}, "params": global_settings.get("params") or {}}
+        try:
+            for test_case in test_cases:
+                case_start = time.time()
+                case_status, case_error = "passed", None
+                last_step_result = None
+                # 'separate' cases get their own cookie jar, as they get their own browser context otherwise
+                temp_request: Optional[APIRequestContext] = None
+                try:
+                    case_settings = test_case.get("settings")
+                    if case_settings:
+                        current_settings = {"headers": case_settings.get("headers") or {}, "params": case_settings.get("params") or {}}
+                    if (test_case.get("executionMode") or "continuous") == "separate":
+                        temp_request = await browser_pool.new_request_context()
+                    for index, step in enumerate(test_case.get("steps") or []):
+                        step_start = time.time()
+                        print(f"  Step: {step.get('type')} {step.get('selector') or ''} {step.get('value') or ''}")
+                        try:
+                            last_step_result = await TestExecutor.execute_api_step(temp_request or shared_request, step, current_settings)
+                        except Exception:
+                            if on_event:
+                                on_event(_step_event(test_case, index, step, "failed", step_start, shard))
+                            raise
+                        if on_event:
+                            on_event(_step_event(test_case, index, step, "passed", step_start, shard))
+                except Exception as e:
+                    case_status, case_error = "failed", str(e)
+                    if getattr(e, "step_result", None):
+                        last_step_result = e.step_result
+                finally:
+                    case_end = time.time()
+                    execution_log.append({
+                        "testCaseId": test_case.get("id"), "testCaseName": test_case.get("name"),
+                        "startTime": int(case_start * 1000), "endTime": int(case_end * 1000), "status": case_status, "error": case_error
+                    })
+                    case_result = _case_result(test_case, case_status, int((case_end - case_start) * 1000), case_error, last_step_result)
+                    if on_event:
+                        on_event({"type": "result", "result": case_result})
+                    else:
+                        test_results.append(case_result)
+                    if temp_request:
+                        await temp_request.dispose()
         finally:
-            await self.browser_manager.close()
+            await shared_request.dispose()
+
+        return {
+            "status": "passed", "duration_ms": int((time.time() - start_time) * 1000), "error": None, "trace": None, "video": None,
+            "screenshots": [], "network_events": [], "network_events_total": 0, "network_log": None,
+            "execution_log": execution_log, "results": test_results, "shard": shard, "api_only": True
+        }
+
+_runner_loop: Optional[asyncio.AbstractEventLoop] = None
+_runner_loop_lock = threading.Lock()
+
+def runner_loop() -> asyncio.AbstractEventLoop:
+    """
+    The worker process's event loop for in-process runs. It outlives single
+    tasks so pooled browsers stay warm, and drives every concurrent run.
+    """
+    global _runner_loop
+    with _runner_loop_lock:
+        if _runner_loop is None:
+            _runner_loop = asyncio.new_event_loop()
+            threading.Thread(target=_runner_loop.run_forever, name="playwright-runner", daemon=True).start()
+    return _runner_loop
+
+def run_in_process(payloads: List[Dict[str, Any]], events: queue.Queue) -> List[Future]:
+    """
+    In-process counterpart of streaming the payloads to the engine: puts
+    (shard_index, event) for every case result and the final complete/error
+    event, then (shard_index, None) when the shard is done.
+    """
+    async def run_shard(index: int, payload: Dict[str, Any]):
+        try:
+            result = await AsyncPlaywrightRunner().run_test(
+                payload["runId"], payload["testCases"], payload.get("browser") or "chromium", payload.get("globalSettings"),
+                payload.get("device"), on_event=lambda event: events.put((index, event)),
+                shard=payload.get("shard"), attempt=payload.get("attempt") or 1
+            )
+            events.put((index, {"type": "complete", **result}))
+        except Exception as e:
+            events.put((index, {"type": "error", "error": str(e), "shard": payload.get("shard")}))
+        finally:
+            events.put((index, None))
+
+    loop = runner_loop()
+    return [asyncio.run_coroutine_threadsafe(run_shard(index, payload), loop) for index, payload in enumerate(payloads)]
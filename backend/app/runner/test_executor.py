@@ -0,0 +1,372 @@
+import asyncio
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from jsonschema import Draft7Validator, FormatChecker
+from jsonschema.validators import validator_for
+from lxml import etree
+from playwright.async_api import APIRequestContext, FrameLocator, Locator, Page, Request
+
+ASSERTION_CACHE_SIZE = int(os.getenv("ASSERTION_CACHE_SIZE", "500"))
+
+# Stands in for JavaScript's undefined, so assertion messages read the same as the engine's
+_UNDEFINED = object()
+
+FEED_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True, huge_tree=True)
+
+class StepError(Exception):
+    """A failed http-request/feed-check step, carrying what it sent and received."""
+    def __init__(self, message: str, step_result: Dict[str, Any]):
+        super().__init__(message)
+        self.step_result = step_result
+
+def _js_string(value: Any) -> str:
+    if value is _UNDEFINED:
+        return "undefined"
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, dict):
+        return "[object Object]"
+    if isinstance(value, list):
+        return ",".join("" if item is None else _js_string(item) for item in value)
+    return str(value)
+
+def _js_falsy(value: Any) -> bool:
+    if value is _UNDEFINED or value is None or value is False or value == "":
+        return True
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == 0
+
+def _js_index(value: Any, key: str) -> Any:
+    if isinstance(value, dict):
+        return value.get(key, _UNDEFINED)
+    if isinstance(value, (list, str)):
+        if key == "length":
+            return len(value)
+        if key.isdigit() and int(key) < len(value):
+            return value[int(key)]
+    return _UNDEFINED
+
+@lru_cache(maxsize=ASSERTION_CACHE_SIZE)
+def _schema_validator(schema_text: str):
+    schema = json.loads(schema_text)
+    validator_class = validator_for(schema, default=Draft7Validator)
+    return validator_class(schema, format_checker=FormatChecker())
+
+@lru_cache(maxsize=ASSERTION_CACHE_SIZE)
+def _compiled_xpath(expression: str) -> etree.XPath:
+    return etree.XPath(expression)
+
+def xpath_assertion_error(assertion: Dict[str, Any], node_value: Optional[str], exists: bool) -> Optional[str]:
+    operator = assertion.get("operator")
+    path, value = assertion.get("path"), assertion.get("value")
+    shown = _js_string(node_value)
+    if operator == "equals":
+        if node_value != value:
+            return f"Expected XPath {path} to equal {_js_string(value)} but got {shown}"
+    elif operator == "contains":
+        if not node_value or _js_string(value) not in node_value:
+            return f"Expected XPath {path} to contain {_js_string(value)} but got {shown}"
+    elif operator == "exists":
+        if not exists:
+            return f"Expected XPath {path} to exist"
+    return None
+
+def check_http_assertions(assertions: List[Dict[str, Any]], status: int, json_body: Any):
+    """Raises ValueError with the engine's message for the first failing assertion."""
+    for assertion in assertions:
+        assertion_type = assertion.get("type")
+        if assertion_type == "status":
+            try:
+                expected = int(str(assertion.get("value")).strip())
+            except ValueError:
+                expected = None
+            if status != expected:
+                raise ValueError(f"Expected status {_js_string(assertion.get('value'))} but got {status}")
+        elif assertion_type == "json-path":
+            if _js_falsy(json_body):
+                raise ValueError("Response is not JSON, cannot perform json-path assertion")
+            current = json_body
+            for part in (assertion.get("path") or "").split("."):
+                if current is None or current is _UNDEFINED:
+                    break
+                current = _js_index(current, part)
+            path, value = assertion.get("path"), _js_string(assertion.get("value"))
+            if assertion.get("operator") == "equals":
+                if _js_string(current) != value:
+                    raise ValueError(f"Expected {path} to equal {value} but got {_js_string(current)}")
+            elif assertion.get("operator") == "contains":
+                if value not in _js_string(current):
+                    raise ValueError(f"Expected {path} to contain {value} but got {_js_string(current)}")
+        elif assertion_type == "json-schema":
+            if _js_falsy(json_body):
+                raise ValueError("Response is not JSON, cannot perform json-schema assertion")
+            validator = _schema_validator(assertion.get("value") or "{}")
+            errors = list(validator.iter_errors(json_body))
+            if errors:
+                details = ", ".join(
+                    f"{''.join('/' + str(part) for part in error.absolute_path)} {error.message}" for error in errors
+                )
+                raise ValueError(f"JSON Schema validation failed: {details}")
+
+def check_feed_assertions(assertions: List[Dict[str, Any]], feed_body: bytes, feed_text: str):
+    """Raises ValueError with the engine's message for the first failing assertion."""
+    root = None
+    for assertion in assertions:
+        if assertion.get("type") == "xpath":
+            if root is None:
+                root = etree.fromstring(feed_body, FEED_PARSER) if feed_body.strip() else None
+            result = _compiled_xpath(assertion.get("path"))(root) if root is not None else []
+            if isinstance(result, list):
+                first = result[0] if result else None
+                if first is None:
+                    node_value = None
+                elif isinstance(first, etree._Element) and isinstance(first.tag, str):
+                    node_value = first.xpath("string()")
+                elif isinstance(first, etree._Element):
+                    node_value = first.text or ""  # Comment or processing instruction
+                else:
+                    node_value = str(first)
+                exists = len(result) > 0
+            else:
+                # Number/boolean/string results are not node-sets: no node value, exists if truthy
+                node_value, exists = None, bool(result)
+            error = xpath_assertion_error(assertion, node_value, exists)
+            if error:
+                raise ValueError(error)
+        elif assertion.get("type") == "text":
+            value = _js_string(assertion.get("value"))
+            if value not in feed_text:
+                raise ValueError(f'Expected feed to contain text "{value}"')
+
+def _append_params(url: str, params: Dict[str, Any]) -> str:
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query.extend((key, _js_string(value)) for key, value in params.items())
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def _str_values(values: Dict[str, Any]) -> Dict[str, str]:
+    return {key: _js_string(value) for key, value in (values or {}).items()}
+
+class TestExecutor:
+    """
+    In-process interpreter for test steps, the Python counterpart of the
+    engine's test-executor.ts: same step types, same assertion messages and
+    the same request/response fields on http-request and feed-check results.
+    """
+    @staticmethod
+    async def execute_step(page: Page, context: Union[Page, FrameLocator], step: Dict[str, Any], global_settings: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        global_settings = global_settings or {}
+        step_type = step.get("type")
+        selector = step.get("selector")
+        value = step.get("value")
+        params = step.get("params") or {}
+        print(f"  Step: {step_type} {selector or ''} {value or ''}")
+
+        def get_locator(target: str) -> Locator:
+            return context.locator(target).first
+
+        async def move_mouse_to(locator: Locator):
+            try:
+                await locator.hover()
+            except Exception:
+                pass
+
+        async def wait_for(target: str, state: str, timeout: int):
+            if isinstance(context, Page):
+                await context.wait_for_selector(target, state=state, timeout=timeout)
+            else:
+                await get_locator(target).wait_for(state=state, timeout=timeout)
+
+        if step_type == "goto":
+            url = value or selector or "about:blank"
+            if global_settings.get("params"):
+                try:
+                    url = _append_params(url, global_settings["params"])
+                    print(f"  Modified URL with params: {url}")
+                except ValueError as e:
+                    print(f"  Could not append params to URL {url}: {e}")
+            wait_until = params.get("wait_until") or "domcontentloaded"
+            for attempt in range(1, 4):
+                try:
+                    await page.goto(url, wait_until=wait_until, timeout=30000)
+                    break
+                except Exception as e:
+                    print(f"  Goto attempt {attempt} failed: {e}")
+                    if attempt == 3:
+                        raise
+                    await asyncio.sleep(1)
+
+        elif step_type in ("http-request", "feed-check"):
+            return await TestExecutor.execute_api_step(page.request, step, global_settings, page)
+
+        elif step_type in ("click", "check"):
+            target = selector or value
+            if target:
+                locator = get_locator(target)
+                await locator.wait_for(state="visible", timeout=80000)
+                await move_mouse_to(locator)
+                await (locator.click() if step_type == "click" else locator.check())
+
+        elif step_type == "fill":
+            if selector:
+                locator = get_locator(selector)
+                await locator.wait_for(state="visible", timeout=80000)
+                await move_mouse_to(locator)
+                await locator.fill(value or "")
+
+        elif step_type == "expect-visible":
+            if selector or value:
+                await wait_for(selector or value, "visible", 80000)
+
+        elif step_type == "wait-for-selector":
+            if selector or value:
+                await wait_for(selector or value, "attached", 80000)
+
+        elif step_type == "expect-hidden":
+            if selector or value:
+                await wait_for(selector or value, "hidden", 50000)
+
+        elif step_type == "expect-text":
+            if selector and value:
+                locator = get_locator(selector)
+                await locator.wait_for(state="visible", timeout=50000)
+                text = await locator.text_content()
+                if not text or value not in text:
+                    raise ValueError(f'Expected text "{value}" not found in element "{selector}"')
+
+        elif step_type == "expect-url":
+            if value or selector:
+                await page.wait_for_url(value or selector, timeout=15000)
+
+        elif step_type == "hover":
+            if selector or value:
+                await get_locator(selector or value).hover()
+
+        elif step_type == "select-option":
+            if selector and value:
+                locator = get_locator(selector)
+                await move_mouse_to(locator)
+                await locator.select_option(value)
+
+        elif step_type == "press-key":
+            if value or selector:
+                await page.keyboard.press(value or selector)
+
+        elif step_type == "screenshot":
+            name = value or f"screenshot-{int(time.time() * 1000)}"
+            video_path = await page.video.path() if page.video else None
+            screenshot_path = os.path.join(os.path.dirname(video_path) if video_path else "/tmp", f"{name}.png")
+            await page.screenshot(path=screenshot_path, full_page=True)
+            print(f"Screenshot saved to: {screenshot_path}")
+
+        elif step_type == "scroll-to":
+            if selector or value:
+                await get_locator(selector or value).scroll_into_view_if_needed()
+
+        elif step_type == "wait-timeout":
+            match = re.match(r"\s*(\d+)", str(value or selector or "1000"))
+            await page.wait_for_timeout(int(match.group(1)) if match else 1000)
+
+        elif step_type != "switch-frame":  # switch-frame is handled by the runner
+            print(f"Unknown step type: {step_type}")
+
+        return None
+
+    @staticmethod
+    async def execute_api_step(api: APIRequestContext, step: Dict[str, Any], global_settings: Dict[str, Any] = None, page: Optional[Page] = None) -> Dict[str, Any]:
+        """http-request and feed-check steps only need a request context, so API-only runs execute them without a browser."""
+        global_settings = global_settings or {}
+        if step.get("type") == "http-request":
+            return await TestExecutor._http_request(api, step, global_settings, page)
+        if step.get("type") == "feed-check":
+            return await TestExecutor._feed_check(api, step, global_settings, page)
+        raise ValueError(f"Step type {step.get('type')} needs a browser")
+
+    @staticmethod
+    async def _fetch(api: APIRequestContext, page: Optional[Page], url: str, method: str, headers: Dict[str, Any], **options):
+        # With a page, report the headers the browser context actually sent; without one they are the merged headers
+        sent = {"url": url, "headers": headers}
+
+        async def on_request(request: Request):
+            try:
+                if (request.url == url or request.url.split("?")[0] == url.split("?")[0]) and request.method == method:
+                    sent["headers"] = await request.all_headers()
+                    sent["url"] = request.url
+            except Exception:
+                pass
+
+        if page:
+            page.context.on("request", on_request)
+        try:
+            response = await api.fetch(url, method=method, headers=_str_values(headers), **options)
+        finally:
+            if page:
+                page.context.remove_listener("request", on_request)
+        return response, sent
+
+    @staticmethod
+    async def _http_request(api: APIRequestContext, step: Dict[str, Any], global_settings: Dict[str, Any], page: Optional[Page]) -> Dict[str, Any]:
+        params = step.get("params") or {}
+        method = params.get("method") or "GET"
+        url = step.get("value") or step.get("selector")
+        body = params.get("body")
+        merged_headers = {**(global_settings.get("headers") or {}), **(params.get("headers") or {})}
+        merged_params = {**(global_settings.get("params") or {}), **(params.get("params") or {})}
+        print(f"  [API] {method} {url} (Headers: {len(merged_headers)}, Params: {len(merged_params)})")
+
+        response, sent = await TestExecutor._fetch(
+            api, page, url, method, merged_headers, params=_str_values(merged_params), data=body, timeout=30000
+        )
+        status = response.status
+        response_body = await response.text()
+        try:
+            json_body = json.loads(response_body)
+        except ValueError:
+            json_body = _UNDEFINED
+
+        result = {
+            "type": "http-request",
+            "status": status,
+            "headers": response.headers,
+            "body": response_body,
+            "request": {"url": sent["url"], "method": method, "headers": sent["headers"], "params": merged_params, "body": body}
+        }
+        try:
+            check_http_assertions(params.get("assertions") or [], status, json_body)
+        except Exception as e:
+            raise StepError(str(e), result)
+        return result
+
+    @staticmethod
+    async def _feed_check(api: APIRequestContext, step: Dict[str, Any], global_settings: Dict[str, Any], page: Optional[Page]) -> Dict[str, Any]:
+        url = step.get("value") or step.get("selector")
+        merged_headers = dict(global_settings.get("headers") or {})
+        merged_params = dict(global_settings.get("params") or {})
+        print(f"  [Feed] Checking {url}")
+
+        response, sent = await TestExecutor._fetch(api, page, url, "GET", merged_headers, params=_str_values(merged_params))
+        if not response.ok:
+            raise ValueError(f"Failed to fetch feed: {response.status}")
+
+        feed_body = await response.body()
+        feed_text = await response.text()
+        result = {
+            "type": "feed-check",
+            "status": response.status,
+            "headers": response.headers,
+            "body": feed_text,
+            "request": {"url": sent["url"], "method": "GET", "headers": sent["headers"], "params": merged_params}
+        }
+        try:
+            check_feed_assertions((step.get("params") or {}).get("assertions") or [], feed_body, feed_text)
+        except Exception as e:
+            raise StepError(str(e), result)
+        return result
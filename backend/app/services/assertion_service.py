@@ -0,0 +1,76 @@
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from jsonschema import Draft7Validator
+from jsonschema.exceptions import SchemaError
+from jsonschema.validators import validator_for
+from lxml import etree
+
+class AssertionService:
+    @staticmethod
+    def fingerprint(assertion: Dict[str, Any]) -> str:
+        # json-schema values are hashed in canonical form so reformatting a schema keeps its key
+        value = assertion.get("value")
+        if assertion.get("type") == "json-schema":
+            value = json.dumps(json.loads(value or "{}"), sort_keys=True, separators=(",", ":"))
+        material = json.dumps([assertion.get("type"), assertion.get("path"), value], separators=(",", ":"))
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    @staticmethod
+    def validate_schema(schema: Any, location: str):
+        # Checked against the schema's own metaschema, as the runner compiles it
+        try:
+            validator_for(schema, default=Draft7Validator).check_schema(schema)
+        except SchemaError as e:
+            raise ValueError(f"{location}: invalid JSON Schema ({e.message})")
+
+    @staticmethod
+    def validate_path(assertion_type: str, path: str, location: str):
+        if not path.strip():
+            raise ValueError(f"{location}: {assertion_type} assertion needs a path")
+        if assertion_type == "xpath":
+            try:
+                etree.XPath(path)
+            except etree.XPathSyntaxError as e:
+                raise ValueError(f"{location}: invalid XPath ({e})")
+        # json-path is a dotted key path (e.g. data.items.0.id) resolved one key at a time, not $-rooted JSONPath
+        elif path.startswith("$") or any(not part or part != part.strip() for part in path.split(".")):
+            raise ValueError(f"{location}: invalid json-path '{path}', expected dotted keys such as data.items.0.id")
+
+    @staticmethod
+    def prepare_steps(steps: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Validates the assertions of http-request/feed-check steps and stamps each
+        with a content fingerprint; a fingerprint already on the assertion is replaced.
+        Raises ValueError describing the first invalid assertion.
+        """
+        prepared = []
+        for step_index, step in enumerate(steps or []):
+            step = step.dict() if hasattr(step, "dict") else dict(step)
+            assertions = (step.get("params") or {}).get("assertions")
+            if assertions:
+                checked = []
+                for index, assertion in enumerate(assertions):
+                    assertion = dict(assertion)
+                    location = f"Step {step_index + 1}, assertion {index + 1}"
+                    assertion_type = assertion.get("type")
+                    if assertion_type == "json-schema":
+                        if not isinstance(assertion.get("value") or "", str):
+                            raise ValueError(f"{location}: JSON Schema must be given as JSON text")
+                        try:
+                            schema = json.loads(assertion.get("value") or "{}")
+                        except json.JSONDecodeError as e:
+                            raise ValueError(f"{location}: invalid JSON Schema ({e.msg})")
+                        AssertionService.validate_schema(schema, location)
+                    elif assertion_type in ("json-path", "xpath"):
+                        if not isinstance(assertion.get("path") or "", str):
+                            raise ValueError(f"{location}: {assertion_type} path must be a string")
+                        AssertionService.validate_path(assertion_type, assertion.get("path") or "", location)
+                    assertion["fingerprint"] = AssertionService.fingerprint(assertion)
+                    checked.append(assertion)
+                step["params"] = {**step["params"], "assertions": checked}
+            prepared.append(step)
+        return prepared
+
+assertion_service = AssertionService()
@@ -0,0 +1,204 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.models import TestCase, TestCaseFlakiness, TestCaseFlakinessRead, TestCaseResult, TestRun, TestStatus
+from app.settings_models import QuarantineMode
+
+# TestRun.quarantine_mode of the run that executes another run's quarantined cases
+QUARANTINE_RUN_MODE = "quarantine"
+
+class FlakinessService:
+    @staticmethod
+    def is_quarantined(flakiness: TestCaseFlakiness) -> bool:
+        if flakiness.quarantine_override is not None:
+            return flakiness.quarantine_override
+        return flakiness.quarantined
+
+    @staticmethod
+    def update_window(flakiness: TestCaseFlakiness, outcomes: str):
+        """Appends outcomes (P/F) and rescores the window."""
+        window = (flakiness.outcomes + outcomes)[-settings.FLAKY_WINDOW:]
+        flakiness.outcomes = window
+        flakiness.flips = sum(1 for previous, current in zip(window, window[1:]) if previous != current)
+        flakiness.flip_rate = round(flakiness.flips / (len(window) - 1), 3) if len(window) > 1 else 0
+        # Counted past the window, so a chronic failure keeps its age
+        trailing_failures = len(outcomes) - len(outcomes.rstrip("F"))
+        if trailing_failures == len(outcomes):
+            flakiness.failure_streak += trailing_failures
+        else:
+            flakiness.failure_streak = trailing_failures
+        flakiness.total_outcomes += len(outcomes)
+        flakiness.updated_at = datetime.utcnow()
+
+        # A case failing every time is broken, not flaky, and must not be hidden by quarantine.
+        # Hysteresis otherwise: a case leaves quarantine only once its flip rate halves
+        broken = flakiness.failure_streak >= settings.FLAKY_MIN_OUTCOMES
+        if not broken and len(window) >= settings.FLAKY_MIN_OUTCOMES and flakiness.flip_rate >= settings.FLAKY_QUARANTINE_RATE:
+            if not flakiness.quarantined:
+                flakiness.quarantined = True
+                flakiness.quarantined_at = datetime.utcnow()
+        elif flakiness.quarantined and (broken or flakiness.flip_rate < settings.FLAKY_QUARANTINE_RATE / 2):
+            flakiness.quarantined = False
+            flakiness.quarantined_at = None
+
+    @staticmethod
+    def record_outcomes(session: Session, run_id: int, rows: List[Dict[str, Any]]):
+        """
+        Folds a batch of written result rows into their cases' windows, in the
+        caller's transaction. Retries append their outcome after the one they
+        replace, so a case that fails and then passes on retry scores a flip.
+        """
+        outcomes: Dict[int, str] = {}
+        for row in rows:
+            if row.get("test_case_id") is not None:
+                outcomes[row["test_case_id"]] = outcomes.get(row["test_case_id"], "") + ("P" if row["status"] == TestStatus.PASSED else "F")
+        if not outcomes:
+            return
+
+        def locked_rows() -> Dict[int, TestCaseFlakiness]:
+            # Locked in case order, so concurrent runs of overlapping cases queue instead of deadlocking
+            result = session.exec(
+                select(TestCaseFlakiness)
+                .where(TestCaseFlakiness.test_case_id.in_(list(outcomes)))
+                .order_by(TestCaseFlakiness.test_case_id)
+                .with_for_update()
+            )
+            return {flakiness.test_case_id: flakiness for flakiness in result.all()}
+
+        rows_by_case = locked_rows()
+        missing = [case_id for case_id in sorted(outcomes) if case_id not in rows_by_case]
+        if missing:
+            run = session.get(TestRun, run_id)
+            # Results outlive deleted cases; only existing cases get a window
+            existing = session.exec(select(TestCase.id).where(TestCase.id.in_(missing))).all()
+            try:
+                with session.begin_nested():
+                    session.add_all([TestCaseFlakiness(test_case_id=case_id, project_id=run.project_id if run else None) for case_id in existing])
+                    session.flush()
+            except IntegrityError:
+                # A concurrent run created some of them first
+                pass
+            rows_by_case = locked_rows()
+
+        for case_id, case_outcomes in outcomes.items():
+            flakiness = rows_by_case.get(case_id)
+            if flakiness:
+                FlakinessService.update_window(flakiness, case_outcomes)
+                session.add(flakiness)
+
+    @staticmethod
+    def quarantined_case_ids(session: Session, case_ids: List[int]) -> List[int]:
+        if not case_ids:
+            return []
+        result = session.exec(select(TestCaseFlakiness).where(TestCaseFlakiness.test_case_id.in_(case_ids)))
+        return sorted(flakiness.test_case_id for flakiness in result.all() if FlakinessService.is_quarantined(flakiness))
+
+    @staticmethod
+    def plan_quarantine(session: Session, run: TestRun) -> Optional[TestRun]:
+        """
+        Applies the run owner's quarantine_mode when a suite run first starts.
+        Records the quarantined cases on the run and, in "separate" mode, adds
+        the run that executes them instead; the caller commits, then passes it
+        to enqueue_quarantine_run. Single-case runs always get a real verdict.
+        """
+        from app.settings_models import UserSettings
+        from app.services.test_service import test_service
+
+        if run.attempt > 1 or run.quarantine_mode is not None or run.test_case_id or not run.user_id:
+            return None
+        user_settings = session.exec(select(UserSettings).where(UserSettings.user_id == run.user_id)).first()
+        mode = user_settings.quarantine_mode if user_settings else QuarantineMode.OFF.value
+        if mode == QuarantineMode.OFF.value:
+            return None
+
+        cases = test_service.load_run_cases_sync(run, session)
+        quarantined_ids = FlakinessService.quarantined_case_ids(session, [case.id for case in cases])
+        if not quarantined_ids:
+            return None
+        # Nothing would be left to run; the cases run here without failing it instead
+        if mode == QuarantineMode.SEPARATE.value and len(quarantined_ids) == len(cases):
+            mode = QuarantineMode.NON_BLOCKING.value
+
+        run.quarantine_mode = mode
+        run.quarantined_case_ids = quarantined_ids
+        session.add(run)
+        print(f"Run {run.id}: {len(quarantined_ids)} quarantined case(s), mode {mode}")
+        if mode != QuarantineMode.SEPARATE.value:
+            return None
+
+        quarantine_run = TestRun(
+            test_suite_id=run.test_suite_id,
+            project_id=run.project_id,
+            suite_name=run.suite_name,
+            browser=run.browser,
+            device=run.device,
+            user_id=run.user_id,
+            settings_snapshot_id=run.settings_snapshot_id,
+            total_tests=len(quarantined_ids),
+            quarantine_mode=QUARANTINE_RUN_MODE,
+            quarantined_case_ids=quarantined_ids,
+            quarantine_of_id=run.id,
+        )
+        session.add(quarantine_run)
+        return quarantine_run
+
+    @staticmethod
+    def enqueue_quarantine_run(quarantine_run: Optional[TestRun]):
+        from app.core.celery_app import celery_app
+
+        if quarantine_run is not None:
+            celery_app.send_task("app.worker.run_test_suite", args=[quarantine_run.id], queue=settings.QUARANTINE_QUEUE)
+
+    @staticmethod
+    def filter_cases(run: TestRun, cases: List[TestCase]) -> List[TestCase]:
+        """The part of a run's cases it executes under its quarantine mode."""
+        quarantined_ids = set(run.quarantined_case_ids or [])
+        if run.quarantine_mode == QuarantineMode.SEPARATE.value:
+            return [case for case in cases if case.id not in quarantined_ids]
+        if run.quarantine_mode == QUARANTINE_RUN_MODE:
+            return [case for case in cases if case.id in quarantined_ids]
+        return cases
+
+    @staticmethod
+    def blocking_failures(session: Session, run: TestRun) -> int:
+        """Failed cases that fail the run: all of them, except quarantined ones in non_blocking mode."""
+        if run.quarantine_mode != QuarantineMode.NON_BLOCKING.value or not run.quarantined_case_ids:
+            return run.failed_tests
+        result = session.exec(
+            select(TestCaseResult.id).where(
+                TestCaseResult.test_run_id == run.id,
+                TestCaseResult.status == TestStatus.FAILED,
+                TestCaseResult.test_case_id.not_in(run.quarantined_case_ids)
+            )
+        )
+        return len(result.all())
+
+    @staticmethod
+    def flakiness_read(flakiness: TestCaseFlakiness, test_name: Optional[str] = None) -> TestCaseFlakinessRead:
+        return TestCaseFlakinessRead(
+            **flakiness.model_dump(exclude={"quarantined"}),
+            test_name=test_name,
+            quarantined=FlakinessService.is_quarantined(flakiness),
+        )
+
+    @staticmethod
+    async def list_project_flakiness(project_id: int, session: AsyncSession, quarantined_only: bool = False, min_flip_rate: float = 0, limit: int = 100) -> List[TestCaseFlakinessRead]:
+        query = (
+            select(TestCaseFlakiness, TestCase.name)
+            .join(TestCase, TestCase.id == TestCaseFlakiness.test_case_id)
+            .where(TestCaseFlakiness.project_id == project_id, TestCaseFlakiness.flip_rate >= min_flip_rate)
+            .order_by(TestCaseFlakiness.flip_rate.desc(), TestCaseFlakiness.test_case_id)
+        )
+        if quarantined_only:
+            # Automatic verdict unless pinned by hand
+            query = query.where(
+                (TestCaseFlakiness.quarantine_override == True)
+                | (TestCaseFlakiness.quarantine_override.is_(None) & (TestCaseFlakiness.quarantined == True))
+            )
+        result = await session.exec(query.limit(limit))
+        return [FlakinessService.flakiness_read(flakiness, name) for flakiness, name in result.all()]
+
+flakiness_service = FlakinessService()
@@ -0,0 +1,452 @@
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.models import TestRun, TestCase, TestCaseResult, TestStatus, TestRunPayload, TestCaseResultPayload
+from app.services.run_event_service import run_event_service
+from app.services.run_stats_service import run_stats_service
+from app.services.flakiness_service import flakiness_service
+
+# Result row keys stored in testcaseresultpayload rather than on the result itself
+RESULT_PAYLOAD_FIELDS = ("response_headers", "response_body", "response_body_truncated", "request_headers", "request_body")
+
+class CaseRef(NamedTuple):
+    id: int
+    name: str
+
+class CaseIndex(NamedTuple):
+    by_id: Dict[int, CaseRef]
+    by_name: Dict[str, CaseRef]
+
+# Case indexes of callback runs, by (run_id, attempt): each /results callback would otherwise reload the run's cases
+CASE_INDEX_CACHE_SIZE = 256
+_callback_case_indexes: "OrderedDict[Tuple[int, int], CaseIndex]" = OrderedDict()
+
+class ResultService:
+    @staticmethod
+    def iter_engine_events(response) -> Iterator[Dict[str, Any]]:
+        """
+        Yields engine events from a streamed `/run` response.
+        NDJSON responses are consumed line by line; a legacy single JSON body is
+        replayed as one `result` event per case followed by a `complete` event.
+        """
+        content_type = response.headers.get("content-type", "")
+        if "application/x-ndjson" in content_type:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+            return
+
+        result = response.json()
+        for case_res in result.pop("results", None) or []:
+            yield {"type": "result", "result": case_res}
+        yield {"type": "complete", **result}
+
+    @staticmethod
+    def build_result_row(run_id: int, case: TestCase, case_res: Dict[str, Any]) -> Dict[str, Any]:
+        # Plain column dicts: bulk inserts skip per-object SQLModel validation of the large JSON fields
+        return {
+            "test_run_id": run_id,
+            "test_case_id": case.id,
+            "test_name": case.name,
+            "status": TestStatus.PASSED if case_res.get("status") == "passed" else TestStatus.FAILED,
+            "duration_ms": case_res.get("duration_ms", 0),
+            "error_message": case_res.get("error"),
+            "trace_url": case_res.get("trace"),
+            "video_url": case_res.get("video"),
+            "screenshots": case_res.get("screenshots", []),
+            "attempts": [],
+            "response_status": case_res.get("response_status"),
+            "response_headers": case_res.get("response_headers"),
+            "response_body": case_res.get("response_body"),
+            "response_body_truncated": bool(case_res.get("response_body_truncated")),
+            "request_headers": case_res.get("request_headers"),
+            "request_body": case_res.get("request_body"),
+            "request_url": case_res.get("request_url"),
+            "request_method": case_res.get("request_method"),
+            "request_params": case_res.get("request_params"),
+        }
+
+    @staticmethod
+    def build_missing_row(run_id: int, case: TestCase) -> Dict[str, Any]:
+        # Case was expected but not found in results -> Skipped or Error
+        # We mark it as ERROR/FAILED so the user knows it didn't run
+        return ResultService.build_result_row(run_id, case, {
+            "status": "failed",
+            "duration_ms": 0,
+            "error": "Test execution skipped or crashed before completion",
+        })
+
+    @staticmethod
+    def split_payload(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Removes the payload fields from a result row and returns those that carry data."""
+        payload = {field: row.pop(field, None) for field in RESULT_PAYLOAD_FIELDS}
+        return {field: value for field, value in payload.items() if value}
+
+    @staticmethod
+    def insert_result_rows(session: Session, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        rows = [dict(row) for row in rows]
+        payloads = [ResultService.split_payload(row) for row in rows]
+        result_ids = session.execute(
+            insert(TestCaseResult).returning(TestCaseResult.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        payload_rows = [{"result_id": result_id, **payload} for result_id, payload in zip(result_ids, payloads) if payload]
+        if payload_rows:
+            session.exec(insert(TestCaseResultPayload), params=payload_rows)
+
+    @staticmethod
+    def run_payload(run: TestRun) -> TestRunPayload:
+        # Sync sessions only: lazy-loads the run's payload, creating it on first write
+        if run.payload is None:
+            run.payload = TestRunPayload()
+        return run.payload
+
+    @staticmethod
+    def bulk_record_results(session: Session, run_id: int, rows: List[Dict[str, Any]]):
+        """
+        Writes a batch of result rows with one multi-row INSERT and advances the
+        run's counters in the same transaction. The caller commits.
+        """
+        if not rows:
+            return
+        passed = sum(1 for row in rows if row["status"] == TestStatus.PASSED)
+        ResultService.insert_result_rows(session, rows)
+        session.exec(
+            update(TestRun)
+            .where(TestRun.id == run_id)
+            .values(
+                passed_tests=TestRun.passed_tests + passed,
+                failed_tests=TestRun.failed_tests + (len(rows) - passed)
+            )
+        )
+
+    @staticmethod
+    def record_retry_results(session: Session, run_id: int, rows: List[Dict[str, Any]]):
+        """
+        Records a retry attempt's results over the rows of the previous attempt.
+        The earlier outcome is appended to `attempts` and the run's counters move
+        only when a case's verdict flips, so they always reflect final verdicts.
+        """
+        if not rows:
+            return
+        existing = session.exec(
+            select(TestCaseResult).where(
+                TestCaseResult.test_run_id == run_id,
+                TestCaseResult.test_case_id.in_([row["test_case_id"] for row in rows])
+            )
+        ).all()
+        existing_by_case = {result.test_case_id: result for result in existing}
+        payloads = session.exec(
+            select(TestCaseResultPayload).where(TestCaseResultPayload.result_id.in_([result.id for result in existing]))
+        ).all()
+        payloads_by_result = {payload.result_id: payload for payload in payloads}
+
+        passed_delta = 0
+        new_rows = []
+        for row in rows:
+            result = existing_by_case.get(row["test_case_id"])
+            if result is None:
+                new_rows.append(row)
+                continue
+            if result.status != row["status"]:
+                passed_delta += 1 if row["status"] == TestStatus.PASSED else -1
+            result.attempts = (result.attempts or []) + [{
+                "status": result.status,
+                "duration_ms": result.duration_ms,
+                "error_message": result.error_message,
+                "trace_url": result.trace_url,
+                "video_url": result.video_url,
+                "screenshots": result.screenshots,
+            }]
+            result.retry_count += 1
+            row = dict(row)
+            payload = payloads_by_result.get(result.id) or TestCaseResultPayload(result_id=result.id)
+            for field in RESULT_PAYLOAD_FIELDS:
+                setattr(payload, field, row.pop(field, None))
+            for column, value in row.items():
+                if column not in ("test_run_id", "test_case_id", "attempts"):
+                    setattr(result, column, value)
+            session.add(result)
+            session.add(payload)
+
+        ResultService.bulk_record_results(session, run_id, new_rows)
+        if passed_delta:
+            session.exec(
+                update(TestRun)
+                .where(TestRun.id == run_id)
+                .values(
+                    passed_tests=TestRun.passed_tests + passed_delta,
+                    failed_tests=TestRun.failed_tests - passed_delta
+                )
+            )
+
+    @staticmethod
+    def record_results(session: Session, run_id: int, attempt: int, rows: List[Dict[str, Any]]):
+        if attempt > 1:
+            ResultService.record_retry_results(session, run_id, rows)
+        else:
+            ResultService.bulk_record_results(session, run_id, rows)
+        flakiness_service.record_outcomes(session, run_id, rows)
+
+    @staticmethod
+    def apply_run_summary(run: TestRun, summary: Dict[str, Any]):
+        run.status = TestStatus.PASSED if summary.get("status") == "passed" else TestStatus.FAILED
+        run.duration_ms = summary.get("duration_ms")
+        run.error_message = summary.get("error")
+        run.trace_url = summary.get("trace")
+        run.video_url = summary.get("video")
+        run.screenshots = summary.get("screenshots", [])
+        run.response_status = summary.get("response_status")
+        run.network_log_url = summary.get("network_log")
+        payload = ResultService.run_payload(run)
+        payload.request_headers = summary.get("request_headers")
+        payload.response_headers = summary.get("response_headers")
+        payload.network_events = summary.get("network_events")
+        payload.execution_log = summary.get("execution_log") # Save execution log
+
+    @staticmethod
+    def begin_attempt(run: TestRun, total_tests: int, shard_count: int = 1):
+        # Retry attempts keep the counters and summary of the attempts before them
+        if run.attempt > 1:
+            run.shard_count = shard_count
+            run.completed_shards = 0
+        else:
+            ResultService.reset_run_results(run, total_tests, shard_count)
+
+    @staticmethod
+    def reset_run_results(run: TestRun, total_tests: int, shard_count: int = 1):
+        run.total_tests = total_tests
+        run.passed_tests = 0
+        run.failed_tests = 0
+        run.shard_count = shard_count
+        run.completed_shards = 0
+        if shard_count > 1:
+            # Shard summaries are accumulated into these fields as each shard completes
+            run.error_message = None
+            run.duration_ms = None
+            run.trace_url = None
+            run.video_url = None
+            run.screenshots = []
+            run.network_log_url = None
+            payload = ResultService.run_payload(run)
+            payload.network_events = []
+            payload.execution_log = []
+
+    @staticmethod
+    def accumulate_shard_summary(session: Session, run: TestRun, summary: Dict[str, Any]):
+        """Merges one shard's `complete` or `error` event into a sharded run."""
+        run.completed_shards += 1
+        if summary.get("error"):
+            shard_index = (summary.get("shard") or {}).get("index")
+            message = f"Shard {shard_index}: {summary.get('error')}"
+            run.error_message = f"{run.error_message}\n{message}" if run.error_message else message
+        if summary.get("type") == "error":
+            session.add(run)
+            return
+        ResultService.merge_summary(session, run, summary)
+
+    @staticmethod
+    def merge_summary(session: Session, run: TestRun, summary: Dict[str, Any]):
+        """Folds a partial summary (one shard, or one retry attempt) into the run."""
+        # The run keeps the first trace/video; each case result links to the one it ran in
+        run.trace_url = run.trace_url or summary.get("trace")
+        run.video_url = run.video_url or summary.get("video")
+        run.duration_ms = max(run.duration_ms or 0, summary.get("duration_ms") or 0)
+        run.screenshots = (run.screenshots or []) + (summary.get("screenshots") or [])
+        run.network_log_url = run.network_log_url or summary.get("network_log")
+        payload = ResultService.run_payload(run)
+        payload.network_events = (payload.network_events or []) + (summary.get("network_events") or [])
+        payload.execution_log = sorted(
+            (payload.execution_log or []) + (summary.get("execution_log") or []),
+            key=lambda entry: entry.get("startTime") or 0
+        )
+        session.add(run)
+
+        partial_case_ids = [entry.get("testCaseId") for entry in summary.get("execution_log") or [] if entry.get("testCaseId") is not None]
+        if partial_case_ids and (summary.get("trace") or summary.get("video")):
+            session.exec(
+                update(TestCaseResult)
+                .where(TestCaseResult.test_run_id == run.id, TestCaseResult.test_case_id.in_(partial_case_ids))
+                .values(trace_url=summary.get("trace"), video_url=summary.get("video"))
+            )
+
+    @staticmethod
+    def finalize_run(session: Session, run: TestRun, summary: Optional[Dict[str, Any]], cases_to_run: List[TestCase], recorded_case_ids: Set[int]):
+        # Update test run with results (sharded runs have already accumulated theirs)
+        if summary is not None:
+            if run.attempt > 1:
+                ResultService.merge_summary(session, run, summary)
+            else:
+                ResultService.apply_run_summary(run, summary)
+
+        # Create results for expected cases that never reported back
+        missing_rows = [ResultService.build_missing_row(run.id, case) for case in cases_to_run if case.id not in recorded_case_ids]
+        if run.attempt > 1:
+            ResultService.record_retry_results(session, run.id, missing_rows)
+            session.flush()
+            session.refresh(run)
+        else:
+            ResultService.insert_result_rows(session, missing_rows)
+            run.failed_tests += len(missing_rows)
+
+        # Update main run status based on aggregated results; quarantined failures may not count
+        if run.failed_tests > 0 and flakiness_service.blocking_failures(session, run) > 0:
+            run.status = TestStatus.FAILED
+        else:
+            run.status = TestStatus.PASSED
+        session.add(run)
+        ResultService.schedule_retry(session, run)
+
+    @staticmethod
+    def schedule_retry(session: Session, run: TestRun) -> bool:
+        """
+        Re-queues the cases that failed this attempt when the run owner enabled
+        auto_retry and retries remain. The run stays RUNNING until its last
+        attempt finalizes. Commits before enqueueing so the retry sees this attempt.
+        """
+        from app.settings_models import UserSettings
+        from app.core.celery_app import celery_app
+
+        if run.status != TestStatus.FAILED or not run.user_id:
+            return False
+        user_settings = session.exec(select(UserSettings).where(UserSettings.user_id == run.user_id)).first()
+        if not user_settings or not user_settings.auto_retry or run.attempt > user_settings.max_retries:
+            return False
+
+        # Known-flaky cases are never retried: their failures are expected
+        failed_case_ids = session.exec(
+            select(TestCaseResult.test_case_id).where(
+                TestCaseResult.test_run_id == run.id,
+                TestCaseResult.status == TestStatus.FAILED,
+                TestCaseResult.test_case_id.is_not(None),
+                TestCaseResult.test_case_id.not_in(run.quarantined_case_ids or [])
+            )
+        ).all()
+        if not failed_case_ids:
+            return False
+
+        run.attempt += 1
+        run.retry_case_ids = sorted(failed_case_ids)
+        run.status = TestStatus.RUNNING
+        session.add(run)
+        session.commit()
+        celery_app.send_task("app.worker.run_test_suite", args=[run.id])
+        print(f"Retrying {len(failed_case_ids)} failed case(s) of run {run.id} (attempt {run.attempt})")
+        return True
+
+    @staticmethod
+    def index_cases(cases_to_run: List[TestCase]) -> CaseIndex:
+        # Built once per run, so matching each reported result is two dict lookups
+        by_name: Dict[str, CaseRef] = {}
+        for case in cases_to_run:
+            by_name.setdefault(case.name, CaseRef(case.id, case.name))
+        return CaseIndex({case.id: CaseRef(case.id, case.name) for case in cases_to_run}, by_name)
+
+    @staticmethod
+    def match_case(case_index: CaseIndex, case_res: Dict[str, Any]) -> Optional[CaseRef]:
+        # Match results by ID (preferred) or Name (fallback)
+        case_id = case_res.get("test_case_id")
+        case = case_index.by_id.get(case_id) if case_id is not None else None
+        return case or case_index.by_name.get(case_res.get("test_name"))
+
+    @staticmethod
+    def callback_case_index(session: Session, run: TestRun) -> CaseIndex:
+        from app.services.test_service import test_service
+
+        key = (run.id, run.attempt)
+        case_index = _callback_case_indexes.get(key)
+        if case_index is None:
+            case_index = ResultService.index_cases(test_service.load_run_cases_sync(run, session))
+            _callback_case_indexes[key] = case_index
+            if len(_callback_case_indexes) > CASE_INDEX_CACHE_SIZE:
+                _callback_case_indexes.popitem(last=False)
+        else:
+            _callback_case_indexes.move_to_end(key)
+        return case_index
+
+    @staticmethod
+    def extend_callback_deadline(run: TestRun):
+        # Pushed back on every callback; reap_stale_runs errors the run once it passes
+        run.callback_deadline_at = datetime.utcnow() + timedelta(seconds=settings.ENGINE_CALLBACK_TIMEOUT)
+
+    @staticmethod
+    def recorded_case_ids(session: Session, run_id: int, attempt: int = 1) -> Set[int]:
+        # A case is recorded for an attempt once its row carries that attempt's outcome
+        result = session.exec(
+            select(TestCaseResult.test_case_id).where(
+                TestCaseResult.test_run_id == run_id,
+                TestCaseResult.retry_count >= attempt - 1
+            )
+        )
+        return {case_id for case_id in result.all() if case_id is not None}
+
+    # Engine callbacks (EXECUTION_DISPATCH_MODE="callback") arrive one event per
+    # request, so these entry points reload the state they need from the database.
+
+    @staticmethod
+    def ingest_case_result(session: Session, run_id: int, case_res: Dict[str, Any]) -> bool:
+        # Row lock: a redelivered callback waits for the first one and then finds its row
+        run = session.get(TestRun, run_id, with_for_update=True)
+        if not run:
+            return False
+        if run.status != TestStatus.RUNNING:
+            return True
+
+        case = ResultService.match_case(ResultService.callback_case_index(session, run), case_res)
+        # Callbacks may be redelivered; each case is recorded once per attempt
+        recorded = case and session.exec(
+            select(TestCaseResult.id).where(
+                TestCaseResult.test_run_id == run_id,
+                TestCaseResult.test_case_id == case.id,
+                TestCaseResult.retry_count >= run.attempt - 1
+            )
+        ).first()
+        ResultService.extend_callback_deadline(run)
+        session.add(run)
+        if case and not recorded:
+            ResultService.record_results(session, run_id, run.attempt, [ResultService.build_result_row(run_id, case, case_res)])
+        session.commit()
+        if case and not recorded:
+            run_event_service.publish_results(session, run, [case.id])
+        return True
+
+    @staticmethod
+    def complete_run(session: Session, run_id: int, summary: Dict[str, Any]) -> bool:
+        from app.services.test_service import test_service
+
+        # Row lock: completions of concurrent shards are merged one at a time
+        run = session.get(TestRun, run_id, with_for_update=True)
+        if not run:
+            return False
+        if run.status != TestStatus.RUNNING:
+            return True
+
+        if run.shard_count > 1:
+            ResultService.accumulate_shard_summary(session, run, summary)
+            if run.completed_shards < run.shard_count:
+                ResultService.extend_callback_deadline(run)
+                session.commit()
+                return True
+
+        # The engine is done reporting; a retry attempt gets a new deadline when it is dispatched
+        run.callback_deadline_at = None
+        if run.shard_count == 1 and summary.get("type") == "error":
+            run.status = TestStatus.ERROR
+            run.error_message = f"Execution Engine failed: {summary.get('error')}"
+            session.add(run)
+        else:
+            # Sharded runs have merged their summaries shard by shard
+            cases_to_run = test_service.load_run_cases_sync(run, session)
+            ResultService.finalize_run(session, run, summary if run.shard_count == 1 else None, cases_to_run, ResultService.recorded_case_ids(session, run_id, run.attempt))
+        run_stats_service.record_run(session, run)
+        session.commit()
+        run_event_service.publish_status(run)
+        print(f"Finished run {run_id} with status {run.status}")
+        return True
+
+result_service = ResultService()
@@ -0,0 +1,153 @@
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+import redis
+import redis.asyncio as aioredis
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.models import TestRun, TestCaseResult, TestCaseResultRead, TestRunSummary
+
+# An SSE comment is sent on idle streams this often, so proxies keep them open and
+# disconnected clients are noticed
+SSE_KEEPALIVE_SECONDS = 15
+# Run list streams get status changes only; steps and results go to the run's own channel
+PROJECT_EVENT_TYPES = {"status"}
+
+class RunEventService:
+    """
+    Live run progress over Redis pub/sub. Writers (worker, engine callbacks, the API)
+    publish after they commit; SSE endpoints subscribe per run or per project.
+    Events are best effort: a client that reconnects resyncs from the REST endpoints.
+    """
+    _client: Optional[redis.Redis] = None
+    _async_client: Optional[aioredis.Redis] = None
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(settings.run_events_url)
+
+    @staticmethod
+    def run_channel(run_id: int) -> str:
+        return f"runs:{run_id}:events"
+
+    @staticmethod
+    def project_channel(project_id: int) -> str:
+        return f"projects:{project_id}:run-events"
+
+    @staticmethod
+    def run_summary(run: TestRun) -> Dict[str, Any]:
+        fields = {field: getattr(run, field) for field in TestRunSummary.model_fields if field != "user"}
+        return TestRunSummary(**fields).model_dump(mode="json", exclude={"user"})
+
+    @staticmethod
+    def status_event(run: TestRun) -> Dict[str, Any]:
+        return {"type": "status", "run_id": run.id, "project_id": run.project_id, "run": RunEventService.run_summary(run)}
+
+    @staticmethod
+    def messages(events: Iterable[Dict[str, Any]]) -> List[tuple]:
+        messages = []
+        for event in events:
+            data = json.dumps(event, default=str)
+            messages.append((RunEventService.run_channel(event["run_id"]), data))
+            if event.get("project_id") and event["type"] in PROJECT_EVENT_TYPES:
+                messages.append((RunEventService.project_channel(event["project_id"]), data))
+        return messages
+
+    @staticmethod
+    def publish(events: Iterable[Dict[str, Any]]):
+        """Publishes from sync code (worker, result service); one round trip per call."""
+        if not RunEventService.enabled():
+            return
+        messages = RunEventService.messages(events)
+        if not messages:
+            return
+        if RunEventService._client is None:
+            RunEventService._client = redis.Redis.from_url(settings.run_events_url)
+        try:
+            pipe = RunEventService._client.pipeline(transaction=False)
+            for channel, data in messages:
+                pipe.publish(channel, data)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"Failed to publish run events: {e}")
+
+    @staticmethod
+    async def publish_async(events: Iterable[Dict[str, Any]]):
+        if not RunEventService.enabled():
+            return
+        messages = RunEventService.messages(events)
+        if not messages:
+            return
+        try:
+            async with RunEventService.async_client().pipeline(transaction=False) as pipe:
+                for channel, data in messages:
+                    pipe.publish(channel, data)
+                await pipe.execute()
+        except redis.RedisError as e:
+            print(f"Failed to publish run events: {e}")
+
+    @staticmethod
+    def async_client() -> aioredis.Redis:
+        if RunEventService._async_client is None:
+            RunEventService._async_client = aioredis.from_url(settings.run_events_url)
+        return RunEventService._async_client
+
+    @staticmethod
+    def publish_status(run: TestRun):
+        RunEventService.publish([RunEventService.status_event(run)])
+
+    @staticmethod
+    def publish_results(session: Session, run: TestRun, case_ids: Iterable[int]):
+        """
+        Publishes the committed results of `case_ids` followed by the run's counters.
+        Reads the rows back so retries publish their merged row with its id.
+        """
+        if not RunEventService.enabled():
+            return
+        case_ids = list(case_ids)
+        # Counters were advanced with UPDATE statements, not on the instance
+        session.refresh(run)
+        results = session.exec(
+            select(TestCaseResult).where(TestCaseResult.test_run_id == run.id, TestCaseResult.test_case_id.in_(case_ids))
+        ).all() if case_ids else []
+        events = [
+            {"type": "result", "run_id": run.id, "result": TestCaseResultRead.model_validate(result).model_dump(mode="json")}
+            for result in results
+        ]
+        RunEventService.publish(events + [RunEventService.status_event(run)])
+
+    @staticmethod
+    def step_event(run_id: int, step: Dict[str, Any]) -> Dict[str, Any]:
+        return {"type": "step", "run_id": run_id, "step": step}
+
+    @staticmethod
+    async def subscribe(channels: List[str]) -> aioredis.client.PubSub:
+        pubsub = RunEventService.async_client().pubsub()
+        await pubsub.subscribe(*channels)
+        return pubsub
+
+    @staticmethod
+    async def stream(pubsub: aioredis.client.PubSub, initial: Iterable[Dict[str, Any]] = ()) -> AsyncIterator[str]:
+        """
+        Server-Sent Events from a subscription. Callers subscribe before reading
+        `initial` (the current state), so no transition between the two is lost.
+        Ends after RUN_EVENTS_STREAM_SECONDS: access was checked when the stream
+        opened, and the client re-checks it by reconnecting with a new token.
+        """
+        deadline = time.monotonic() + settings.RUN_EVENTS_STREAM_SECONDS
+        try:
+            yield "retry: 3000\n\n"
+            for event in initial:
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+            while time.monotonic() < deadline:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(SSE_KEEPALIVE_SECONDS, max(deadline - time.monotonic(), 0)))
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                data = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+                yield f"event: {json.loads(data)['type']}\ndata: {data}\n\n"
+        finally:
+            # Drops the subscribed connection; the subscriptions end with it
+            await pubsub.aclose()
+
+run_event_service = RunEventService()
@@ -0,0 +1,44 @@
+from sqlalchemy import case, literal, literal_column, or_
+from app.models import TestRun
+
+# Text a run is searched by. ix_testrun_search_trgm (migration 0002, scripts/migrate_run_search_index.py) is a
+# pg_trgm GiST index on exactly this expression, so it is written without bind parameters
+# for the planner to match it; {table} is "testrun." in queries and empty in the index.
+# Migration 0002 keeps its own copy: changing the expression takes a new revision that rebuilds the index.
+SEARCH_TEXT_SQL = (
+    "(coalesce({table}suite_name, '') || ' ' || coalesce({table}test_case_name, '') || ' ' || "
+    "left(coalesce({table}error_message, ''), 1000))"
+)
+# Nearest trigram matches taken from the index before ranking
+RUN_SEARCH_CANDIDATES = 200
+
+class RunSearchService:
+    search_text = literal_column(SEARCH_TEXT_SQL.format(table="testrun."))
+
+    @staticmethod
+    def escape_like(term: str) -> str:
+        # "!" rather than a backslash, whose literal form depends on standard_conforming_strings
+        return term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+    @staticmethod
+    def matches(term: str):
+        """Substring match over suite path, case name and error message, served by the trigram index."""
+        return RunSearchService.search_text.ilike(f"%{RunSearchService.escape_like(term)}%", escape="!")
+
+    @staticmethod
+    def distance(term: str):
+        # pg_trgm word-similarity distance (1 - word_similarity(term, text)), indexed column on the
+        # left so the GiST index returns nearest matches first instead of sorting every match
+        return RunSearchService.search_text.op("<->>")(literal(term))
+
+    @staticmethod
+    def prefix_rank(term: str):
+        """0 when the suite path or case name starts with `term`, 1 when a word does, 2 otherwise."""
+        prefix = f"{RunSearchService.escape_like(term)}%"
+        return case(
+            (or_(TestRun.suite_name.ilike(prefix, escape="!"), TestRun.test_case_name.ilike(prefix, escape="!")), 0),
+            (RunSearchService.search_text.ilike(f"% {prefix}", escape="!"), 1),
+            else_=2
+        )
+
+run_search_service = RunSearchService()
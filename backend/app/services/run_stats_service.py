@@ -0,0 +1,232 @@
+import math
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import RunDailyStats, TestCase, TestCaseResult, TestRun, TestStatus, TestSuite
+
+# Durations are kept in a mergeable log-bucket sketch: bucket i holds values in
+# (GAMMA^(i-1), GAMMA^i], so any quantile read from it is within 1% of the true
+# value and rollup rows merge by adding bucket counts
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+
+FINISHED_STATUSES = (TestStatus.PASSED, TestStatus.FAILED, TestStatus.ERROR)
+STATS_GROUPS = ("suite", "case", "browser", "device")
+COUNTERS = ("passed", "failed", "error", "duration_count", "duration_sum_ms")
+
+class RunStatsService:
+    @staticmethod
+    def sketch_add(sketch: Dict[str, int], value: Optional[float]):
+        # Cases that never reported back carry a 0 duration; they have no timing to add
+        if not value or value <= 0:
+            return
+        bucket = str(math.ceil(math.log(value, SKETCH_GAMMA)))
+        sketch[bucket] = sketch.get(bucket, 0) + 1
+
+    @staticmethod
+    def sketch_merge(sketch: Dict[str, int], other: Optional[Dict[str, int]]):
+        for bucket, count in (other or {}).items():
+            sketch[bucket] = sketch.get(bucket, 0) + count
+
+    @staticmethod
+    def sketch_quantile(sketch: Dict[str, int], q: float) -> Optional[float]:
+        total = sum(sketch.values())
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(sketch, key=int):
+            seen += sketch[bucket]
+            if seen > rank:
+                # Midpoint of the bucket, relative to its bounds
+                return round(2 * SKETCH_GAMMA ** int(bucket) / (SKETCH_GAMMA + 1), 1)
+
+    @staticmethod
+    def new_counters() -> Dict[str, Any]:
+        return {"passed": 0, "failed": 0, "error": 0, "duration_count": 0, "duration_sum_ms": 0.0, "duration_sketch": {}}
+
+    @staticmethod
+    def count_outcome(counters: Dict[str, Any], status: TestStatus, duration_ms: Optional[float]):
+        counters[status.value] += 1
+        if duration_ms and duration_ms > 0:
+            counters["duration_count"] += 1
+            counters["duration_sum_ms"] += duration_ms
+            RunStatsService.sketch_add(counters["duration_sketch"], duration_ms)
+
+    @staticmethod
+    def run_deltas(session: Session, run: TestRun) -> Dict[int, Dict[str, Any]]:
+        """Counters a finished run adds, by test_case_id (0 = the run itself)."""
+        deltas = defaultdict(RunStatsService.new_counters)
+        RunStatsService.count_outcome(deltas[0], run.status, run.duration_ms)
+        results = session.exec(
+            select(TestCaseResult.test_case_id, TestCaseResult.status, TestCaseResult.duration_ms).where(
+                TestCaseResult.test_run_id == run.id,
+                TestCaseResult.test_case_id.is_not(None)
+            )
+        ).all()
+        for case_id, status, duration_ms in results:
+            RunStatsService.count_outcome(deltas[case_id], status, duration_ms)
+        return deltas
+
+    @staticmethod
+    def record_run(session: Session, run: TestRun):
+        """
+        Adds a finished run to the daily rollups, in the caller's transaction so
+        the counts commit with the run's final status. Each run is counted once:
+        redelivered callbacks and re-run tasks find it already recorded.
+        Runs still in progress (including those queued for an auto-retry) are skipped.
+        """
+        if run.status not in FINISHED_STATUSES or not run.project_id or run.stats_recorded:
+            return
+        try:
+            # Analytics never fail the run: a rollup error only rolls back its savepoint
+            with session.begin_nested():
+                claimed = session.exec(
+                    update(TestRun)
+                    .where(TestRun.id == run.id, TestRun.stats_recorded == False)
+                    .values(stats_recorded=True)
+                ).rowcount
+                if claimed:
+                    RunStatsService.apply_deltas(session, run, RunStatsService.run_deltas(session, run))
+        except SQLAlchemyError as e:
+            print(f"Failed to record stats for run {run.id}: {e}")
+
+    @staticmethod
+    def apply_deltas(session: Session, run: TestRun, deltas: Dict[int, Dict[str, Any]]):
+        key = {
+            "project_id": run.project_id,
+            "day": run.created_at.date(),
+            "test_suite_id": run.test_suite_id,
+            "browser": run.browser,
+            "device": run.device or "",
+        }
+
+        def locked_rows() -> Dict[int, RunDailyStats]:
+            # Locked in case order, so concurrent finishing runs queue instead of deadlocking
+            rows = session.exec(
+                select(RunDailyStats)
+                .where(*(getattr(RunDailyStats, column) == value for column, value in key.items()))
+                .where(RunDailyStats.test_case_id.in_(list(deltas)))
+                .order_by(RunDailyStats.test_case_id)
+                .with_for_update()
+            ).all()
+            return {row.test_case_id: row for row in rows}
+
+        rows = locked_rows()
+        missing = [case_id for case_id in sorted(deltas) if case_id not in rows]
+        if missing:
+            try:
+                with session.begin_nested():
+                    session.add_all([RunDailyStats(**key, test_case_id=case_id, duration_sketch={}) for case_id in missing])
+                    session.flush()
+            except IntegrityError:
+                # A concurrent run created some of them first
+                pass
+            rows = locked_rows()
+
+        for case_id, delta in deltas.items():
+            row = rows[case_id]
+            for counter in COUNTERS:
+                setattr(row, counter, getattr(row, counter) + delta[counter])
+            sketch = dict(row.duration_sketch or {})
+            RunStatsService.sketch_merge(sketch, delta["duration_sketch"])
+            row.duration_sketch = sketch
+            session.add(row)
+
+    @staticmethod
+    def summarize(counters: Dict[str, Any]) -> Dict[str, Any]:
+        total = counters["passed"] + counters["failed"] + counters["error"]
+        sketch = counters["duration_sketch"]
+        return {
+            "total": total,
+            "passed": counters["passed"],
+            "failed": counters["failed"],
+            "error": counters["error"],
+            "pass_rate": round(counters["passed"] / total * 100, 1) if total else None,
+            "avg_duration_ms": round(counters["duration_sum_ms"] / counters["duration_count"], 1) if counters["duration_count"] else None,
+            "p50_duration_ms": RunStatsService.sketch_quantile(sketch, 0.5),
+            "p95_duration_ms": RunStatsService.sketch_quantile(sketch, 0.95),
+        }
+
+    @staticmethod
+    def accumulate(counters: Dict[str, Any], row: RunDailyStats):
+        for counter in COUNTERS:
+            counters[counter] += getattr(row, counter)
+        RunStatsService.sketch_merge(counters["duration_sketch"], row.duration_sketch)
+
+    @staticmethod
+    async def group_names(group_by: str, keys: Iterable[Any], session: AsyncSession) -> Dict[Any, str]:
+        if group_by not in ("suite", "case") or not keys:
+            return {}
+        model = TestSuite if group_by == "suite" else TestCase
+        result = await session.exec(select(model.id, model.name).where(model.id.in_(list(keys))))
+        return dict(result.all())
+
+    @staticmethod
+    async def project_stats(
+        project_id: int,
+        days: int,
+        session: AsyncSession,
+        test_suite_id: Optional[int] = None,
+        test_case_id: Optional[int] = None,
+        browser: Optional[str] = None,
+        device: Optional[str] = None,
+        group_by: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Totals, one entry per day of the window (oldest first, empty days
+        included) and optionally a breakdown, merged from the rollup rows.
+        Run outcomes are counted unless a case is selected or cases are the
+        breakdown, in which case per-case result outcomes are counted.
+        """
+        until = datetime.utcnow().date()
+        since = until - timedelta(days=days - 1)
+        query = select(RunDailyStats).where(RunDailyStats.project_id == project_id, RunDailyStats.day >= since)
+        if test_case_id is not None:
+            query = query.where(RunDailyStats.test_case_id == test_case_id)
+        elif group_by == "case":
+            query = query.where(RunDailyStats.test_case_id != 0)
+        else:
+            query = query.where(RunDailyStats.test_case_id == 0)
+        if test_suite_id is not None:
+            query = query.where(RunDailyStats.test_suite_id == test_suite_id)
+        if browser:
+            query = query.where(RunDailyStats.browser == browser)
+        if device is not None:
+            query = query.where(RunDailyStats.device == device)
+        rows = (await session.exec(query)).all()
+
+        totals = RunStatsService.new_counters()
+        by_day: Dict[date, Dict[str, Any]] = defaultdict(RunStatsService.new_counters)
+        by_group: Dict[Any, Dict[str, Any]] = defaultdict(RunStatsService.new_counters)
+        group_columns = {"suite": "test_suite_id", "case": "test_case_id", "browser": "browser", "device": "device"}
+        for row in rows:
+            RunStatsService.accumulate(totals, row)
+            RunStatsService.accumulate(by_day[row.day], row)
+            if group_by:
+                RunStatsService.accumulate(by_group[getattr(row, group_columns[group_by])], row)
+
+        response = {
+            "project_id": project_id,
+            "since": since,
+            "until": until,
+            "totals": RunStatsService.summarize(totals),
+            "days": [
+                {"day": since + timedelta(days=offset), **RunStatsService.summarize(by_day.get(since + timedelta(days=offset)) or RunStatsService.new_counters())}
+                for offset in range(days)
+            ],
+        }
+        if group_by:
+            names = await RunStatsService.group_names(group_by, by_group.keys(), session)
+            groups = [
+                {"key": (key or None) if group_by == "device" else key, "name": names.get(key), **RunStatsService.summarize(counters)}
+                for key, counters in by_group.items()
+            ]
+            response["groups"] = sorted(groups, key=lambda group: -group["total"])
+        return response
+
+run_stats_service = RunStatsService()
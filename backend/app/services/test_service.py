@@ -1,27 +1,29 @@
-from typing import List, Optional, Dict, Any
+import hashlib
+import json
+from typing import List, Optional, Dict, Any, Tuple
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select, or_, and_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import selectinload
 from app.models import (
-    TestSuite, TestCase, TestRun, TestCaseResult, 
+    TestSuite, TestCase, TestRun, TestCaseResult, RunSettingsSnapshot,
     AuditLog, ExecutionMode, TestStatus
 )
 from app.core.storage import minio_client
+from app.services.flakiness_service import flakiness_service
 
 from sqlmodel import Session, select
 
 class TestService:
     @staticmethod
-    async def get_effective_settings(suite_id: int, session: AsyncSession) -> Dict[str, Any]:
-        suite = await session.get(TestSuite, suite_id)
-        if not suite:
-            return {"headers": {}, "params": {}, "allowed_domains": [], "domain_settings": {}}
-        
-        current_settings = suite.settings or {"headers": {}, "params": {}}
-        
-        if suite.inherit_settings and suite.parent_id:
-            parent_settings = await TestService.get_effective_settings(suite.parent_id, session)
-            
+    def merge_settings(parent_settings: Optional[Dict[str, Any]], suite_settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Effective settings of a suite given its parent's effective settings.
+        `parent_settings` is None when the suite does not inherit.
+        """
+        current_settings = suite_settings or {"headers": {}, "params": {}}
+
+        if parent_settings is not None:
             merged_headers = {**parent_settings.get("headers", {}), **current_settings.get("headers", {})}
             merged_params = {**parent_settings.get("params", {}), **current_settings.get("params", {})}
             
@@ -57,16 +59,79 @@ class TestService:
                 "headers": merged_headers, 
                 "params": merged_params,
                 "allowed_domains": merged_domains,
-                "domain_settings": merged_domain_settings
+                "domain_settings": merged_domain_settings,
+                "network_capture": current_settings.get("network_capture") or parent_settings.get("network_capture")
             }
         
         return {
             "headers": current_settings.get("headers", {}),
             "params": current_settings.get("params", {}),
             "allowed_domains": current_settings.get("allowed_domains", []),
-            "domain_settings": current_settings.get("domain_settings", {})
+            "domain_settings": current_settings.get("domain_settings", {}),
+            "network_capture": current_settings.get("network_capture")
         }
 
+    @staticmethod
+    def settings_fingerprint(effective_settings: Dict[str, Any]) -> str:
+        # Key order in stored JSON is not stable, so hash a canonical encoding
+        canonical = json.dumps(
+            {key: effective_settings.get(key) for key in ("headers", "params", "allowed_domains", "domain_settings", "network_capture")},
+            sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def snapshot_fields(effective_settings: Dict[str, Any]) -> Dict[str, Any]:
+        # The part of the effective settings a run executes with
+        return {
+            "headers": effective_settings.get("headers", {}),
+            "params": effective_settings.get("params", {}),
+            "allowed_domains": effective_settings.get("allowed_domains", []),
+            "domain_settings": effective_settings.get("domain_settings", {}),
+            "network_capture": effective_settings.get("network_capture"),
+        }
+
+    @staticmethod
+    async def get_settings_snapshots(snapshots: Dict[str, Dict[str, Any]], session: AsyncSession) -> Dict[str, int]:
+        """
+        Snapshot ids for `snapshots` (fingerprint -> snapshot fields), inserting
+        those not stored yet. The caller commits.
+        """
+        if not snapshots:
+            return {}
+        result = await session.exec(select(RunSettingsSnapshot.hash, RunSettingsSnapshot.id).where(RunSettingsSnapshot.hash.in_(snapshots)))
+        snapshot_ids = dict(result.all())
+        missing = [{"hash": fingerprint, **fields} for fingerprint, fields in snapshots.items() if fingerprint not in snapshot_ids]
+        if missing:
+            # Rows a concurrent request stored first are skipped, the rest still insert; then read all of them back
+            dialect_insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+            await session.execute(dialect_insert(RunSettingsSnapshot).on_conflict_do_nothing(index_elements=["hash"]), missing)
+            result = await session.exec(select(RunSettingsSnapshot.hash, RunSettingsSnapshot.id).where(RunSettingsSnapshot.hash.in_(snapshots)))
+            snapshot_ids = dict(result.all())
+        return snapshot_ids
+
+    @staticmethod
+    def expand_run_settings(snapshot: Optional[RunSettingsSnapshot]) -> Dict[str, Any]:
+        """TestRunRead fields backed by the run's settings snapshot."""
+        if not snapshot:
+            return {}
+        return {
+            "request_params": snapshot.params,
+            "allowed_domains": snapshot.allowed_domains,
+            "domain_settings": snapshot.domain_settings,
+        }
+
+    @staticmethod
+    async def get_effective_settings(suite_id: int, session: AsyncSession) -> Dict[str, Any]:
+        suite = await session.get(TestSuite, suite_id)
+        if not suite:
+            return {"headers": {}, "params": {}, "allowed_domains": [], "domain_settings": {}}
+        
+        parent_settings = None
+        if suite.inherit_settings and suite.parent_id:
+            parent_settings = await TestService.get_effective_settings(suite.parent_id, session)
+        return TestService.merge_settings(parent_settings, suite.settings)
+
     @staticmethod
     async def get_suite_path(suite_id: int, session: AsyncSession) -> str:
         suite = await session.get(TestSuite, suite_id)
@@ -77,77 +142,224 @@ class TestService:
             return f"{parent_path} / {suite.name}" if parent_path else suite.name
         return suite.name
 
+    @staticmethod
+    async def load_suite_tree(suite_id: int, session: AsyncSession) -> Tuple[Dict[int, TestSuite], Dict[int, List[int]]]:
+        """
+        A suite's ancestor chain and whole subtree in one query (two recursive
+        CTEs), keyed by id, plus each loaded suite's children in id order.
+        """
+        ancestors = select(TestSuite.id, TestSuite.parent_id).where(TestSuite.id == suite_id).cte("suite_ancestors", recursive=True)
+        ancestors = ancestors.union(
+            select(TestSuite.id, TestSuite.parent_id).join(ancestors, TestSuite.id == ancestors.c.parent_id)
+        )
+        subtree = select(TestSuite.id).where(TestSuite.id == suite_id).cte("suite_descendants", recursive=True)
+        subtree = subtree.union_all(
+            select(TestSuite.id).join(subtree, TestSuite.parent_id == subtree.c.id)
+        )
+        result = await session.exec(
+            select(TestSuite)
+            .where(or_(TestSuite.id.in_(select(ancestors.c.id)), TestSuite.id.in_(select(subtree.c.id))))
+            .order_by(TestSuite.id)
+        )
+        suites = {suite.id: suite for suite in result.all()}
+        children: Dict[int, List[int]] = {}
+        for suite in suites.values():
+            if suite.parent_id in suites:
+                children.setdefault(suite.parent_id, []).append(suite.id)
+        return suites, children
+
+    @staticmethod
+    def resolve_suite_tree(suites: Dict[int, TestSuite]) -> Tuple[Dict[int, str], Dict[int, Dict[str, Any]]]:
+        """
+        Display path and effective settings of every suite in `suites`, which
+        must include each suite's ancestors. Each suite is merged only once.
+        """
+        paths: Dict[int, str] = {}
+        settings: Dict[int, Dict[str, Any]] = {}
+
+        def resolve(suite_id: int):
+            if suite_id in paths:
+                return
+            suite = suites[suite_id]
+            parent_settings = None
+            if suite.parent_id in suites:
+                resolve(suite.parent_id)
+                parent_path = paths[suite.parent_id]
+                paths[suite_id] = f"{parent_path} / {suite.name}" if parent_path else suite.name
+                if suite.inherit_settings:
+                    parent_settings = settings[suite.parent_id]
+            else:
+                paths[suite_id] = suite.name
+            settings[suite_id] = TestService.merge_settings(parent_settings, suite.settings)
+
+        for suite_id in suites:
+            resolve(suite_id)
+        return paths, settings
+
+    @staticmethod
+    async def plan_run_targets(suite_id: int, case_id: Optional[int], session: AsyncSession) -> List[Dict[str, Any]]:
+        """
+        What POST /runs queues, before the browser x device expansion: one target
+        per CONTINUOUS suite and one per direct case of a SEPARATE suite, each
+        with its suite path and effective settings. The suite tree is loaded
+        once and the cases of all SEPARATE suites with a single query.
+        """
+        suites, children = await TestService.load_suite_tree(suite_id, session)
+        if suite_id not in suites:
+            return []
+        paths, effective_settings = TestService.resolve_suite_tree(suites)
+
+        def target(s_id: int, case: Any = None) -> Dict[str, Any]:
+            return {
+                "suite_id": s_id,
+                "case_id": case.id if case else None,
+                "case_name": case.name if case else None,
+                "suite_path": paths[s_id],
+                "settings": effective_settings[s_id],
+            }
+
+        # If a specific case is requested, just run that case
+        if case_id:
+            case = await session.get(TestCase, case_id)
+            return [{**target(suite_id), "case_id": case_id, "case_name": case.name if case else None}]
+
+        # SEPARATE suites run each direct case on its own and all their sub-modules;
+        # CONTINUOUS suites run as one and only surface SEPARATE descendants
+        runnable: List[Tuple[int, bool]] = []
+        stack = [(suite_id, True)]
+        while stack:
+            s_id, processed = stack.pop()
+            separate = suites[s_id].execution_mode == ExecutionMode.SEPARATE
+            if processed:
+                runnable.append((s_id, separate))
+            stack.extend(
+                (child_id, (processed and separate) or suites[child_id].execution_mode == ExecutionMode.SEPARATE)
+                for child_id in reversed(children.get(s_id, []))
+            )
+
+        separate_ids = [s_id for s_id, separate in runnable if separate]
+        cases_by_suite: Dict[int, List[Any]] = {}
+        if separate_ids:
+            # Only the columns a run row needs; steps can be large
+            result = await session.exec(
+                select(TestCase.id, TestCase.name, TestCase.test_suite_id)
+                .where(TestCase.test_suite_id.in_(separate_ids))
+                .order_by(TestCase.id)
+            )
+            for case in result.all():
+                cases_by_suite.setdefault(case.test_suite_id, []).append(case)
+
+        targets = []
+        for s_id, separate in runnable:
+            if separate:
+                targets.extend(target(s_id, case) for case in cases_by_suite.get(s_id, []))
+            else:
+                targets.append(target(s_id))
+        return targets
+
     @staticmethod
     def get_effective_settings_sync(suite_id: int, session: Session) -> Dict[str, Any]:
         suite = session.get(TestSuite, suite_id)
         if not suite:
             return {"headers": {}, "params": {}, "allowed_domains": [], "domain_settings": {}}
         
-        current_settings = suite.settings or {"headers": {}, "params": {}}
-        
+        parent_settings = None
         if suite.inherit_settings and suite.parent_id:
             parent_settings = TestService.get_effective_settings_sync(suite.parent_id, session)
-            
-            merged_headers = {**parent_settings.get("headers", {}), **current_settings.get("headers", {})}
-            merged_params = {**parent_settings.get("params", {}), **current_settings.get("params", {})}
-            
-            def normalize_domain(d):
-                if not d: return None
-                if isinstance(d, str): return {"domain": d, "headers": True, "params": False}
-                if isinstance(d, dict) and "domain" not in d: return None
-                return d
-
-            merged_domains_map = {}
-            for d in parent_settings.get("allowed_domains", []):
-                norm = normalize_domain(d)
-                if norm: merged_domains_map[norm["domain"]] = norm
-            for d in current_settings.get("allowed_domains", []):
-                norm = normalize_domain(d)
-                if norm: merged_domains_map[norm["domain"]] = norm
-                
-            merged_domains = list(merged_domains_map.values())
-            
-            parent_domain_settings = parent_settings.get("domain_settings", {})
-            current_domain_settings = current_settings.get("domain_settings", {})
-            merged_domain_settings = {**parent_domain_settings}
-            for domain, settings in current_domain_settings.items():
-                if domain in merged_domain_settings:
-                    merged_domain_settings[domain] = {
-                        "headers": {**merged_domain_settings[domain].get("headers", {}), **settings.get("headers", {})},
-                        "params": {**merged_domain_settings[domain].get("params", {}), **settings.get("params", {})}
-                    }
-                else:
-                    merged_domain_settings[domain] = settings
-                    
-            return {
-                "headers": merged_headers, 
-                "params": merged_params,
-                "allowed_domains": merged_domains,
-                "domain_settings": merged_domain_settings
-            }
-        
-        return {
-            "headers": current_settings.get("headers", {}),
-            "params": current_settings.get("params", {}),
-            "allowed_domains": current_settings.get("allowed_domains", []),
-            "domain_settings": current_settings.get("domain_settings", {})
-        }
+        return TestService.merge_settings(parent_settings, suite.settings)
 
     @staticmethod
     def collect_cases_recursive_sync(suite_id: int, session: Session) -> List[TestCase]:
-        cases = []
-        suite = session.get(TestSuite, suite_id)
-        if suite:
-            cases.extend(suite.test_cases)
-            
-        result = session.exec(select(TestSuite).where(TestSuite.parent_id == suite_id))
-        subs = result.all()
-        for sub in subs:
-            if sub.execution_mode == ExecutionMode.SEPARATE:
-                continue
-            cases.extend(TestService.collect_cases_recursive_sync(sub.id, session))
+        """
+        Cases of a suite and its non-SEPARATE sub-modules in depth-first order.
+        One recursive CTE finds the subtree; its suites and cases are then
+        loaded with one query each and walked in memory.
+        """
+        subtree = select(TestSuite.id).where(TestSuite.id == suite_id).cte("suite_subtree", recursive=True)
+        subtree = subtree.union_all(
+            select(TestSuite.id)
+            .join(subtree, TestSuite.parent_id == subtree.c.id)
+            .where(TestSuite.execution_mode != ExecutionMode.SEPARATE)
+        )
+        suites = session.exec(select(TestSuite).where(TestSuite.id.in_(select(subtree.c.id))).order_by(TestSuite.id)).all()
+        cases = session.exec(select(TestCase).where(TestCase.test_suite_id.in_(select(subtree.c.id))).order_by(TestCase.id)).all()
+
+        children: Dict[int, List[int]] = {}
+        for suite in suites:
+            if suite.id != suite_id:
+                children.setdefault(suite.parent_id, []).append(suite.id)
+        cases_by_suite: Dict[int, List[TestCase]] = {}
+        for case in cases:
+            cases_by_suite.setdefault(case.test_suite_id, []).append(case)
+
+        ordered = []
+        stack = [suite_id]
+        while stack:
+            current = stack.pop()
+            ordered.extend(cases_by_suite.get(current, []))
+            stack.extend(reversed(children.get(current, [])))
+        return ordered
+
+    @staticmethod
+    def load_effective_settings_sync(suite_ids: List[int], session: Session) -> Dict[int, Dict[str, Any]]:
+        """
+        Effective settings for each of `suite_ids`. Their ancestor chains are
+        fetched with one recursive CTE and every suite is merged at most once.
+        """
+        if not suite_ids:
+            return {}
+        chain = select(TestSuite.id, TestSuite.parent_id).where(TestSuite.id.in_(suite_ids)).cte("suite_chain", recursive=True)
+        chain = chain.union(
+            select(TestSuite.id, TestSuite.parent_id).join(chain, TestSuite.id == chain.c.parent_id)
+        )
+        suites = {suite.id: suite for suite in session.exec(select(TestSuite).where(TestSuite.id.in_(select(chain.c.id)))).all()}
+
+        resolved: Dict[int, Dict[str, Any]] = {}
+
+        def resolve(suite_id: int) -> Dict[str, Any]:
+            if suite_id in resolved:
+                return resolved[suite_id]
+            suite = suites.get(suite_id)
+            if not suite:
+                return {"headers": {}, "params": {}, "allowed_domains": [], "domain_settings": {}}
+            parent_settings = None
+            if suite.inherit_settings and suite.parent_id:
+                parent_settings = resolve(suite.parent_id)
+            resolved[suite_id] = TestService.merge_settings(parent_settings, suite.settings)
+            return resolved[suite_id]
+
+        return {suite_id: resolve(suite_id) for suite_id in suite_ids}
+
+    @staticmethod
+    def load_run_cases_sync(run: TestRun, session: Session) -> List[TestCase]:
+        # Filter cases if specific case_id is requested
+        if run.test_case_id:
+            case = session.get(TestCase, run.test_case_id)
+            if not case:
+                raise Exception(f"Test Case {run.test_case_id} not found")
+            return [case]
+        # Load all cases recursively if no specific case_id (Continuous mode)
+        cases = TestService.collect_cases_recursive_sync(run.test_suite_id, session)
+        cases = flakiness_service.filter_cases(run, cases)
+        # Auto-retry attempts only re-execute the cases that failed the previous attempt
+        if run.attempt > 1 and run.retry_case_ids is not None:
+            retry_ids = set(run.retry_case_ids)
+            cases = [case for case in cases if case.id in retry_ids]
         return cases
 
+    @staticmethod
+    def load_run_payload_sync(run: TestRun, session: Session) -> Tuple[List[TestCase], List[Dict[str, Any]]]:
+        """Cases to execute for a run, plus their engine serialization with effective settings."""
+        cases = TestService.load_run_cases_sync(run, session)
+        effective_settings = TestService.load_effective_settings_sync(list({case.test_suite_id for case in cases}), session)
+        test_cases_data = [{
+            "id": case.id,
+            "name": case.name,
+            "steps": [step.dict() if hasattr(step, 'dict') else step for step in case.steps],
+            "settings": effective_settings[case.test_suite_id],
+        } for case in cases]
+        return cases, test_cases_data
+
     @staticmethod
     async def count_recursive_items(suite_id: int, session: AsyncSession):
         result = await session.exec(select(TestCase).where(TestCase.test_suite_id == suite_id))
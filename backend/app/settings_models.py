@@ -3,6 +3,11 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 
+class QuarantineMode(str, Enum):
+    OFF = "off"
+    NON_BLOCKING = "non_blocking" # Quarantined cases run, but their failures don't fail the run
+    SEPARATE = "separate" # Quarantined cases run in their own run on the quarantine queue
+
 class UserSettings(SQLModel, table=True):
     __tablename__ = "user_settings"
     
@@ -22,6 +27,7 @@ class UserSettings(SQLModel, table=True):
     max_retries: int = Field(default=3)
     parallel_execution: bool = Field(default=False)
     max_parallel_tests: int = Field(default=3)
+    quarantine_mode: str = Field(default=QuarantineMode.OFF.value, sa_column_kwargs={"server_default": QuarantineMode.OFF.value}) # Handling of known-flaky cases in this user's runs
     
     # Multi-Browser Testing
     multi_browser_enabled: bool = Field(default=False)
@@ -65,6 +71,7 @@ class UserSettingsRead(SQLModel):
     max_retries: int
     parallel_execution: bool
     max_parallel_tests: int
+    quarantine_mode: str
     multi_browser_enabled: bool
     selected_browsers: List[str]
     multi_device_enabled: bool
@@ -92,6 +99,7 @@ class UserSettingsUpdate(SQLModel):
     max_retries: Optional[int] = None
     parallel_execution: Optional[bool] = None
     max_parallel_tests: Optional[int] = None
+    quarantine_mode: Optional[QuarantineMode] = None
     multi_browser_enabled: Optional[bool] = None
     selected_browsers: Optional[List[str]] = None
     multi_device_enabled: Optional[bool] = None
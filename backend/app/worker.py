@@ -1,8 +1,14 @@
 from celery import Celery
-from sqlmodel import Session, create_engine
+from sqlmodel import Session, create_engine, select
 from app.core.celery_app import celery_app
 from app.core.config import settings
 from app.models import TestRun, TestStatus, ExecutionMode
+from app.services.run_event_service import run_event_service
+from app.services.run_stats_service import run_stats_service
+from app.services.flakiness_service import flakiness_service
+from datetime import datetime
+import queue
+import threading
 import requests
 import time
 
@@ -13,166 +19,334 @@ sync_engine = create_engine(sync_db_url, echo=True)
 
 EXECUTION_ENGINE_URL = settings.EXECUTION_ENGINE_URL
 
+# Streamed case results are written in batches of up to RESULT_BATCH_SIZE rows,
+# or at least every RESULT_FLUSH_INTERVAL seconds while a run is in progress
+RESULT_BATCH_SIZE = 50
+RESULT_FLUSH_INTERVAL = 2.0
+
+# Step types the engine can execute without a browser
+API_STEP_TYPES = {"http-request", "feed-check"}
+
+def build_engine_payload(run: TestRun, test_cases_data: list) -> dict:
+    print(f"DEBUG: Found {len(test_cases_data)} cases to run.")
+    snapshot = run.settings_snapshot
+
+    return {
+        "runId": run.id,
+        "testCases": test_cases_data,
+        "browser": run.browser,
+        "device": run.device,
+        "attempt": run.attempt,
+        "globalSettings": {
+            "headers": (snapshot.headers if snapshot else None) or {},
+            "params": (snapshot.params if snapshot else None) or {},
+            "allowed_domains": (snapshot.allowed_domains if snapshot else None) or [],
+            "domain_settings": (snapshot.domain_settings if snapshot else None) or {},
+            "network_capture": snapshot.network_capture if snapshot else None
+        }
+    }
+
+def is_api_only(test_cases_data: list) -> bool:
+    """
+    True when every case consists only of HTTP steps. Both execution backends
+    run such payloads on a request context without leasing a browser.
+    """
+    return bool(test_cases_data) and all(
+        step.get("type") in API_STEP_TYPES
+        for case_data in test_cases_data
+        for step in case_data.get("steps") or []
+    )
+
+def mark_run_error(run_id: int, message: str):
+    with Session(sync_engine) as session:
+        run = session.get(TestRun, run_id)
+        if run:
+            run.status = TestStatus.ERROR
+            run.error_message = message
+            session.add(run)
+            run_stats_service.record_run(session, run)
+            session.commit()
+            run_event_service.publish_status(run)
+
+def plan_shards(run: TestRun, cases_to_run, session: Session, api_only: bool = False) -> list:
+    """
+    Splits a CONTINUOUS run's cases into contiguous shards when the run owner
+    enabled parallel_execution, capped by max_parallel_tests. Contiguous slices
+    keep each shard's cases in suite order. API-only runs are never sharded:
+    they take milliseconds and hold no browser.
+    """
+    from app.settings_models import UserSettings
+
+    if run.test_case_id or len(cases_to_run) < 2 or not run.user_id or api_only:
+        return [cases_to_run]
+    user_settings = session.exec(select(UserSettings).where(UserSettings.user_id == run.user_id)).first()
+    if not user_settings or not user_settings.parallel_execution:
+        return [cases_to_run]
+
+    shard_count = max(1, min(user_settings.max_parallel_tests, len(cases_to_run)))
+    size, extra = divmod(len(cases_to_run), shard_count)
+    shards = []
+    start = 0
+    for index in range(shard_count):
+        end = start + size + (1 if index < extra else 0)
+        shards.append(cases_to_run[start:end])
+        start = end
+    return shards
+
+def shard_payloads(payload: dict, shards: list) -> list:
+    if len(shards) == 1:
+        return [payload]
+    cases_data = {case_data["id"]: case_data for case_data in payload["testCases"]}
+    return [
+        {**payload, "testCases": [cases_data[case.id] for case in shard], "shard": {"index": index, "count": len(shards)}}
+        for index, shard in enumerate(shards)
+    ]
+
+def post_to_engine(payload: dict, **kwargs) -> requests.Response:
+    """
+    POSTs a run to the engine, backing off while it reports being at capacity
+    (429 + Retry-After) for up to ENGINE_BUSY_TIMEOUT seconds.
+    """
+    deadline = time.monotonic() + settings.ENGINE_BUSY_TIMEOUT
+    while True:
+        response = requests.post(EXECUTION_ENGINE_URL, json=payload, **kwargs)
+        if response.status_code != 429:
+            return response
+        try:
+            retry_after = float(response.headers.get("Retry-After", 5))
+        except ValueError:
+            retry_after = 5
+        if time.monotonic() + retry_after > deadline:
+            return response
+        print(f"Execution Engine at capacity for run {payload.get('runId')}, retrying in {retry_after:.0f}s")
+        time.sleep(retry_after)
+
+def stream_engine_events(payload: dict, events: queue.Queue, shard_index: int):
+    # Runs in a dispatcher thread: only HTTP happens here, the DB session stays on the task thread
+    from app.services.result_service import result_service
+
+    try:
+        response = post_to_engine({**payload, "stream": True}, stream=True)
+        if response.status_code == 200:
+            for event in result_service.iter_engine_events(response):
+                events.put((shard_index, event))
+        else:
+            events.put((shard_index, {"type": "error", "error": response.text, "shard": payload.get("shard")}))
+    except Exception as e:
+        events.put((shard_index, {"type": "error", "error": str(e), "shard": payload.get("shard")}))
+    finally:
+        events.put((shard_index, None))
+
 @celery_app.task(name="app.worker.run_test_suite")
 def run_test_suite(run_id: int):
+    # Callback dispatch hands the run to the engine; the in-process backend always runs it here
+    if settings.EXECUTION_DISPATCH_MODE == "callback" and settings.EXECUTION_BACKEND != "python":
+        return dispatch_test_suite(run_id)
+
     with Session(sync_engine) as session:
         run = session.get(TestRun, run_id)
         if not run:
             print(f"Run {run_id} not found")
             return
-        
+
         print(f"Starting run {run_id}")
         print(f"DEBUG: Run attributes: {run}")
         try:
              print(f"DEBUG: run.browser = {run.browser}")
         except Exception as e:
              print(f"DEBUG: Could not access run.browser: {e}")
-        
+
         run.status = TestStatus.RUNNING
         session.add(run)
         session.commit()
-        
+
+        quarantine_run = None
         try:
-            from app.models import TestSuite, TestCase
             from app.services.test_service import test_service
-            
-            # Filter cases if specific case_id is requested
-            if run.test_case_id:
-                case = session.get(TestCase, run.test_case_id)
-                if not case:
-                    raise Exception(f"Test Case {run.test_case_id} not found")
-                cases_to_run = [case]
+            from app.services.result_service import result_service
+
+            quarantine_run = flakiness_service.plan_quarantine(session, run)
+            cases_to_run, test_cases_data = test_service.load_run_payload_sync(run, session)
+            payload = build_engine_payload(run, test_cases_data)
+            api_only = is_api_only(test_cases_data)
+            shards = plan_shards(run, cases_to_run, session, api_only=api_only)
+            payloads = shard_payloads(payload, shards)
+            if api_only:
+                print(f"DEBUG: Run {run.id} has only HTTP steps, it runs without a browser")
+
+            print(f"DEBUG: Sending payload to execution engine in {len(payloads)} shard(s): {payload}")
+
+            # Reset counters; they are advanced as each case result streams in
+            attempt = run.attempt
+            result_service.begin_attempt(run, len(cases_to_run), len(payloads))
+            session.add(run)
+            session.commit()
+            run_event_service.publish_status(run)
+            flakiness_service.enqueue_quarantine_run(quarantine_run)
+
+            events = queue.Queue()
+            if settings.EXECUTION_BACKEND == "python":
+                # In-process: every shard runs on this worker's Playwright event loop and reports the same events
+                from app.runner.runner import run_in_process
+                run_in_process(payloads, events)
             else:
-                # Load all cases recursively if no specific case_id (Continuous mode)
-                cases_to_run = test_service.collect_cases_recursive_sync(run.test_suite_id, session)
-
-            # Serialize test cases with their effective settings
-            test_cases_data = []
-            for case in cases_to_run:
-                case_settings = test_service.get_effective_settings_sync(case.test_suite_id, session)
-                
-                test_cases_data.append({
-                    "id": case.id,
-                    "name": case.name,
-                    "steps": [step.dict() if hasattr(step, 'dict') else step for step in case.steps],
-                    "settings": case_settings,
-                })
-
-            print(f"DEBUG: Found {len(cases_to_run)} cases to run. Serialized data: {test_cases_data}")
-
-            payload = {
-                "runId": run_id,
-                "testCases": test_cases_data,
-                "browser": run.browser,
-                "device": run.device,
-                "globalSettings": {
-                    "headers": run.request_headers or {},
-                    "params": run.request_params or {},
-                    "allowed_domains": run.allowed_domains or [],
-                    "domain_settings": run.domain_settings or {}
-                }
-            }
-            
-            print(f"DEBUG: Sending payload to execution engine: {payload}")
-
-            # Call Node.js Execution Engine
-            response = requests.post(EXECUTION_ENGINE_URL, json=payload)
-            
-            if response.status_code == 200:
-                result = response.json()
-                # Update test run with results
-                run.status = TestStatus.PASSED if result.get("status") == "passed" else TestStatus.FAILED
-                run.duration_ms = result.get("duration_ms")
-                run.error_message = result.get("error")
-                run.trace_url = result.get("trace")
-                run.video_url = result.get("video")
-                run.screenshots = result.get("screenshots", [])
-                run.response_status = result.get("response_status")
-                run.request_headers = result.get("request_headers")
-                run.response_headers = result.get("response_headers")
-                run.network_events = result.get("network_events")
-                run.execution_log = result.get("execution_log") # Save execution log
-                
-                # Save individual test case results
-                from app.models import TestCaseResult
-                
-                # Clear existing results if any (for retries)
-                # session.exec(delete(TestCaseResult).where(TestCaseResult.test_run_id == run_id))
-                
-                test_results = result.get("results", [])
-                
-                # Map results by ID (preferred) or Name (fallback)
-                results_by_id = {}
-                results_by_name = {}
-                for res in test_results:
-                    if res.get("test_case_id"):
-                        results_by_id[res.get("test_case_id")] = res
-                    results_by_name[res.get("test_name")] = res
-                
-                passed_count = 0
-                failed_count = 0
-                
-                # Create results for all expected cases
-                for case in cases_to_run:
-                    case_res = results_by_id.get(case.id) or results_by_name.get(case.name)
-                    
-                    if case_res:
-                        status = TestStatus.PASSED if case_res.get("status") == "passed" else TestStatus.FAILED
-                        if status == TestStatus.PASSED:
-                            passed_count += 1
-                        else:
-                            failed_count += 1
-                            
-                        test_result = TestCaseResult(
-                            test_run_id=run.id,
-                            test_name=case.name,
-                            status=status,
-                            duration_ms=case_res.get("duration_ms", 0),
-                            error_message=case_res.get("error"),
-                            trace_url=case_res.get("trace"),
-                            video_url=case_res.get("video"),
-                            screenshots=case_res.get("screenshots", []),
-                            response_status=case_res.get("response_status"),
-                            response_headers=case_res.get("response_headers"),
-                            response_body=case_res.get("response_body"),
-                            request_headers=case_res.get("request_headers"),
-                            request_body=case_res.get("request_body"),
-                            request_url=case_res.get("request_url"),
-                            request_method=case_res.get("request_method"),
-                            request_params=case_res.get("request_params")
-                        )
-                        session.add(test_result)
+                # Call Node.js Execution Engine once per shard, streaming one event per finished test case
+                for index, shard_payload in enumerate(payloads):
+                    threading.Thread(target=stream_engine_events, args=(shard_payload, events, index), daemon=True).start()
+
+            case_index = result_service.index_cases(cases_to_run)
+            recorded_case_ids = set()
+            pending_rows = []
+            last_flush = time.monotonic()
+            summary = None
+            open_streams = len(payloads)
+
+            def flush_results():
+                # One multi-row insert plus a counter update per batch keeps partial progress visible
+                result_service.record_results(session, run_id, attempt, pending_rows)
+                session.commit()
+                if pending_rows:
+                    run_event_service.publish_results(session, run, [row["test_case_id"] for row in pending_rows])
+                pending_rows.clear()
+
+            while open_streams:
+                try:
+                    _, event = events.get(timeout=RESULT_FLUSH_INTERVAL)
+                except queue.Empty:
+                    event = {}
+                if event is None:
+                    open_streams -= 1
+                    continue
+
+                event_type = event.get("type")
+                if event_type == "result":
+                    case = result_service.match_case(case_index, event.get("result", {}))
+                    if case and case.id not in recorded_case_ids:
+                        recorded_case_ids.add(case.id)
+                        pending_rows.append(result_service.build_result_row(run_id, case, event["result"]))
+                elif event_type == "step":
+                    # Progress only: relayed to live subscribers, never stored
+                    run_event_service.publish([run_event_service.step_event(run_id, event.get("step") or {})])
+                elif event_type in ("complete", "error"):
+                    if len(payloads) == 1:
+                        if event_type == "error":
+                            raise Exception(f"Execution Engine failed: {event.get('error')}")
+                        summary = event
                     else:
-                        # Case was expected but not found in results -> Skipped or Error
-                        # We mark it as ERROR/FAILED so the user knows it didn't run
-                        failed_count += 1
-                        test_result = TestCaseResult(
-                            test_run_id=run.id,
-                            test_name=case.name,
-                            status=TestStatus.FAILED,
-                            duration_ms=0,
-                            error_message="Test execution skipped or crashed before completion"
-                        )
-                        session.add(test_result)
-
-                run.total_tests = len(cases_to_run)
-                run.passed_tests = passed_count
-                run.failed_tests = failed_count
-                
-                # Update main run status based on aggregated results
-                if failed_count > 0:
-                    run.status = TestStatus.FAILED
-                else:
-                    run.status = TestStatus.PASSED
-            else:
-                run.status = TestStatus.ERROR
-                run.error_message = f"Execution Engine failed: {response.text}"
-                
+                        # Shard artifacts are linked to result rows, so write the shard's rows first
+                        flush_results()
+                        last_flush = time.monotonic()
+                        result_service.accumulate_shard_summary(session, run, event)
+                        session.commit()
+                        run_event_service.publish_status(run)
+
+                if pending_rows and (len(pending_rows) >= RESULT_BATCH_SIZE or time.monotonic() - last_flush >= RESULT_FLUSH_INTERVAL):
+                    flush_results()
+                    last_flush = time.monotonic()
+
+            flush_results()
+            if len(payloads) == 1 and summary is None:
+                raise Exception("Execution Engine stream ended before the run completed")
+
+            result_service.finalize_run(session, run, summary, cases_to_run, recorded_case_ids)
+
         except Exception as e:
             print(f"Error in run {run_id}: {e}")
             run.status = TestStatus.ERROR
             run.error_message = str(e)
-        
+            if quarantine_run in session.new:
+                # Never enqueued; don't leave it PENDING
+                session.expunge(quarantine_run)
+
         session.add(run)
+        run_stats_service.record_run(session, run)
         session.commit()
+        run_event_service.publish_status(run)
         print(f"Finished run {run_id} with status {run.status}")
+
+def dispatch_test_suite(run_id: int):
+    """
+    Non-blocking variant of run_test_suite: builds the payload, releases the DB
+    session and hands the run to the engine, which reports each case result and
+    the final summary to /api/runs/{id}/results and /api/runs/{id}/complete.
+    """
+    if not settings.ENGINE_CALLBACK_URL or not settings.ENGINE_CALLBACK_SECRET:
+        # The engine could not report back, or every report would be rejected, and the run would never finish
+        mark_run_error(run_id, "Callback dispatch requires ENGINE_CALLBACK_URL and ENGINE_CALLBACK_SECRET to be set")
+        return
+
+    with Session(sync_engine) as session:
+        run = session.get(TestRun, run_id)
+        if not run:
+            print(f"Run {run_id} not found")
+            return
+
+        print(f"Dispatching run {run_id}")
+        quarantine_run = None
+        try:
+            from app.services.test_service import test_service
+            from app.services.result_service import result_service
+
+            quarantine_run = flakiness_service.plan_quarantine(session, run)
+            cases_to_run, test_cases_data = test_service.load_run_payload_sync(run, session)
+            payload = build_engine_payload(run, test_cases_data)
+            payloads = shard_payloads(payload, plan_shards(run, cases_to_run, session, api_only=is_api_only(test_cases_data)))
+
+            run.status = TestStatus.RUNNING
+            result_service.begin_attempt(run, len(cases_to_run), len(payloads))
+            result_service.extend_callback_deadline(run)
+            session.add(run)
+            session.commit()
+            run_event_service.publish_status(run)
+            flakiness_service.enqueue_quarantine_run(quarantine_run)
+        except Exception as e:
+            print(f"Error in run {run_id}: {e}")
+            run.status = TestStatus.ERROR
+            run.error_message = str(e)
+            if quarantine_run in session.new:
+                session.expunge(quarantine_run)
+            session.add(run)
+            run_stats_service.record_run(session, run)
+            session.commit()
+            run_event_service.publish_status(run)
+            return
+
+    # The DB connection is back in the pool before we talk to the engine
+    for shard_payload in payloads:
+        shard_payload["callbackUrl"] = f"{settings.ENGINE_CALLBACK_URL}/runs/{run_id}"
+        shard_payload["callbackToken"] = settings.ENGINE_CALLBACK_SECRET
+        try:
+            response = post_to_engine(shard_payload, timeout=30)
+            if response.status_code != 202:
+                mark_run_error(run_id, f"Execution Engine failed: {response.text}")
+                return
+        except Exception as e:
+            print(f"Error dispatching run {run_id}: {e}")
+            mark_run_error(run_id, str(e))
+            return
+
+@celery_app.task(name="app.worker.reap_stale_runs")
+def reap_stale_runs():
+    """
+    Marks callback runs the engine stopped reporting on (a crashed engine, a
+    lost `complete` callback) as ERROR once their deadline has passed.
+    """
+    with Session(sync_engine) as session:
+        stale_ids = session.exec(
+            select(TestRun.id).where(TestRun.status == TestStatus.RUNNING, TestRun.callback_deadline_at < datetime.utcnow())
+        ).all()
+
+    for run_id in stale_ids:
+        with Session(sync_engine) as session:
+            run = session.get(TestRun, run_id, with_for_update=True)
+            # Re-checked under the lock: a late callback may have finished the run or extended its deadline
+            if not run or run.status != TestStatus.RUNNING or not run.callback_deadline_at or run.callback_deadline_at >= datetime.utcnow():
+                continue
+            run.status = TestStatus.ERROR
+            run.error_message = f"Execution Engine stopped reporting: no callback for {settings.ENGINE_CALLBACK_TIMEOUT}s"
+            run.callback_deadline_at = None
+            session.add(run)
+            run_stats_service.record_run(session, run)
+            session.commit()
+            run_event_service.publish_status(run)
+            print(f"Reaped stale run {run_id}")
@@ -0,0 +1,67 @@
+"""performance indexes
+
+Composite indexes laid out for GET /runs, list_test_suites, count_recursive_items
+and get_audit_log, plus the trigram run search index. On PostgreSQL every index
+is built CONCURRENTLY so existing tables stay writable while it is created.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 08:40:12.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name -> (table, columns)
+INDEXES = {
+    'ix_testrun_created': ('testrun', ['created_at', 'id']),
+    'ix_testrun_project_created': ('testrun', ['project_id', 'created_at', 'id']),
+    'ix_testrun_project_status_created': ('testrun', ['project_id', 'status', 'created_at', 'id']),
+    'ix_testrun_project_browser_created': ('testrun', ['project_id', 'browser', 'created_at', 'id']),
+    'ix_testrun_suite_status': ('testrun', ['test_suite_id', 'status']),
+    'ix_testrun_test_case_id': ('testrun', ['test_case_id']),
+    'ix_testcaseresult_run_case': ('testcaseresult', ['test_run_id', 'test_case_id']),
+    'ix_testsuite_project_id': ('testsuite', ['project_id']),
+    'ix_testsuite_parent_id': ('testsuite', ['parent_id']),
+    'ix_testcase_suite_id': ('testcase', ['test_suite_id', 'id']),
+    'ix_auditlog_entity_timestamp': ('auditlog', ['entity_type', 'entity_id', 'timestamp']),
+    'ix_auditlog_user_timestamp': ('auditlog', ['user_id', 'timestamp']),
+}
+
+# RunSearchService.search_text as of this revision. Kept inline so later edits to app code cannot
+# change what this migration builds; changing the expression takes a new revision rebuilding the index
+SEARCH_TEXT_SQL = (
+    "(coalesce(suite_name, '') || ' ' || coalesce(test_case_name, '') || ' ' || "
+    "left(coalesce(error_message, ''), 1000))"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, (table, columns) in INDEXES.items():
+            op.create_index(name, table, columns, if_not_exists=True)
+        return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, (table, columns) in INDEXES.items():
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        # Also created by scripts/migrate_run_search_index.py on databases that predate migrations
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_testrun_search_trgm ON testrun "
+            f"USING gist ({SEARCH_TEXT_SQL} gist_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_testrun_search_trgm")
+    for name, (table, columns) in INDEXES.items():
+        op.drop_index(name, table_name=table)
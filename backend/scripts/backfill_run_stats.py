@@ -0,0 +1,43 @@
+import asyncio
+import sys
+import os
+from sqlmodel import select
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+from app.models import TestRun
+from app.services.run_stats_service import run_stats_service, FINISHED_STATUSES
+
+BATCH_SIZE = 500
+
+async def backfill_run_stats():
+    # Safe to re-run: record_run skips runs that are already counted
+    print("Rolling finished runs up into rundailystats...")
+    total = 0
+    last_id = 0
+    async with get_session_context() as session:
+        while True:
+            result = await session.exec(
+                select(TestRun)
+                .where(TestRun.id > last_id, TestRun.stats_recorded == False, TestRun.status.in_(FINISHED_STATUSES))
+                .order_by(TestRun.id)
+                .limit(BATCH_SIZE)
+            )
+            runs = result.all()
+            if not runs:
+                break
+
+            def record(sync_session):
+                for run in runs:
+                    run_stats_service.record_run(sync_session, run)
+
+            await session.run_sync(record)
+            await session.commit()
+            last_id = runs[-1].id
+            total += len(runs)
+            print(f"Rolled up {total} runs.")
+    print("Backfill complete.")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_run_stats())
@@ -0,0 +1,24 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+
+async def migrate_coalesce_schema():
+    print("Migrating TestRun schema for run coalescing...")
+    async with get_session_context() as session:
+        try:
+            await session.exec(text("ALTER TABLE testrun ADD COLUMN IF NOT EXISTS settings_hash VARCHAR"))
+            await session.exec(text("CREATE INDEX IF NOT EXISTS ix_testrun_settings_hash ON testrun (settings_hash)"))
+            print("Added 'settings_hash' column and index.")
+        except Exception as e:
+            print(f"settings_hash column might already exist: {e}")
+
+        await session.commit()
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_coalesce_schema())
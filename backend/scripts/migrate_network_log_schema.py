@@ -0,0 +1,23 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+
+async def migrate_network_log_schema():
+    print("Migrating TestRun schema for spilled network logs...")
+    async with get_session_context() as session:
+        try:
+            await session.exec(text("ALTER TABLE testrun ADD COLUMN IF NOT EXISTS network_log_url VARCHAR"))
+            print("Added 'network_log_url' column.")
+        except Exception as e:
+            print(f"network_log_url column might already exist: {e}")
+
+        await session.commit()
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_network_log_schema())
@@ -0,0 +1,24 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+
+async def migrate_result_schema():
+    print("Migrating TestCaseResult schema...")
+    async with get_session_context() as session:
+        # Results are matched to their test case by id for engine callbacks
+        try:
+            await session.exec(text("ALTER TABLE testcaseresult ADD COLUMN IF NOT EXISTS test_case_id INTEGER"))
+            print("Added 'test_case_id' column.")
+        except Exception as e:
+            print(f"test_case_id column might already exist: {e}")
+
+        await session.commit()
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_result_schema())
@@ -0,0 +1,30 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+
+COLUMNS = {
+    "testrun": ("attempt INTEGER NOT NULL DEFAULT 1", "retry_case_ids JSON"),
+    "testcaseresult": ("retry_count INTEGER NOT NULL DEFAULT 0", "attempts JSON DEFAULT '[]'"),
+}
+
+async def migrate_retry_schema():
+    print("Migrating TestRun/TestCaseResult schema for auto-retry...")
+    async with get_session_context() as session:
+        for table, columns in COLUMNS.items():
+            for column in columns:
+                try:
+                    await session.exec(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column}"))
+                    print(f"Added '{table}.{column.split()[0]}' column.")
+                except Exception as e:
+                    print(f"{table}.{column.split()[0]} column might already exist: {e}")
+
+        await session.commit()
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_retry_schema())
@@ -0,0 +1,46 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+from app.models import TestRunPayload, TestCaseResultPayload
+
+# table -> (payload table, key column, moved columns)
+MOVES = {
+    "testrun": ("testrunpayload", "run_id", ("request_headers", "response_headers", "network_events", "execution_log")),
+    "testcaseresult": ("testcaseresultpayload", "result_id", ("response_headers", "response_body", "request_headers", "request_body")),
+}
+
+async def migrate_run_payload_schema():
+    print("Moving run and result payloads into side tables...")
+    async with get_session_context() as session:
+        connection = await session.connection()
+        for model in (TestRunPayload, TestCaseResultPayload):
+            await connection.run_sync(lambda sync_connection: model.__table__.create(sync_connection, checkfirst=True))
+        await session.commit()
+        print("Added 'testrunpayload' and 'testcaseresultpayload' tables.")
+
+        for table, (payload_table, key, columns) in MOVES.items():
+            result = await session.exec(text(
+                f"SELECT count(*) FROM information_schema.columns WHERE table_name = '{table}' AND column_name IN ({', '.join(repr(c) for c in columns)})"
+            ))
+            if result.one()[0] < len(columns):
+                print(f"{table} payload columns already moved.")
+                continue
+            column_list = ", ".join(columns)
+            await session.exec(text(
+                f"INSERT INTO {payload_table} ({key}, {column_list}) "
+                f"SELECT t.id, {', '.join(f't.{c}' for c in columns)} FROM {table} t "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {payload_table} p WHERE p.{key} = t.id)"
+            ))
+            for column in columns:
+                await session.exec(text(f"ALTER TABLE {table} DROP COLUMN IF EXISTS {column}"))
+            await session.commit()
+            print(f"Moved {column_list} from '{table}' to '{payload_table}'.")
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_run_payload_schema())
@@ -0,0 +1,26 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine
+from app.services.run_search_service import SEARCH_TEXT_SQL
+
+async def migrate_run_search_index():
+    print("Creating trigram search index on TestRun...")
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        print("Enabled 'pg_trgm' extension.")
+        await connection.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_testrun_search_trgm ON testrun "
+            f"USING gist ({SEARCH_TEXT_SQL.format(table='')} gist_trgm_ops)"
+        ))
+        print("Added 'ix_testrun_search_trgm' index.")
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_run_search_index())
@@ -0,0 +1,72 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+from app.models import RunSettingsSnapshot
+from app.services.test_service import test_service
+
+BATCH_SIZE = 1000
+SETTINGS_COLUMNS = ("request_params", "allowed_domains", "domain_settings")
+
+async def migrate_settings_snapshot_schema():
+    print("Migrating TestRun settings into shared snapshots...")
+    async with get_session_context() as session:
+        connection = await session.connection()
+        await connection.run_sync(lambda sync_connection: RunSettingsSnapshot.__table__.create(sync_connection, checkfirst=True))
+        await session.exec(text("ALTER TABLE testrun ADD COLUMN IF NOT EXISTS settings_snapshot_id INTEGER REFERENCES runsettingssnapshot (id)"))
+        await session.exec(text("CREATE INDEX IF NOT EXISTS ix_testrun_settings_snapshot_id ON testrun (settings_snapshot_id)"))
+        await session.commit()
+        print("Added 'runsettingssnapshot' table and 'settings_snapshot_id' column.")
+
+        result = await session.exec(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'testrun' AND column_name IN ('request_params', 'allowed_domains', 'domain_settings')"
+        ))
+        if len(result.all()) < len(SETTINGS_COLUMNS):
+            print("Settings columns already dropped, nothing to backfill.")
+            return
+
+        # Backfill in batches; request_headers stays on the run, it also holds the headers the engine captured
+        migrated = 0
+        while True:
+            result = await session.exec(text(
+                "SELECT id, request_headers, request_params, allowed_domains, domain_settings FROM testrun "
+                "WHERE settings_snapshot_id IS NULL ORDER BY id LIMIT :limit"
+            ).bindparams(limit=BATCH_SIZE))
+            rows = result.all()
+            if not rows:
+                break
+            run_hashes = {}
+            snapshots = {}
+            for run_id, headers, params, allowed_domains, domain_settings in rows:
+                fields = test_service.snapshot_fields({
+                    "headers": headers or {},
+                    "params": params or {},
+                    "allowed_domains": allowed_domains or [],
+                    "domain_settings": domain_settings or {},
+                })
+                settings_hash = test_service.settings_fingerprint(fields)
+                snapshots[settings_hash] = fields
+                run_hashes[run_id] = settings_hash
+            snapshot_ids = await test_service.get_settings_snapshots(snapshots, session)
+            for settings_hash, snapshot_id in snapshot_ids.items():
+                run_ids = [run_id for run_id, run_hash in run_hashes.items() if run_hash == settings_hash]
+                await session.exec(
+                    text("UPDATE testrun SET settings_snapshot_id = :snapshot_id WHERE id = ANY(:run_ids)")
+                    .bindparams(snapshot_id=snapshot_id, run_ids=run_ids)
+                )
+            await session.commit()
+            migrated += len(rows)
+            print(f"Linked {migrated} runs to settings snapshots...")
+
+        for column in SETTINGS_COLUMNS:
+            await session.exec(text(f"ALTER TABLE testrun DROP COLUMN IF EXISTS {column}"))
+            print(f"Dropped 'testrun.{column}' column.")
+        await session.commit()
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_settings_snapshot_schema())
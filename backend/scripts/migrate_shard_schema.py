@@ -0,0 +1,24 @@
+import asyncio
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_session_context
+
+async def migrate_shard_schema():
+    print("Migrating TestRun schema for sharded execution...")
+    async with get_session_context() as session:
+        for column in ("shard_count INTEGER NOT NULL DEFAULT 1", "completed_shards INTEGER NOT NULL DEFAULT 0"):
+            try:
+                await session.exec(text(f"ALTER TABLE testrun ADD COLUMN IF NOT EXISTS {column}"))
+                print(f"Added '{column.split()[0]}' column.")
+            except Exception as e:
+                print(f"{column.split()[0]} column might already exist: {e}")
+
+        await session.commit()
+    print("Migration complete.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_shard_schema())
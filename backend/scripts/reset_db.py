@@ -5,7 +5,7 @@ from sqlalchemy import text
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.core.database import engine
+from app.core.database import engine, run_migrations
 from app.models import * # Import all models to ensure they are registered with SQLModel
 from sqlmodel import SQLModel
 
@@ -16,12 +16,13 @@ async def reset_database():
     async with engine.begin() as conn:
         print("Dropping all tables...")
         await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
         print("✅ Tables dropped.")
 
-    # 2. Create all tables
-    async with engine.begin() as conn:
-        print("Creating all tables...")
-        await conn.run_sync(SQLModel.metadata.create_all)
+    # 2. Recreate the schema from the migrations
+    async with engine.connect() as conn:
+        print("Running migrations...")
+        await conn.run_sync(run_migrations)
         print("✅ Tables recreated.")
             
 if __name__ == "__main__":
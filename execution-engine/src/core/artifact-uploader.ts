@@ -0,0 +1,89 @@
+import * as Minio from 'minio';
+
+const MinioClient = (Minio as any).Client || Minio;
+
+// Objects larger than partSize are sent as multipart uploads by the MinIO client
+const minioClient = new MinioClient({
+    endPoint: process.env.MINIO_ENDPOINT || 'localhost',
+    port: parseInt(process.env.MINIO_PORT || '9000'),
+    useSSL: false,
+    accessKey: process.env.MINIO_ACCESS_KEY || 'minioadmin',
+    secretKey: process.env.MINIO_SECRET_KEY || 'minioadmin',
+    partSize: parseInt(process.env.ARTIFACT_UPLOAD_PART_SIZE || String(16 * 1024 * 1024))
+});
+
+const BUCKET_NAME = process.env.MINIO_BUCKET_NAME || 'test-artifacts';
+
+interface UploadTask {
+    key: string;
+    filePath: string;
+    resolve: (ok: boolean) => void;
+}
+
+// Bounded pool shared by all runs, so concurrent runs cannot saturate MinIO
+export class ArtifactUploader {
+    private active = 0;
+    private queue: UploadTask[] = [];
+
+    constructor(private concurrency: number) { }
+
+    // Resolves to false instead of rejecting: a failed upload must not fail the run
+    upload(key: string, filePath: string): Promise<boolean> {
+        return new Promise(resolve => {
+            this.queue.push({ key, filePath, resolve });
+            this.next();
+        });
+    }
+
+    batch(): UploadBatch {
+        return new UploadBatch(this);
+    }
+
+    private next() {
+        while (this.active < this.concurrency && this.queue.length > 0) {
+            const task = this.queue.shift()!;
+            this.active++;
+            const startedAt = Date.now();
+            minioClient.fPutObject(BUCKET_NAME, task.key, task.filePath)
+                .then(() => {
+                    console.log(`Uploaded ${task.key} in ${Date.now() - startedAt}ms`);
+                    task.resolve(true);
+                })
+                .catch((e: any) => {
+                    console.error(`Failed to upload ${task.key}:`, e.message);
+                    task.resolve(false);
+                })
+                .finally(() => {
+                    this.active--;
+                    this.next();
+                });
+        }
+    }
+}
+
+// The uploads belonging to one run, so its artifacts directory can be removed once they settle
+export class UploadBatch {
+    private pending: Promise<boolean>[] = [];
+    private files = new Set<string>();
+
+    constructor(private uploader: ArtifactUploader) { }
+
+    add(key: string, filePath: string): string {
+        if (!this.files.has(filePath)) {
+            this.files.add(filePath);
+            this.pending.push(this.uploader.upload(key, filePath));
+        }
+        return key;
+    }
+
+    has(filePath: string): boolean {
+        return this.files.has(filePath);
+    }
+
+    async settled(): Promise<boolean> {
+        const results = await Promise.all(this.pending);
+        return results.every(Boolean);
+    }
+}
+
+export const artifactUploader = new ArtifactUploader(parseInt(process.env.ARTIFACT_UPLOAD_CONCURRENCY || '4'));
@@ -0,0 +1,92 @@
+import { createHash } from 'crypto';
+import * as xpath from 'xpath';
+import Ajv, { ValidateFunction } from 'ajv';
+import addFormats from 'ajv-formats';
+
+// Compiled assertions shared by every run in this process, keyed by a hash of the content
+// they were compiled from. Fingerprints on incoming assertions are not trusted as keys.
+
+class LruCache<V> {
+    private entries = new Map<string, V>();
+
+    constructor(private maxSize: number, private onEvict?: (value: V) => void) { }
+
+    get(key: string): V | undefined {
+        const value = this.entries.get(key);
+        if (value !== undefined) {
+            // Map iteration order is insertion order: re-inserting marks the entry most recently used
+            this.entries.delete(key);
+            this.entries.set(key, value);
+        }
+        return value;
+    }
+
+    set(key: string, value: V) {
+        this.entries.delete(key);
+        this.entries.set(key, value);
+        if (this.entries.size > this.maxSize) {
+            const oldestKey = this.entries.keys().next().value as string;
+            const oldest = this.entries.get(oldestKey)!;
+            this.entries.delete(oldestKey);
+            this.onEvict?.(oldest);
+        }
+    }
+}
+
+const CACHE_SIZE = parseInt(process.env.ASSERTION_CACHE_SIZE || '500');
+
+// One Ajv instance for all cached validators; evicted schemas are removed from it as well
+const ajv = new Ajv({ allErrors: true });
+addFormats(ajv);
+
+const validators = new LruCache<{ validate: ValidateFunction, schema: any, shared: boolean }>(CACHE_SIZE, entry => {
+    if (entry.shared) ajv.removeSchema(entry.schema);
+});
+const jsonPaths = new LruCache<string[]>(CACHE_SIZE);
+const xpathExpressions = new LruCache<any>(CACHE_SIZE);
+
+const keyFor = (kind: string, content: string) =>
+    createHash('sha256').update(kind).update('\0').update(content).digest('hex');
+
+export class AssertionCache {
+    static jsonSchema(assertion: any): ValidateFunction {
+        const schemaText = assertion.value || '{}';
+        const key = keyFor('json-schema', schemaText);
+        const cached = validators.get(key);
+        if (cached) return cached.validate;
+
+        const schema = JSON.parse(schemaText);
+        let entry;
+        try {
+            entry = { validate: ajv.compile(schema), schema, shared: true };
+        } catch (e: any) {
+            // A schema whose $id clashes with another cached schema gets a private Ajv instance
+            if (!String(e.message).includes('already exists')) throw e;
+            const isolated = new Ajv({ allErrors: true });
+            addFormats(isolated);
+            entry = { validate: isolated.compile(schema), schema, shared: false };
+        }
+        validators.set(key, entry);
+        return entry.validate;
+    }
+
+    static jsonPath(assertion: any): string[] {
+        const key = keyFor('json-path', assertion.path);
+        let parts = jsonPaths.get(key);
+        if (!parts) {
+            parts = assertion.path.split('.') as string[];
+            jsonPaths.set(key, parts);
+        }
+        return parts;
+    }
+
+    static xpath(assertion: any): { select(options: { node: Node }): any } {
+        const key = keyFor('xpath', assertion.path);
+        let expression = xpathExpressions.get(key);
+        if (!expression) {
+            expression = (xpath as any).parse(assertion.path);
+            xpathExpressions.set(key, expression);
+        }
+        return expression;
+    }
+}
@@ -1,46 +1,24 @@
 import { chromium, firefox, webkit, Browser, BrowserContext, Page } from 'playwright';
 
 export class BrowserManager {
-    private browser: Browser | null = null;
-    private currentBrowserType: string = 'chromium';
+    static async launch(browserType: string = 'chromium'): Promise<Browser> {
+        console.log(`Launching browser: ${browserType}`);
 
-    async start(browserType: string = 'chromium'): Promise<Browser> {
-        if (this.browser && this.currentBrowserType !== browserType) {
-            console.log(`Switching browser from ${this.currentBrowserType} to ${browserType}`);
-            await this.stop();
-        }
-
-        if (!this.browser) {
-            console.log(`Launching browser: ${browserType}`);
-
-            switch (browserType) {
-                case 'firefox':
-                    this.browser = await firefox.launch({
-                        headless: true
-                    });
-                    break;
-                case 'webkit':
-                    this.browser = await webkit.launch({
-                        headless: true
-                    });
-                    break;
-                case 'chromium':
-                default:
-                    this.browser = await chromium.launch({
-                        headless: true,
-                        args: ['--no-sandbox', '--disable-setuid-sandbox']
-                    });
-                    break;
-            }
-            this.currentBrowserType = browserType;
-        }
-        return this.browser;
-    }
-
-    async stop() {
-        if (this.browser) {
-            await this.browser.close();
-            this.browser = null;
+        switch (browserType) {
+            case 'firefox':
+                return firefox.launch({
+                    headless: true
+                });
+            case 'webkit':
+                return webkit.launch({
+                    headless: true
+                });
+            case 'chromium':
+            default:
+                return chromium.launch({
+                    headless: true,
+                    args: ['--no-sandbox', '--disable-setuid-sandbox']
+                });
         }
     }
 
@@ -0,0 +1,188 @@
+import { Browser } from 'playwright';
+import { BrowserManager } from './browser-manager';
+
+export interface BrowserPoolOptions {
+    size: number;             // Max browsers per browser type
+    maxUses: number;          // Leases served before a browser is recycled
+    acquireTimeoutMs: number; // How long a run may wait for a free browser
+}
+
+export interface BrowserLeaseTimings {
+    wait_ms: number;   // Time spent queued for a free slot
+    launch_ms: number; // Time spent launching a browser (0 when a warm one was reused)
+    lease_ms: number;  // Total time from request to lease
+    reused: boolean;
+}
+
+export interface BrowserLease {
+    browser: Browser;
+    timings: BrowserLeaseTimings;
+    release(): Promise<void>;
+}
+
+interface PooledBrowser {
+    browser: Browser;
+    uses: number;
+    busy: boolean;
+}
+
+interface Waiter {
+    resolve: () => void;
+    reject: (e: Error) => void;
+    timer: NodeJS.Timeout;
+}
+
+export class BrowserPool {
+    private browsers = new Map<string, PooledBrowser[]>();
+    private launching = new Map<string, number>();
+    private waiters = new Map<string, Waiter[]>();
+    private stats = { leases: 0, launches: 0, recycled: 0, crashed: 0, total_wait_ms: 0, total_launch_ms: 0 };
+
+    constructor(private options: BrowserPoolOptions) { }
+
+    async acquire(browserType: string = 'chromium'): Promise<BrowserLease> {
+        const requestedAt = Date.now();
+        let waitMs = 0;
+
+        while (true) {
+            const entries = this.entries(browserType);
+            const idle = entries.find(entry => !entry.busy && entry.browser.isConnected());
+            if (idle) {
+                idle.busy = true;
+                return this.lease(browserType, idle, requestedAt, waitMs, 0);
+            }
+
+            if (entries.length + (this.launching.get(browserType) || 0) < this.options.size) {
+                this.launching.set(browserType, (this.launching.get(browserType) || 0) + 1);
+                const launchStart = Date.now();
+                const launchDone = () => this.launching.set(browserType, (this.launching.get(browserType) || 1) - 1);
+                const browser = await BrowserManager.launch(browserType).then(
+                    (launched) => { launchDone(); return launched; },
+                    (e) => {
+                        // The slot reserved for this launch is free again
+                        launchDone();
+                        this.wakeNext(browserType);
+                        throw e;
+                    }
+                );
+                const entry: PooledBrowser = { browser, uses: 0, busy: true };
+                const launchMs = Date.now() - launchStart;
+                this.stats.launches++;
+                this.stats.total_launch_ms += launchMs;
+                entry.browser.on('disconnected', () => this.evict(browserType, entry, true));
+                entries.push(entry);
+                return this.lease(browserType, entry, requestedAt, waitMs, launchMs);
+            }
+
+            const waitStart = Date.now();
+            await this.waitForSlot(browserType, requestedAt);
+            waitMs += Date.now() - waitStart;
+        }
+    }
+
+    // Launches browsers ahead of the first run so it does not pay the startup cost
+    async warm(browserTypes: string[]) {
+        for (const browserType of browserTypes) {
+            try {
+                const lease = await this.acquire(browserType);
+                await lease.release();
+            } catch (e: any) {
+                console.error(`Failed to warm ${browserType} browser:`, e.message);
+            }
+        }
+    }
+
+    snapshot() {
+        const browsers: Record<string, { total: number, busy: number }> = {};
+        for (const [browserType, entries] of this.browsers) {
+            browsers[browserType] = { total: entries.length, busy: entries.filter(entry => entry.busy).length };
+        }
+        const waiting: Record<string, number> = {};
+        for (const [browserType, queue] of this.waiters) {
+            waiting[browserType] = queue.length;
+        }
+        return { ...this.options, browsers, waiting, ...this.stats };
+    }
+
+    async drain() {
+        const entries = Array.from(this.browsers.values()).flat();
+        this.browsers.clear();
+        await Promise.all(entries.map(entry => entry.browser.close().catch(() => { })));
+    }
+
+    private entries(browserType: string): PooledBrowser[] {
+        if (!this.browsers.has(browserType)) this.browsers.set(browserType, []);
+        return this.browsers.get(browserType)!;
+    }
+
+    private lease(browserType: string, entry: PooledBrowser, requestedAt: number, waitMs: number, launchMs: number): BrowserLease {
+        entry.uses++;
+        this.stats.leases++;
+        this.stats.total_wait_ms += waitMs;
+        const timings = { wait_ms: waitMs, launch_ms: launchMs, lease_ms: Date.now() - requestedAt, reused: launchMs === 0 };
+        console.log(`Leased ${browserType} browser (use ${entry.uses}/${this.options.maxUses}) in ${timings.lease_ms}ms (wait ${waitMs}ms, launch ${launchMs}ms)`);
+
+        let released = false;
+        return {
+            browser: entry.browser,
+            timings,
+            release: async () => {
+                if (released) return;
+                released = true;
+                entry.busy = false;
+                if (entry.uses >= this.options.maxUses || !entry.browser.isConnected()) {
+                    this.stats.recycled++;
+                    this.evict(browserType, entry, false);
+                    await entry.browser.close().catch(() => { });
+                }
+                this.wakeNext(browserType);
+            }
+        };
+    }
+
+    private evict(browserType: string, entry: PooledBrowser, crashed: boolean) {
+        const entries = this.entries(browserType);
+        const index = entries.indexOf(entry);
+        if (index === -1) return;
+        entries.splice(index, 1);
+        if (crashed) {
+            console.warn(`${browserType} browser disconnected; removing it from the pool`);
+            this.stats.crashed++;
+        }
+        this.wakeNext(browserType);
+    }
+
+    private waitForSlot(browserType: string, requestedAt: number): Promise<void> {
+        const remaining = this.options.acquireTimeoutMs - (Date.now() - requestedAt);
+        if (remaining <= 0) {
+            return Promise.reject(new Error(`Timed out after ${this.options.acquireTimeoutMs}ms waiting for a ${browserType} browser`));
+        }
+        return new Promise((resolve, reject) => {
+            const queue = this.waiters.get(browserType) || [];
+            this.waiters.set(browserType, queue);
+            const waiter: Waiter = {
+                resolve,
+                reject,
+                timer: setTimeout(() => {
+                    queue.splice(queue.indexOf(waiter), 1);
+                    reject(new Error(`Timed out after ${this.options.acquireTimeoutMs}ms waiting for a ${browserType} browser`));
+                }, remaining)
+            };
+            queue.push(waiter);
+        });
+    }
+
+    private wakeNext(browserType: string) {
+        const waiter = this.waiters.get(browserType)?.shift();
+        if (waiter) {
+            clearTimeout(waiter.timer);
+            waiter.resolve();
+        }
+    }
+}
+
+export const browserPool = new BrowserPool({
+    size: parseInt(process.env.BROWSER_POOL_SIZE || '2'),
+    maxUses: parseInt(process.env.BROWSER_POOL_MAX_USES || '50'),
+    acquireTimeoutMs: parseInt(process.env.BROWSER_POOL_ACQUIRE_TIMEOUT_MS || '300000')
+});
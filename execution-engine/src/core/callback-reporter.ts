@@ -0,0 +1,30 @@
+export class CallbackReporter {
+    private chain: Promise<void> = Promise.resolve();
+
+    constructor(private callbackUrl: string, private callbackToken: string, private maxAttempts: number = 3) { }
+
+    // Events are delivered in order: every `result` reaches the backend before the final `complete`
+    emit(event: any): Promise<void> {
+        const endpoint = event.type === 'result' ? 'results' : event.type === 'step' ? 'progress' : 'complete';
+        this.chain = this.chain.then(() => this.post(`${this.callbackUrl}/${endpoint}`, event));
+        return this.chain;
+    }
+
+    private async post(url: string, event: any) {
+        for (let attempt = 1; attempt <= this.maxAttempts; attempt++) {
+            try {
+                const response = await fetch(url, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json', 'X-Engine-Token': this.callbackToken },
+                    body: JSON.stringify(event)
+                });
+                if (response.ok) return;
+                console.warn(`Callback ${url} returned ${response.status} (attempt ${attempt})`);
+            } catch (e) {
+                console.warn(`Callback ${url} failed (attempt ${attempt}): ${e}`);
+            }
+            if (attempt < this.maxAttempts) await new Promise(r => setTimeout(r, 1000 * attempt));
+        }
+        console.error(`Giving up on callback ${url} for event ${event.type}`);
+    }
+}
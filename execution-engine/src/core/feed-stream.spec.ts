@@ -0,0 +1,216 @@
+import * as assert from 'assert';
+import { FeedStreamEvaluator, evaluateFeedDom, parseSimplePath } from './feed-stream';
+
+// Checks that the streaming evaluator reaches the same verdict as the DOM path (xmldom + xpath.select)
+// on the same feeds, whatever the chunk boundaries. Run with `npm test`.
+
+interface Fixture {
+    name: string;
+    feed: string;
+    assertions: any[];
+    // Expected outcome, so a fixture cannot pass by both paths being wrong in the same way
+    error: string | null;
+    // The evaluator must have stopped before the last chunk (whole feed in one chunk excluded)
+    stopsEarly?: boolean;
+}
+
+const xpath = (path: string, operator: string, value?: string) => ({ type: 'xpath', path, operator, value });
+const text = (value: string) => ({ type: 'text', value });
+
+const ATOM = 'http://www.w3.org/2005/Atom';
+const atom = (name: string) => `*[local-name()='${name}' and namespace-uri()='${ATOM}']`;
+
+const RSS = `<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+  <channel>
+    <title>News &amp; Views</title>
+    <item><title>First</title><guid>g1</guid></item>
+    <item>
+      <title><![CDATA[Second <b>bold</b> & raw]]></title>
+      <guid isPermaLink="false">g2</guid>
+      <enclosure url="http://cdn.example.com/2.mp3?a=1&amp;b=2" length="12" type="audio/mpeg"/>
+    </item>
+    <item><title>Third &#8211; &#x263A; &lt;ok&gt;</title><description>a &quot;q&quot; &apos;s&apos;</description></item>
+  </channel>
+</rss>`;
+
+const ATOM_FEED = `<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="${ATOM}" xmlns:media="http://search.yahoo.com/mrss/">
+  <title>Atom title</title>
+  <entry><title>E1</title><link href="http://example.com/1" rel="alternate"/></entry>
+  <entry><title>E2</title><media:thumbnail url="http://example.com/2.jpg"/></entry>
+  <author xmlns=""><name>Plain name</name></author>
+</feed>`;
+
+const MEDIA_RSS = `<rss xmlns:media="http://search.yahoo.com/mrss/" xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel>
+  <item><dc:creator>Ann</dc:creator><media:content url="http://m/1.jpg" medium="image"/></item>
+  <item><media:group><media:content url="http://m/2.jpg"/><media:content url="http://m/3.jpg"/></media:group></item>
+</channel>
+</rss>`;
+
+const NESTED = `<root><a><b>1</b><b>2</b></a><a><b>3</b></a><c><a><b>4</b><b>5</b></a></c></root>`;
+
+const MIXED = `<root><p>Hello <!-- comment --> <b>world</b>!</p><q>line1\r\nline2</q><e v='single &quot;quoted&quot; &amp; more'/></root>`;
+
+const LONG = `<rss><channel>${Array.from({ length: 500 }, (_, i) => `<item><title>x${i}</title></item>`).join('')}<last>end</last></channel></rss>`;
+
+const fixtures: Fixture[] = [
+    {
+        name: 'rss: entities, CDATA, attributes, positions',
+        feed: RSS,
+        assertions: [
+            xpath('/rss/channel/title', 'equals', 'News & Views'),
+            xpath('/rss/@version', 'equals', '2.0'),
+            xpath('//item[2]/title', 'equals', 'Second <b>bold</b> & raw'),
+            xpath('//item[3]/title/text()', 'equals', 'Third – ☺ <ok>'),
+            xpath('//item[3]/description', 'equals', `a "q" 's'`),
+            xpath('//item/enclosure/@url', 'equals', 'http://cdn.example.com/2.mp3?a=1&b=2'),
+            xpath('//guid/@isPermaLink', 'equals', 'false'),
+            text('Second <b>bold'),
+        ],
+        error: null,
+    },
+    {
+        name: 'rss: missing positional element',
+        feed: RSS,
+        assertions: [xpath('/rss/channel/title', 'contains', 'News'), xpath('//item[4]', 'exists')],
+        error: 'Expected XPath //item[4] to exist',
+    },
+    {
+        name: 'atom: default namespace',
+        feed: ATOM_FEED,
+        assertions: [
+            xpath(`/${atom('feed')}/${atom('title')}`, 'equals', 'Atom title'),
+            xpath(`//${atom('entry')}[2]/${atom('title')}`, 'equals', 'E2'),
+            xpath(`//${atom('entry')}[1]/${atom('link')}/@href`, 'equals', 'http://example.com/1'),
+            xpath(`//*[name()='media:thumbnail']/@url`, 'contains', '2.jpg'),
+        ],
+        error: null,
+    },
+    {
+        name: 'atom: plain names do not match default-namespace elements',
+        feed: ATOM_FEED,
+        assertions: [xpath('/feed/title', 'exists')],
+        error: 'Expected XPath /feed/title to exist',
+    },
+    {
+        name: 'atom: xmlns="" undeclares the default namespace',
+        feed: ATOM_FEED,
+        assertions: [
+            xpath('//author/name', 'equals', 'Plain name'),
+            xpath(`//*[local-name()='name' and not(namespace-uri())]`, 'exists'),
+            xpath(`//${atom('author')}`, 'exists'),
+        ],
+        error: `Expected XPath //${atom('author')} to exist`,
+    },
+    {
+        name: 'prefixed namespaces and positions under //',
+        feed: MEDIA_RSS,
+        assertions: [
+            xpath(`//item/*[name()='dc:creator']`, 'equals', 'Ann'),
+            xpath(`//*[local-name()='content' and namespace-uri()='http://search.yahoo.com/mrss/']/@medium`, 'equals', 'image'),
+            xpath(`//*[name()='media:content'][2]/@url`, 'equals', 'http://m/3.jpg'),
+            xpath(`//item[1]/*[name()='media:content'][2]`, 'exists'),
+        ],
+        error: `Expected XPath //item[1]/*[name()='media:content'][2] to exist`,
+    },
+    {
+        name: 'positional predicates count siblings per parent',
+        feed: NESTED,
+        assertions: [
+            xpath('//a/b[2]', 'equals', '2'),
+            xpath('//a[2]/b', 'equals', '3'),
+            xpath('/root/c//b[2]', 'equals', '5'),
+            xpath('/root/*[2]/b', 'equals', '3'),
+            xpath('//b[2]', 'contains', '2'),
+            xpath('//a[3]', 'exists'),
+        ],
+        error: 'Expected XPath //a[3] to exist',
+    },
+    {
+        name: 'mixed content, comments, newlines and quoted attributes',
+        feed: MIXED,
+        assertions: [
+            xpath('/root/p', 'equals', 'Hello  world!'),
+            xpath('/root/p/text()', 'equals', 'Hello '),
+            xpath('/root/q', 'equals', 'line1\nline2'),
+            xpath('/root/e/@v', 'equals', 'single "quoted" & more'),
+        ],
+        error: null,
+    },
+    {
+        name: 'early exit: the first listed failure decides the outcome',
+        feed: LONG,
+        assertions: [xpath('/rss/channel/item/title', 'equals', 'nope'), xpath('/rss/channel/last', 'equals', 'end')],
+        error: 'Expected XPath /rss/channel/item/title to equal nope but got x0',
+        stopsEarly: true,
+    },
+    {
+        name: 'early exit waits for undecided assertions listed before a failure',
+        feed: LONG,
+        assertions: [xpath('/rss/channel/last', 'equals', 'wrong'), xpath('/rss/channel/item/title', 'equals', 'nope')],
+        error: 'Expected XPath /rss/channel/last to equal wrong but got end',
+    },
+    {
+        name: 'early exit after a late text match',
+        feed: LONG,
+        assertions: [text('<title>x498</title>'), xpath('/rss/channel/item/title', 'equals', 'nope')],
+        error: 'Expected XPath /rss/channel/item/title to equal nope but got x0',
+        stopsEarly: true,
+    },
+    {
+        name: 'missing text',
+        feed: LONG,
+        assertions: [text('x500'), xpath('/rss/channel/last', 'equals', 'end')],
+        error: 'Expected feed to contain text "x500"',
+    },
+];
+
+const CHUNK_SIZES = [1, 2, 3, 7, 64, Infinity];
+
+// Mirrors evaluateFeedStream: stop reading once the evaluator is done, otherwise end() after the last chunk
+const evaluateStreamed = (feed: string, assertions: any[], chunkSize: number) => {
+    const evaluator = new FeedStreamEvaluator(assertions);
+    const size = Math.min(chunkSize, feed.length);
+    let stoppedEarly = false;
+    let read = 0;
+    while (read < feed.length) {
+        evaluator.write(feed.slice(read, read + size));
+        read += size;
+        if (evaluator.done) {
+            stoppedEarly = true;
+            break;
+        }
+    }
+    if (!stoppedEarly) evaluator.end();
+    return { error: evaluator.firstError, unsupported: evaluator.unsupported, unread: feed.length - read };
+};
+
+let checks = 0;
+for (const fixture of fixtures) {
+    for (const assertion of fixture.assertions) {
+        if (assertion.type === 'xpath') assert.ok(parseSimplePath(assertion.path), `${fixture.name}: ${assertion.path} should stream`);
+    }
+    const domError = evaluateFeedDom(fixture.feed, fixture.assertions);
+    assert.strictEqual(domError, fixture.error, `${fixture.name}: DOM path`);
+    for (const chunkSize of CHUNK_SIZES) {
+        const streamed = evaluateStreamed(fixture.feed, fixture.assertions, chunkSize);
+        const label = `${fixture.name} (chunks of ${chunkSize})`;
+        assert.strictEqual(streamed.unsupported, null, label);
+        assert.strictEqual(streamed.error, domError, label);
+        if (fixture.stopsEarly && chunkSize !== Infinity) assert.ok(streamed.unread > 0, `${label}: read the whole feed`);
+        checks++;
+    }
+}
+
+// An internal DTD subset can declare entities the tokenizer does not model: streaming gives up
+const withSubset = `<!DOCTYPE rss [<!ENTITY brand "Acme">]><rss><channel><title>&brand;</title></channel></rss>`;
+assert.ok(evaluateStreamed(withSubset, [xpath('/rss/channel/title', 'equals', 'Acme')], 16).unsupported);
+
+// Anything beyond simple location paths is left to the DOM path
+for (const path of ['//item[last()]', '/rss/channel/item[title="x"]', 'count(//item)', '//item/@id/..', '//item//text()']) {
+    assert.strictEqual(parseSimplePath(path), null, path);
+}
+
+console.log(`feed-stream: ${fixtures.length} fixtures, ${checks} streamed evaluations agree with the DOM path`);
@@ -0,0 +1,521 @@
+import * as http from 'http';
+import * as https from 'https';
+import * as zlib from 'zlib';
+import { Readable } from 'stream';
+import { StringDecoder } from 'string_decoder';
+import { DOMParser } from '@xmldom/xmldom';
+import { AssertionCache } from './assertion-cache';
+
+// Streaming evaluation of feed-check assertions. Simple location paths are matched while the
+// feed is tokenized, so neither the body nor a DOM is held in memory, and the response is
+// abandoned as soon as every assertion is decided. Anything else falls back to the DOM path.
+
+const BODY_PREVIEW_LIMIT = parseInt(process.env.FEED_STREAM_BODY_LIMIT || String(1024 * 1024));
+const REQUEST_TIMEOUT_MS = 30000;
+const MAX_REDIRECTS = 20;
+
+interface NodeTest {
+    name?: string;          // plain name: no namespace, matching local name
+    qname?: string;         // *[name()='prefix:local']
+    localName?: string;     // *[local-name()='x' and ...]
+    namespaceURI?: string | null; // with localName: required namespace, null for not(namespace-uri())
+}
+
+interface PathStep {
+    descendant: boolean;    // reached through '//'
+    test: NodeTest;         // empty test is '*'
+    position: number | null;
+}
+
+export interface SimplePath {
+    steps: PathStep[];
+    target: { kind: 'element' } | { kind: 'text' } | { kind: 'attribute', name: string };
+}
+
+const NAME = '[A-Za-z_][\\w.-]*';
+const QNAME = `${NAME}(?::${NAME})?`;
+const STEP_PATTERNS: [RegExp, (m: RegExpMatchArray) => NodeTest][] = [
+    [new RegExp(`^(${NAME})$`), m => ({ name: m[1] })],
+    [/^\*$/, () => ({})],
+    [new RegExp(`^\\*\\[name\\(\\)\\s*=\\s*(['"])(${QNAME})\\1\\]$`), m => ({ qname: m[2] })],
+    [new RegExp(`^\\*\\[local-name\\(\\)\\s*=\\s*(['"])(${NAME})\\1\\s+and\\s+namespace-uri\\(\\)\\s*=\\s*(['"])([^'"]*)\\3\\]$`),
+        m => ({ localName: m[2], namespaceURI: m[4] || null })],
+    [new RegExp(`^\\*\\[local-name\\(\\)\\s*=\\s*(['"])(${NAME})\\1\\s+and\\s+not\\(namespace-uri\\(\\)\\)\\]$`),
+        m => ({ localName: m[2], namespaceURI: null })],
+];
+
+// Splits on '/' outside of predicates and string literals
+const splitSteps = (expr: string): { descendant: boolean, text: string }[] | null => {
+    const steps: { descendant: boolean, text: string }[] = [];
+    let i = 0;
+    while (i < expr.length) {
+        if (expr[i] !== '/') return null;
+        const descendant = expr[i + 1] === '/';
+        i += descendant ? 2 : 1;
+        let depth = 0;
+        let quote: string | null = null;
+        const start = i;
+        for (; i < expr.length; i++) {
+            const c = expr[i];
+            if (quote) {
+                if (c === quote) quote = null;
+            } else if (c === '"' || c === "'") {
+                quote = c;
+            } else if (c === '[') {
+                depth++;
+            } else if (c === ']') {
+                depth--;
+            } else if (c === '/' && depth === 0) {
+                break;
+            }
+        }
+        if (quote || depth !== 0 || i === start) return null;
+        steps.push({ descendant, text: expr.slice(start, i).trim() });
+    }
+    return steps.length > 0 ? steps : null;
+};
+
+// Returns null for anything beyond absolute child/descendant paths of element steps
+// (optionally ending in /@attr or /text()), which are then evaluated against a full DOM
+export const parseSimplePath = (expr: string | undefined): SimplePath | null => {
+    const raw = splitSteps((expr || '').trim());
+    if (!raw) return null;
+
+    let target: SimplePath['target'] = { kind: 'element' };
+    const last = raw[raw.length - 1];
+    const attribute = last.text.match(new RegExp(`^@(${NAME})$`));
+    if (attribute || last.text === 'text()') {
+        if (last.descendant || raw.length < 2) return null;
+        target = attribute ? { kind: 'attribute', name: attribute[1] } : { kind: 'text' };
+        raw.pop();
+    }
+
+    const steps: PathStep[] = [];
+    for (const { descendant, text } of raw) {
+        const positional = text.match(/^(.*)\[\s*(\d+)\s*\]$/);
+        const body = positional ? positional[1] : text;
+        const pattern = STEP_PATTERNS.find(([re]) => re.test(body));
+        if (!pattern) return null;
+        steps.push({ descendant, test: pattern[1](body.match(pattern[0])!), position: positional ? parseInt(positional[2]) : null });
+    }
+    return { steps, target };
+};
+
+const XML_ENTITIES: Record<string, string> = { lt: '<', gt: '>', amp: '&', quot: '"', apos: "'" };
+
+const decodeEntities = (text: string) => text.indexOf('&') === -1 ? text : text.replace(/&(#x[0-9a-fA-F]+|#\d+|\w+);/g, (entity, ref: string) => {
+    if (ref[0] === '#') {
+        const code = ref[1] === 'x' ? parseInt(ref.slice(2), 16) : parseInt(ref.slice(1), 10);
+        return code <= 0x10ffff ? String.fromCodePoint(code) : entity;
+    }
+    return XML_ENTITIES[ref] ?? entity;
+});
+
+const normalizeNewlines = (text: string) => text.indexOf('\r') === -1 ? text : text.replace(/\r\n?/g, '\n');
+
+interface OpenElement {
+    qname: string;
+    localName: string;
+    namespaceURI: string | null;
+    namespaces: Record<string, string>; // In-scope prefix bindings, '' is the default namespace
+    childCounts: Map<string, number>;   // Sibling positions per (path, step) for positional predicates
+    positions: Map<string, number>;
+}
+
+interface PathState {
+    index: number;
+    path: SimplePath;
+    value: string | null;
+    found: boolean;
+    collecting: OpenElement | null; // First matching element, while its text content is being read
+    buffer: string[];
+}
+
+interface AssertionState {
+    assertion: any;
+    path: PathState | null;
+    error: string | null;
+    decided: boolean;
+}
+
+export const xpathAssertionError = (assertion: any, nodeValue: string | null, exists: boolean): string | null => {
+    if (assertion.operator === 'equals') {
+        if (nodeValue !== assertion.value) return `Expected XPath ${assertion.path} to equal ${assertion.value} but got ${nodeValue}`;
+    } else if (assertion.operator === 'contains') {
+        if (!nodeValue || !nodeValue.includes(assertion.value)) return `Expected XPath ${assertion.path} to contain ${assertion.value} but got ${nodeValue}`;
+    } else if (assertion.operator === 'exists') {
+        if (!exists) return `Expected XPath ${assertion.path} to exist`;
+    }
+    return null;
+};
+
+// The DOM path: the first failing assertion's message, or null when all of them pass
+export const evaluateFeedDom = (feedText: string, assertions: any[]): string | null => {
+    const doc = new DOMParser().parseFromString(feedText, 'text/xml');
+    for (const assertion of assertions) {
+        if (assertion.type === 'xpath') {
+            const nodes = AssertionCache.xpath(assertion).select({ node: doc as any });
+            const nodeValue = nodes[0] ? (nodes[0] as any).textContent : null;
+            const error = xpathAssertionError(assertion, nodeValue, !(!nodes || nodes.length === 0));
+            if (error) return error;
+        } else if (assertion.type === 'text') {
+            if (!feedText.includes(assertion.value)) return `Expected feed to contain text "${assertion.value}"`;
+        }
+    }
+    return null;
+};
+
+const matchesTest = (test: NodeTest, element: OpenElement) => {
+    if (test.name !== undefined) return element.namespaceURI === null && element.localName === test.name;
+    if (test.qname !== undefined) return element.qname === test.qname;
+    if (test.localName !== undefined) return element.localName === test.localName && element.namespaceURI === test.namespaceURI;
+    return true;
+};
+
+export class FeedStreamEvaluator {
+    public unsupported: string | null = null;
+    private paths: PathState[] = [];
+    private states: AssertionState[];
+    private stack: OpenElement[] = [];
+    private root = { childCounts: new Map<string, number>() };
+    private pending = '';
+    private textParts: string[] = [];
+    private textAssertions: { state: AssertionState, needle: string }[] = [];
+    private textTail = '';
+
+    constructor(assertions: any[]) {
+        const byPath = new Map<string, PathState>();
+        this.states = assertions.map(assertion => {
+            const state: AssertionState = { assertion, path: null, error: null, decided: true };
+            if (assertion.type === 'xpath' && ['equals', 'contains', 'exists'].includes(assertion.operator)) {
+                let pathState = byPath.get(assertion.path);
+                if (!pathState) {
+                    pathState = { index: this.paths.length, path: parseSimplePath(assertion.path)!, value: null, found: false, collecting: null, buffer: [] };
+                    byPath.set(assertion.path, pathState);
+                    this.paths.push(pathState);
+                }
+                state.path = pathState;
+                state.decided = false;
+            } else if (assertion.type === 'text') {
+                state.decided = false;
+                this.textAssertions.push({ state, needle: String(assertion.value) });
+            }
+            return state;
+        });
+    }
+
+    // True when every assertion is decided, or an earlier-listed failure already determines the outcome
+    get done(): boolean {
+        if (this.unsupported) return true;
+        for (const state of this.states) {
+            if (!state.decided) return false;
+            if (state.error) return true;
+        }
+        return true;
+    }
+
+    get firstError(): string | null {
+        return this.states.find(s => s.error)?.error || null;
+    }
+
+    write(chunk: string) {
+        this.scanText(chunk);
+        this.pending += chunk;
+        this.tokenize();
+    }
+
+    end() {
+        this.tokenize();
+        for (const state of this.states) {
+            if (state.decided) continue;
+            state.decided = true;
+            state.error = state.path
+                ? xpathAssertionError(state.assertion, null, false)
+                : `Expected feed to contain text "${state.assertion.value}"`;
+        }
+    }
+
+    private scanText(chunk: string) {
+        if (this.textAssertions.length === 0) return;
+        const window = this.textTail + chunk;
+        let keep = 0;
+        for (const { state, needle } of this.textAssertions) {
+            if (state.decided) continue;
+            if (window.includes(needle)) {
+                state.decided = true;
+            } else {
+                keep = Math.max(keep, needle.length - 1);
+            }
+        }
+        this.textTail = keep > 0 ? window.slice(-keep) : '';
+    }
+
+    private tokenize() {
+        let pos = 0;
+        const buf = this.pending;
+        while (pos < buf.length && !this.done) {
+            const lt = buf.indexOf('<', pos);
+            if (lt === -1) {
+                this.textParts.push(buf.slice(pos));
+                pos = buf.length;
+                break;
+            }
+            if (lt > pos) this.textParts.push(buf.slice(pos, lt));
+            pos = lt;
+
+            const end = this.markupEnd(buf, pos);
+            if (end === -1) break; // Incomplete markup: wait for the next chunk
+            this.flushText();
+            this.handleMarkup(buf.slice(pos, end));
+            pos = end;
+        }
+        this.pending = buf.slice(pos);
+    }
+
+    // Index just past the markup starting at pos, or -1 if it is not complete yet
+    private markupEnd(buf: string, pos: number): number {
+        const terminator = (token: string) => {
+            const i = buf.indexOf(token, pos);
+            return i === -1 ? -1 : i + token.length;
+        };
+        if (buf.startsWith('<!--', pos)) return terminator('-->');
+        if (buf.startsWith('<![CDATA[', pos)) return terminator(']]>');
+        if (buf.startsWith('<?', pos)) return terminator('?>');
+        if (buf.length - pos < 9 && ('<!--'.startsWith(buf.slice(pos)) || '<![CDATA['.startsWith(buf.slice(pos)))) return -1;
+        let quote: string | null = null;
+        for (let i = pos + 1; i < buf.length; i++) {
+            const c = buf[i];
+            if (quote) {
+                if (c === quote) quote = null;
+            } else if (c === '"' || c === "'") {
+                quote = c;
+            } else if (c === '>') {
+                return i + 1;
+            }
+        }
+        return -1;
+    }
+
+    private handleMarkup(markup: string) {
+        if (markup.startsWith('<!--') || markup.startsWith('<?')) return;
+        if (markup.startsWith('<![CDATA[')) {
+            this.emitText(normalizeNewlines(markup.slice(9, -3)));
+            return;
+        }
+        if (markup.startsWith('<!')) {
+            // An internal DTD subset can declare entities and defaults this tokenizer does not model
+            if (markup.includes('[')) this.unsupported = 'DOCTYPE with internal subset';
+            return;
+        }
+        if (markup.startsWith('</')) {
+            this.closeElement();
+            return;
+        }
+        const selfClosing = markup.endsWith('/>');
+        const body = markup.slice(1, selfClosing ? -2 : -1);
+        const nameMatch = body.match(/^\s*([^\s/>]+)/);
+        if (!nameMatch) return;
+        this.openElement(nameMatch[1], body.slice(nameMatch[0].length));
+        if (selfClosing) this.closeElement();
+    }
+
+    private flushText() {
+        if (this.textParts.length === 0) return;
+        const raw = this.textParts.join('');
+        this.textParts = [];
+        if (raw) this.emitText(normalizeNewlines(decodeEntities(raw)));
+    }
+
+    // One text or CDATA node, in document order
+    private emitText(text: string) {
+        const parent = this.stack[this.stack.length - 1];
+        if (!parent || !text) return;
+        for (const state of this.paths) {
+            if (state.found) continue;
+            if (state.collecting) {
+                state.buffer.push(text);
+            } else if (state.path.target.kind === 'text' && this.matchesStack(state)) {
+                this.resolve(state, text);
+            }
+        }
+    }
+
+    private openElement(qname: string, attributeText: string) {
+        const parent = this.stack[this.stack.length - 1];
+        const attributes: Record<string, string> = {};
+        const namespaces = { ...(parent ? parent.namespaces : {}) };
+        for (const m of attributeText.matchAll(/([^\s=]+)\s*=\s*(?:"([^"]*)"|'([^']*)')/g)) {
+            const value = normalizeNewlines(decodeEntities(m[2] ?? m[3]));
+            if (m[1] === 'xmlns') namespaces[''] = value;
+            else if (m[1].startsWith('xmlns:')) namespaces[m[1].slice(6)] = value;
+            else attributes[m[1]] = value;
+        }
+
+        const colon = qname.indexOf(':');
+        const prefix = colon === -1 ? '' : qname.slice(0, colon);
+        const element: OpenElement = {
+            qname,
+            localName: colon === -1 ? qname : qname.slice(colon + 1),
+            namespaceURI: namespaces[prefix] || null,
+            namespaces,
+            childCounts: new Map(),
+            positions: new Map()
+        };
+
+        const siblings = parent ? parent.childCounts : this.root.childCounts;
+        this.paths.forEach(state => state.path.steps.forEach((step, s) => {
+            if (step.position === null || !matchesTest(step.test, element)) return;
+            const key = `${state.index}:${s}`;
+            const position = (siblings.get(key) || 0) + 1;
+            siblings.set(key, position);
+            element.positions.set(key, position);
+        }));
+        this.stack.push(element);
+
+        this.paths.forEach(state => {
+            if (state.found || state.collecting || !this.matchesStack(state)) return;
+            const target = state.path.target;
+            if (target.kind === 'element') {
+                state.collecting = element;
+                state.buffer = [];
+            } else if (target.kind === 'attribute' && target.name in attributes) {
+                this.resolve(state, attributes[target.name]);
+            }
+        });
+    }
+
+    private closeElement() {
+        const element = this.stack.pop();
+        if (!element) return;
+        for (const state of this.paths) {
+            if (state.collecting === element) {
+                state.collecting = null;
+                this.resolve(state, state.buffer.join(''));
+                state.buffer = [];
+            }
+        }
+    }
+
+    private resolve(state: PathState, value: string) {
+        state.found = true;
+        state.value = value;
+        for (const assertionState of this.states) {
+            if (assertionState.path !== state) continue;
+            assertionState.decided = true;
+            assertionState.error = xpathAssertionError(assertionState.assertion, value, true);
+        }
+    }
+
+    private matchesStack({ index, path }: PathState): boolean {
+        const stepMatches = (s: number, element: OpenElement) => {
+            const step = path.steps[s];
+            return matchesTest(step.test, element) && (step.position === null || element.positions.get(`${index}:${s}`) === step.position);
+        };
+        const match = (s: number, depth: number): boolean => {
+            if (s === path.steps.length) return depth === this.stack.length;
+            if (!path.steps[s].descendant) {
+                return depth < this.stack.length && stepMatches(s, this.stack[depth]) && match(s + 1, depth + 1);
+            }
+            for (let d = depth; d < this.stack.length; d++) {
+                if (stepMatches(s, this.stack[d]) && match(s + 1, d + 1)) return true;
+            }
+            return false;
+        };
+        return match(0, 0);
+    }
+}
+
+export interface FeedStreamResult {
+    status: number;
+    headers: Record<string, string>;
+    url: string;
+    body: string;
+    bodyTruncated: boolean;
+    error: string | null;
+}
+
+// Resolves null on a redirect to another origin: the headers carry the context cookies resolved for the
+// original URL and the step's credentials, so that request is left to the request context instead
+const openStream = (url: string, headers: Record<string, string>, redirects = 0): Promise<{ response: http.IncomingMessage, url: string } | null> =>
+    new Promise((resolve, reject) => {
+        const client = url.startsWith('https:') ? https : http;
+        const request = client.get(url, { headers }, response => {
+            const location = response.headers.location;
+            if (location && [301, 302, 303, 307, 308].includes(response.statusCode || 0)) {
+                response.resume();
+                if (redirects >= MAX_REDIRECTS) return reject(new Error(`Max redirect count exceeded for ${url}`));
+                const target = new URL(location, url);
+                if (target.origin !== new URL(url).origin) return resolve(null);
+                openStream(target.toString(), headers, redirects + 1).then(resolve, reject);
+                return;
+            }
+            resolve({ response, url });
+        });
+        request.setTimeout(REQUEST_TIMEOUT_MS, () => request.destroy(new Error(`Feed request timed out after ${REQUEST_TIMEOUT_MS}ms`)));
+        request.on('error', reject);
+    });
+
+const decompress = (response: http.IncomingMessage): Readable => {
+    const encoding = (response.headers['content-encoding'] || '').toLowerCase();
+    const decoder = encoding === 'gzip' ? zlib.createGunzip()
+        : encoding === 'deflate' ? zlib.createInflate()
+            : encoding === 'br' ? zlib.createBrotliDecompress()
+                : null;
+    if (!decoder) return response;
+    response.on('error', e => decoder.destroy(e));
+    return response.pipe(decoder);
+};
+
+// Fetches the feed and evaluates the assertions as it arrives. Returns null when the feed has to be
+// fetched by the request context and evaluated on a full DOM after all (cross-origin redirect,
+// non UTF-8 charset, internal DTD subset).
+export const evaluateFeedStream = async (url: string, headers: Record<string, string>, assertions: any[]): Promise<FeedStreamResult | null> => {
+    const requestHeaders = { 'accept-encoding': 'gzip, deflate, br', ...headers };
+    const opened = await openStream(url, requestHeaders);
+    if (!opened) return null;
+    const { response, url: finalUrl } = opened;
+    const status = response.statusCode || 0;
+    const responseHeaders: Record<string, string> = {};
+    for (const [name, value] of Object.entries(response.headers)) {
+        if (value !== undefined) responseHeaders[name] = Array.isArray(value) ? value.join('\n') : value;
+    }
+    const result: FeedStreamResult = { status, headers: responseHeaders, url: finalUrl, body: '', bodyTruncated: false, error: null };
+
+    const charset = (responseHeaders['content-type'] || '').match(/charset\s*=\s*"?([\w-]+)/i)?.[1]?.toLowerCase();
+    if (status < 200 || status >= 300 || (charset && !['utf-8', 'utf8', 'us-ascii'].includes(charset))) {
+        response.destroy();
+        return status < 200 || status >= 300 ? result : null;
+    }
+
+    const evaluator = new FeedStreamEvaluator(assertions);
+    const decoder = new StringDecoder('utf8');
+    const stream = decompress(response);
+    const bodyParts: string[] = [];
+    let bodyLength = 0;
+    let stoppedEarly = false;
+    try {
+        for await (const chunk of stream) {
+            const text = decoder.write(chunk);
+            if (bodyLength < BODY_PREVIEW_LIMIT) bodyParts.push(text.slice(0, BODY_PREVIEW_LIMIT - bodyLength));
+            bodyLength += text.length;
+            evaluator.write(text);
+            if (evaluator.done) {
+                stoppedEarly = true;
+                break;
+            }
+        }
+        if (!stoppedEarly) evaluator.end();
+    } finally {
+        // Leaving the loop early stops reading: the rest of the feed is never downloaded
+        response.destroy();
+    }
+
+    if (evaluator.unsupported) {
+        console.log(`  [Feed] Streaming not possible (${evaluator.unsupported}), using full DOM`);
+        return null;
+    }
+    result.body = bodyParts.join('');
+    result.bodyTruncated = stoppedEarly || bodyLength > result.body.length;
+    result.error = evaluator.firstError;
+    return result;
+};
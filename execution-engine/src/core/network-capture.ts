@@ -0,0 +1,126 @@
+import { BrowserContext, Request, Response } from 'playwright';
+import * as fs from 'fs';
+
+// off: nothing; summary: every request without headers; failures: status >= 400 or failed requests;
+// xhr: XHR/fetch requests only; full: every request with request/response headers
+export type CaptureLevel = 'off' | 'summary' | 'failures' | 'xhr' | 'full';
+
+const CAPTURE_LEVELS: CaptureLevel[] = ['off', 'summary', 'failures', 'xhr', 'full'];
+const SPILL_CHUNK_SIZE = 500;
+
+export class NetworkCapture {
+    public level: CaptureLevel;
+    // Keyed by request identity: concurrent requests to the same URL no longer overwrite each other's start time
+    private startTimes = new WeakMap<Request, number>();
+    private inline: any[] = [];
+    private chunk: string[] = [];
+    private spill: fs.WriteStream | null = null;
+    private total = 0;
+
+    constructor(private spillPath: string, private inlineLimit: number = parseInt(process.env.NETWORK_CAPTURE_BUFFER || '2000'), level?: string) {
+        this.level = NetworkCapture.parseLevel(level);
+    }
+
+    static parseLevel(level?: string | null): CaptureLevel {
+        if (level && (CAPTURE_LEVELS as string[]).includes(level)) return level as CaptureLevel;
+        return NetworkCapture.parseLevel(process.env.NETWORK_CAPTURE_DEFAULT || 'full');
+    }
+
+    attach(context: BrowserContext, testCaseContext: { id: number | null, name: string | null }) {
+        context.on('request', request => {
+            if (this.level !== 'off') this.startTimes.set(request, Date.now());
+        });
+
+        context.on('response', async response => {
+            if (!this.shouldCapture(response.request(), response.status())) return;
+            try {
+                this.record(await this.buildEvent(response.request(), response, testCaseContext));
+            } catch (e) {
+                console.error('Error capturing network event:', e);
+            }
+        });
+
+        context.on('requestfailed', async request => {
+            if (!this.shouldCapture(request, null)) return;
+            try {
+                this.record({ ...(await this.buildEvent(request, null, testCaseContext)), error: request.failure()?.errorText || 'failed' });
+            } catch (e) {
+                console.error('Error capturing network event:', e);
+            }
+        });
+    }
+
+    // Returns the events to inline in the run summary; when more were captured than fit in the
+    // inline buffer, the complete log is in the spill file (NDJSON) and spillPath is set
+    async finish(): Promise<{ events: any[], total: number, spillPath: string | null }> {
+        if (!this.spill) {
+            return { events: this.inline, total: this.total, spillPath: null };
+        }
+        const spill = this.spill;
+        this.flushChunk();
+        await new Promise<void>((resolve, reject) => {
+            spill.on('error', reject);
+            spill.end(() => resolve());
+        });
+        return { events: this.inline, total: this.total, spillPath: this.spillPath };
+    }
+
+    private shouldCapture(request: Request, status: number | null): boolean {
+        switch (this.level) {
+            case 'off':
+                return false;
+            case 'failures':
+                return status === null || status >= 400;
+            case 'xhr':
+                return ['xhr', 'fetch'].includes(request.resourceType());
+            default:
+                return true;
+        }
+    }
+
+    private async buildEvent(request: Request, response: Response | null, testCaseContext: { id: number | null, name: string | null }) {
+        const endTime = Date.now();
+        const startTime = this.startTimes.get(request) || endTime;
+        this.startTimes.delete(request);
+
+        const event: any = {
+            testCaseId: testCaseContext.id,
+            testCaseName: testCaseContext.name,
+            url: request.url(),
+            method: request.method(),
+            resourceType: request.resourceType(),
+            status: response ? response.status() : null,
+            startTime,
+            endTime,
+            duration: endTime - startTime
+        };
+        // Header collection is the expensive part (a protocol round trip per call), so summary mode skips it
+        if (this.level !== 'summary') {
+            event.requestHeaders = await request.allHeaders();
+            event.responseHeaders = response ? await response.allHeaders() : {};
+        }
+        return event;
+    }
+
+    private record(event: any) {
+        this.total++;
+        if (this.inline.length < this.inlineLimit) {
+            this.inline.push(event);
+            return;
+        }
+        if (!this.spill) {
+            // First overflow: the spill file starts with everything captured so far
+            this.spill = fs.createWriteStream(this.spillPath);
+            this.chunk = this.inline.map(e => JSON.stringify(e));
+        }
+        this.chunk.push(JSON.stringify(event));
+        if (this.chunk.length >= SPILL_CHUNK_SIZE) this.flushChunk();
+    }
+
+    private flushChunk() {
+        if (this.spill && this.chunk.length > 0) {
+            this.spill.write(this.chunk.join('\n') + '\n');
+            this.chunk = [];
+        }
+    }
+}
@@ -0,0 +1,147 @@
+// Header/param injection rules compiled once per settings snapshot. Route handlers
+// consult the compiled form per request instead of re-normalizing the raw settings.
+
+interface DomainRule {
+    order: number; // Position in allowed_domains; the first listed match wins
+    headers: boolean;
+    params: boolean;
+}
+
+interface TrieNode {
+    children: Map<string, TrieNode>;
+    rule: DomainRule | null;
+}
+
+export interface RouteOverlay {
+    headers: Record<string, string> | null;
+    url: string | null;
+}
+
+const newNode = (): TrieNode => ({ children: new Map(), rule: null });
+
+export const getDomain = (url: string) => {
+    try {
+        return new URL(url).hostname;
+    } catch {
+        return '';
+    }
+};
+
+export const appendParams = (targetUrl: string, params: any) => {
+    try {
+        const urlObj = new URL(targetUrl);
+        for (const [key, value] of Object.entries(params)) {
+            const strValue = String(value);
+            const existingValues = urlObj.searchParams.getAll(key);
+            if (!existingValues.includes(strValue)) {
+                urlObj.searchParams.append(key, strValue);
+            }
+        }
+        return urlObj.toString();
+    } catch (e) {
+        return targetUrl;
+    }
+};
+
+const isSubdomainOf = (hostname: string, domain: string) => hostname === domain || hostname.endsWith(`.${domain}`);
+
+export class CompiledRouteRules {
+    private allowedDomains: TrieNode = newNode(); // Hostname labels, right to left
+    private domainSettings: Record<string, { headers?: any, params?: any }>;
+    private globalHeaders: Record<string, string>;
+    private globalParams: Record<string, any>;
+    private hasGlobalHeaders: boolean;
+    private hasGlobalParams: boolean;
+
+    constructor(settings: any) {
+        this.globalHeaders = settings?.headers || {};
+        this.globalParams = settings?.params || {};
+        this.domainSettings = settings?.domain_settings || {};
+        this.hasGlobalHeaders = Object.keys(this.globalHeaders).length > 0;
+        this.hasGlobalParams = Object.keys(this.globalParams).length > 0;
+
+        (settings?.allowed_domains || []).forEach((d: any, order: number) => {
+            const rule = typeof d === 'string'
+                ? { order, headers: true, params: false }
+                : { order, headers: d?.headers !== false, params: d?.params === true };
+            const domain = typeof d === 'string' ? d : d?.domain;
+            if (!domain) return;
+
+            let node = this.allowedDomains;
+            for (const label of domain.split('.').reverse()) {
+                if (!node.children.has(label)) node.children.set(label, newNode());
+                node = node.children.get(label)!;
+            }
+            if (!node.rule || node.rule.order > order) node.rule = rule;
+        });
+    }
+
+    private matchAllowedDomain(hostname: string): DomainRule | null {
+        let node: TrieNode | undefined = this.allowedDomains;
+        let match: DomainRule | null = null;
+        const labels = hostname.split('.');
+        for (let i = labels.length - 1; i >= 0 && node; i--) {
+            node = node.children.get(labels[i]);
+            if (node?.rule && (!match || node.rule.order < match.order)) match = node.rule;
+        }
+        return match;
+    }
+
+    // Cheap pre-filter for the route predicate: false means apply() would leave the request untouched
+    mayModify(hostname: string, sourceDomain: string | null): boolean {
+        if (this.domainSettings[hostname]) return true;
+        const sourceOverlay = sourceDomain ? this.domainSettings[sourceDomain] : undefined;
+        if (!this.hasGlobalHeaders && !this.hasGlobalParams && !sourceOverlay) return false;
+        return (sourceDomain !== null && isSubdomainOf(hostname, sourceDomain)) || this.matchAllowedDomain(hostname) !== null;
+    }
+
+    apply(urlStr: string, requestHeaders: Record<string, string>, sourceDomain: string | null): RouteOverlay {
+        const hostname = getDomain(urlStr);
+        const headers = { ...requestHeaders };
+        let modifiedHeaders = false;
+        let newUrl = urlStr;
+
+        // 1. Check for domain-specific settings first
+        const specific = this.domainSettings[hostname];
+        if (specific) {
+            if (specific.headers) {
+                Object.assign(headers, specific.headers);
+                modifiedHeaders = true;
+            }
+            if (specific.params) {
+                newUrl = appendParams(newUrl, specific.params);
+            }
+        }
+
+        // 2. Check source domain or allowed domains
+        const matchedAllowedDomain = this.matchAllowedDomain(hostname);
+        const isSourceDomain = sourceDomain !== null && isSubdomainOf(hostname, sourceDomain);
+
+        if (isSourceDomain || matchedAllowedDomain) {
+            const allowHeaders = isSourceDomain || matchedAllowedDomain?.headers;
+            const allowParams = isSourceDomain || matchedAllowedDomain?.params;
+
+            if (allowHeaders && this.hasGlobalHeaders) {
+                Object.assign(headers, this.globalHeaders);
+                modifiedHeaders = true;
+            }
+
+            const sourceOverlay = sourceDomain && hostname !== sourceDomain ? this.domainSettings[sourceDomain] : undefined;
+            if (sourceOverlay) {
+                if (allowHeaders && sourceOverlay.headers) {
+                    Object.assign(headers, sourceOverlay.headers);
+                    modifiedHeaders = true;
+                }
+                if (allowParams && sourceOverlay.params) {
+                    newUrl = appendParams(newUrl, sourceOverlay.params);
+                }
+            }
+
+            if (allowParams && this.hasGlobalParams) {
+                newUrl = appendParams(newUrl, this.globalParams);
+            }
+        }
+
+        return { headers: modifiedHeaders || newUrl !== urlStr ? headers : null, url: newUrl !== urlStr ? newUrl : null };
+    }
+}
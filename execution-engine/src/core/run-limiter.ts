@@ -0,0 +1,66 @@
+export interface RunLimiterOptions {
+    capacity: number;   // Runs executing at once
+    queueLimit: number; // Admitted runs allowed to wait for a free slot
+}
+
+export class RunLimiter {
+    private active = 0;
+    private queue: Array<() => void> = [];
+    private averageRunMs = 60000; // Moving average of run durations, used for Retry-After
+    private stats = { admitted: 0, rejected: 0, completed: 0 };
+
+    constructor(private options: RunLimiterOptions) { }
+
+    // Admits a run, or returns null when both the slots and the queue are full
+    tryAdmit(): Promise<() => void> | null {
+        if (this.active < this.options.capacity) {
+            this.active++;
+            this.stats.admitted++;
+            return Promise.resolve(this.releaser(Date.now()));
+        }
+        if (this.queue.length >= this.options.queueLimit) {
+            this.stats.rejected++;
+            return null;
+        }
+        this.stats.admitted++;
+        return new Promise(resolve => {
+            this.queue.push(() => {
+                this.active++;
+                resolve(this.releaser(Date.now()));
+            });
+        });
+    }
+
+    // Rough time until a queue slot frees up, in whole seconds
+    retryAfterSeconds(): number {
+        const estimate = (this.averageRunMs * (this.queue.length + 1)) / this.options.capacity / 1000;
+        return Math.min(300, Math.max(1, Math.ceil(estimate)));
+    }
+
+    snapshot() {
+        return { ...this.options, active: this.active, queued: this.queue.length, average_run_ms: Math.round(this.averageRunMs), ...this.stats };
+    }
+
+    private releaser(startedAt: number): () => void {
+        let released = false;
+        return () => {
+            if (released) return;
+            released = true;
+            this.active--;
+            this.stats.completed++;
+            this.averageRunMs = 0.8 * this.averageRunMs + 0.2 * (Date.now() - startedAt);
+            this.queue.shift()?.();
+        };
+    }
+}
+
+export const runLimiter = new RunLimiter({
+    capacity: parseInt(process.env.ENGINE_MAX_CONCURRENT_RUNS || '4'),
+    queueLimit: parseInt(process.env.ENGINE_MAX_QUEUED_RUNS || '16')
+});
+
+// API-only runs hold no browser, so they are admitted separately and never queue behind browser runs
+export const apiRunLimiter = new RunLimiter({
+    capacity: parseInt(process.env.ENGINE_MAX_CONCURRENT_API_RUNS || '32'),
+    queueLimit: parseInt(process.env.ENGINE_MAX_QUEUED_API_RUNS || '64')
+});
@@ -1,10 +1,11 @@
-import { Page, FrameLocator, Locator } from 'playwright';
-import { DOMParser } from '@xmldom/xmldom';
-import * as xpath from 'xpath';
-import Ajv from 'ajv';
-import addFormats from 'ajv-formats';
+import { APIRequestContext, Page, FrameLocator, Locator } from 'playwright';
+import { AssertionCache } from './assertion-cache';
+import { evaluateFeedDom, evaluateFeedStream, parseSimplePath } from './feed-stream';
 import * as path from 'path';
 
+// Feed checks whose XPath assertions are all simple paths are evaluated while the feed downloads
+const FEED_STREAMING = process.env.FEED_STREAMING !== 'false';
+
 export class TestExecutor {
     public static async executeStep(
         page: Page,
@@ -61,182 +62,9 @@ export class TestExecutor {
                 break;
             }
 
-            case 'http-request': {
-                const method = step.params?.method || 'GET';
-                const reqUrl = step.value || step.selector;
-                const stepHeaders = step.params?.headers || {};
-                const stepParams = step.params?.params || {};
-                const body = step.params?.body;
-
-                const mergedHeaders = { ...globalSettings.headers, ...stepHeaders };
-                const mergedParams = { ...globalSettings.params, ...stepParams };
-
-                console.log(`  [API] ${method} ${reqUrl} (Headers: ${Object.keys(mergedHeaders).length}, Params: ${Object.keys(mergedParams).length})`);
-
-                let apiResponse;
-                let actualRequestHeaders = mergedHeaders;
-                let actualRequestUrl = reqUrl;
-                const requestHandler = async (request: any) => {
-                    try {
-                        const requestUrl = request.url();
-                        if ((requestUrl === reqUrl || requestUrl.split('?')[0] === reqUrl.split('?')[0]) &&
-                            request.method() === method) {
-                            actualRequestHeaders = await request.allHeaders();
-                            actualRequestUrl = requestUrl;
-                            console.log(`    [API] Captured actual request URL: ${actualRequestUrl}`);
-                        }
-                    } catch (e) { }
-                };
-
-                page.context().on('request', requestHandler);
-                try {
-                    apiResponse = await page.request.fetch(reqUrl, {
-                        method,
-                        headers: mergedHeaders,
-                        params: mergedParams,
-                        data: body,
-                        timeout: 30000
-                    });
-                } finally {
-                    page.context().off('request', requestHandler);
-                }
-
-                const status = apiResponse.status();
-                const apiHeaders = apiResponse.headers();
-                const respBody = await apiResponse.text();
-                let jsonBody;
-                try { jsonBody = JSON.parse(respBody); } catch (e) { }
-
-                const resultObject = {
-                    type: 'http-request',
-                    status,
-                    headers: apiHeaders,
-                    body: respBody,
-                    request: {
-                        url: actualRequestUrl,
-                        method,
-                        headers: actualRequestHeaders,
-                        params: mergedParams,
-                        body
-                    }
-                };
-
-                if (step.params?.assertions) {
-                    for (const assertion of step.params.assertions) {
-                        try {
-                            if (assertion.type === 'status') {
-                                if (status !== parseInt(assertion.value)) {
-                                    throw new Error(`Expected status ${assertion.value} but got ${status}`);
-                                }
-                            } else if (assertion.type === 'json-path') {
-                                if (!jsonBody) throw new Error("Response is not JSON, cannot perform json-path assertion");
-                                const pathParts = assertion.path.split('.');
-                                let current = jsonBody;
-                                for (const part of pathParts) {
-                                    if (current === undefined || current === null) break;
-                                    current = current[part];
-                                }
-                                if (assertion.operator === 'equals') {
-                                    if (String(current) !== String(assertion.value)) {
-                                        throw new Error(`Expected ${assertion.path} to equal ${assertion.value} but got ${current}`);
-                                    }
-                                } else if (assertion.operator === 'contains') {
-                                    if (!String(current).includes(String(assertion.value))) {
-                                        throw new Error(`Expected ${assertion.path} to contain ${assertion.value} but got ${current}`);
-                                    }
-                                }
-                            } else if (assertion.type === 'json-schema') {
-                                if (!jsonBody) throw new Error("Response is not JSON, cannot perform json-schema assertion");
-                                const ajv = new Ajv({ allErrors: true });
-                                addFormats(ajv);
-                                const schema = JSON.parse(assertion.value || '{}');
-                                const validate = ajv.compile(schema);
-                                if (!validate(jsonBody)) {
-                                    const errors = validate.errors?.map((e: any) => `${e.instancePath} ${e.message}`).join(', ');
-                                    throw new Error(`JSON Schema validation failed: ${errors}`);
-                                }
-                            }
-                        } catch (e: any) {
-                            e.stepResult = resultObject;
-                            throw e;
-                        }
-                    }
-                }
-
-                return resultObject;
-            }
-
-            case 'feed-check': {
-                const feedUrl = step.value || step.selector;
-                const mergedHeaders = { ...globalSettings.headers };
-                const mergedParams = { ...globalSettings.params };
-
-                console.log(`  [Feed] Checking ${feedUrl}`);
-
-                let feedResponse;
-                let actualRequestHeaders = mergedHeaders;
-                let actualRequestUrl = feedUrl;
-                const requestHandler = async (request: any) => {
-                    try {
-                        const requestUrl = request.url();
-                        if ((requestUrl === feedUrl || requestUrl.split('?')[0] === feedUrl.split('?')[0]) && request.method() === 'GET') {
-                            actualRequestHeaders = await request.allHeaders();
-                            actualRequestUrl = requestUrl;
-                        }
-                    } catch (e) { }
-                };
-
-                page.context().on('request', requestHandler);
-                try {
-                    feedResponse = await page.request.get(feedUrl, { headers: mergedHeaders, params: mergedParams });
-                } finally {
-                    page.context().off('request', requestHandler);
-                }
-
-                if (!feedResponse.ok()) throw new Error(`Failed to fetch feed: ${feedResponse.status()}`);
-
-                const feedText = await feedResponse.text();
-                const doc = new DOMParser().parseFromString(feedText, 'text/xml');
-
-                const resultObject = {
-                    type: 'feed-check',
-                    status: feedResponse.status(),
-                    headers: feedResponse.headers(),
-                    body: feedText,
-                    request: {
-                        url: actualRequestUrl,
-                        method: 'GET',
-                        headers: actualRequestHeaders,
-                        params: mergedParams
-                    }
-                };
-
-                if (step.params?.assertions) {
-                    for (const assertion of step.params.assertions) {
-                        try {
-                            if (assertion.type === 'xpath') {
-                                const nodes = xpath.select(assertion.path, doc);
-                                const nodeValue = nodes[0] ? (nodes[0] as any).textContent : null;
-
-                                if (assertion.operator === 'equals') {
-                                    if (nodeValue !== assertion.value) throw new Error(`Expected XPath ${assertion.path} to equal ${assertion.value} but got ${nodeValue}`);
-                                } else if (assertion.operator === 'contains') {
-                                    if (!nodeValue || !nodeValue.includes(assertion.value)) throw new Error(`Expected XPath ${assertion.path} to contain ${assertion.value} but got ${nodeValue}`);
-                                } else if (assertion.operator === 'exists') {
-                                    if (!nodes || nodes.length === 0) throw new Error(`Expected XPath ${assertion.path} to exist`);
-                                }
-                            } else if (assertion.type === 'text') {
-                                if (!feedText.includes(assertion.value)) throw new Error(`Expected feed to contain text "${assertion.value}"`);
-                            }
-                        } catch (e: any) {
-                            e.stepResult = resultObject;
-                            throw e;
-                        }
-                    }
-                }
-
-                return resultObject;
-            }
+            case 'http-request':
+            case 'feed-check':
+                return TestExecutor.executeApiStep(page.request, step, globalSettings, page);
 
             case 'click': {
                 const clickSelector = step.selector || step.value;
@@ -374,4 +202,220 @@ export class TestExecutor {
                 console.warn(`Unknown step type: ${step.type}`);
         }
     }
+
+    // http-request and feed-check steps; they only need a request context, so API-only runs execute them without a browser
+    public static async executeApiStep(api: APIRequestContext, step: any, globalSettings: any = {}, page: Page | null = null): Promise<any> {
+        if (step.type === 'http-request') return TestExecutor.httpRequest(api, step, globalSettings, page);
+        if (step.type === 'feed-check') return TestExecutor.feedCheck(api, step, globalSettings, page);
+        throw new Error(`Step type ${step.type} needs a browser`);
+    }
+
+    private static async httpRequest(api: APIRequestContext, step: any, globalSettings: any, page: Page | null) {
+        const method = step.params?.method || 'GET';
+        const reqUrl = step.value || step.selector;
+        const stepHeaders = step.params?.headers || {};
+        const stepParams = step.params?.params || {};
+        const body = step.params?.body;
+
+        const mergedHeaders = { ...globalSettings.headers, ...stepHeaders };
+        const mergedParams = { ...globalSettings.params, ...stepParams };
+
+        console.log(`  [API] ${method} ${reqUrl} (Headers: ${Object.keys(mergedHeaders).length}, Params: ${Object.keys(mergedParams).length})`);
+
+        let apiResponse;
+        let actualRequestHeaders = mergedHeaders;
+        let actualRequestUrl = reqUrl;
+        const requestHandler = async (request: any) => {
+            try {
+                const requestUrl = request.url();
+                if ((requestUrl === reqUrl || requestUrl.split('?')[0] === reqUrl.split('?')[0]) &&
+                    request.method() === method) {
+                    actualRequestHeaders = await request.allHeaders();
+                    actualRequestUrl = requestUrl;
+                    console.log(`    [API] Captured actual request URL: ${actualRequestUrl}`);
+                }
+            } catch (e) { }
+        };
+
+        // Without a page (API-only runs) the headers sent are exactly the merged ones
+        page?.context().on('request', requestHandler);
+        try {
+            apiResponse = await api.fetch(reqUrl, {
+                method,
+                headers: mergedHeaders,
+                params: mergedParams,
+                data: body,
+                timeout: 30000
+            });
+        } finally {
+            page?.context().off('request', requestHandler);
+        }
+
+        const status = apiResponse.status();
+        const apiHeaders = apiResponse.headers();
+        const respBody = await apiResponse.text();
+        let jsonBody;
+        try { jsonBody = JSON.parse(respBody); } catch (e) { }
+
+        const resultObject = {
+            type: 'http-request',
+            status,
+            headers: apiHeaders,
+            body: respBody,
+            request: {
+                url: actualRequestUrl,
+                method,
+                headers: actualRequestHeaders,
+                params: mergedParams,
+                body
+            }
+        };
+
+        if (step.params?.assertions) {
+            for (const assertion of step.params.assertions) {
+                try {
+                    if (assertion.type === 'status') {
+                        if (status !== parseInt(assertion.value)) {
+                            throw new Error(`Expected status ${assertion.value} but got ${status}`);
+                        }
+                    } else if (assertion.type === 'json-path') {
+                        if (!jsonBody) throw new Error("Response is not JSON, cannot perform json-path assertion");
+                        const pathParts = AssertionCache.jsonPath(assertion);
+                        let current = jsonBody;
+                        for (const part of pathParts) {
+                            if (current === undefined || current === null) break;
+                            current = current[part];
+                        }
+                        if (assertion.operator === 'equals') {
+                            if (String(current) !== String(assertion.value)) {
+                                throw new Error(`Expected ${assertion.path} to equal ${assertion.value} but got ${current}`);
+                            }
+                        } else if (assertion.operator === 'contains') {
+                            if (!String(current).includes(String(assertion.value))) {
+                                throw new Error(`Expected ${assertion.path} to contain ${assertion.value} but got ${current}`);
+                            }
+                        }
+                    } else if (assertion.type === 'json-schema') {
+                        if (!jsonBody) throw new Error("Response is not JSON, cannot perform json-schema assertion");
+                        const validate = AssertionCache.jsonSchema(assertion);
+                        if (!validate(jsonBody)) {
+                            const errors = validate.errors?.map((e: any) => `${e.instancePath} ${e.message}`).join(', ');
+                            throw new Error(`JSON Schema validation failed: ${errors}`);
+                        }
+                    }
+                } catch (e: any) {
+                    e.stepResult = resultObject;
+                    throw e;
+                }
+            }
+        }
+
+        return resultObject;
+    }
+
+    private static async feedCheck(api: APIRequestContext, step: any, globalSettings: any, page: Page | null) {
+        const feedUrl = step.value || step.selector;
+        const mergedHeaders = { ...globalSettings.headers };
+        const mergedParams = { ...globalSettings.params };
+
+        console.log(`  [Feed] Checking ${feedUrl}`);
+
+        const assertions = step.params?.assertions || [];
+        if (FEED_STREAMING && assertions.every((a: any) => a.type !== 'xpath' || parseSimplePath(a.path))) {
+            const streamed = await TestExecutor.streamFeedCheck(api, page, feedUrl, mergedHeaders, mergedParams, assertions);
+            if (streamed) return streamed;
+        }
+
+        let feedResponse;
+        let actualRequestHeaders = mergedHeaders;
+        let actualRequestUrl = feedUrl;
+        const requestHandler = async (request: any) => {
+            try {
+                const requestUrl = request.url();
+                if ((requestUrl === feedUrl || requestUrl.split('?')[0] === feedUrl.split('?')[0]) && request.method() === 'GET') {
+                    actualRequestHeaders = await request.allHeaders();
+                    actualRequestUrl = requestUrl;
+                }
+            } catch (e) { }
+        };
+
+        page?.context().on('request', requestHandler);
+        try {
+            feedResponse = await api.get(feedUrl, { headers: mergedHeaders, params: mergedParams });
+        } finally {
+            page?.context().off('request', requestHandler);
+        }
+
+        if (!feedResponse.ok()) throw new Error(`Failed to fetch feed: ${feedResponse.status()}`);
+
+        const feedText = await feedResponse.text();
+
+        const resultObject = {
+            type: 'feed-check',
+            status: feedResponse.status(),
+            headers: feedResponse.headers(),
+            body: feedText,
+            request: {
+                url: actualRequestUrl,
+                method: 'GET',
+                headers: actualRequestHeaders,
+                params: mergedParams
+            }
+        };
+
+        if (step.params?.assertions) {
+            try {
+                const error = evaluateFeedDom(feedText, step.params.assertions);
+                if (error) throw new Error(error);
+            } catch (e: any) {
+                e.stepResult = resultObject;
+                throw e;
+            }
+        }
+
+        return resultObject;
+    }
+
+    // Returns null when the feed has to go through the DOM path after all
+    private static async streamFeedCheck(api: APIRequestContext, page: Page | null, feedUrl: string, headers: Record<string, any>, params: Record<string, any>, assertions: any[]) {
+        const url = new URL(feedUrl);
+        for (const [key, value] of Object.entries(params)) url.searchParams.set(key, String(value));
+
+        // Send what page.request would: the context's user agent and cookies, overridden by the step headers
+        const requestHeaders: Record<string, string> = {};
+        if (page) {
+            try {
+                requestHeaders['user-agent'] = String(await page.evaluate('navigator.userAgent'));
+            } catch (e) { }
+            const cookies = await page.context().cookies(url.toString());
+            if (cookies.length > 0) requestHeaders['cookie'] = cookies.map(c => `${c.name}=${c.value}`).join('; ');
+        } else if ((await api.storageState()).cookies.length > 0) {
+            return null; // Cookies set by earlier steps are only applied by the request context itself
+        }
+        for (const [name, value] of Object.entries(headers)) requestHeaders[name.toLowerCase()] = String(value);
+
+        const streamed = await evaluateFeedStream(url.toString(), requestHeaders, assertions);
+        if (!streamed) return null;
+        if (streamed.status < 200 || streamed.status >= 300) throw new Error(`Failed to fetch feed: ${streamed.status}`);
+
+        const resultObject = {
+            type: 'feed-check',
+            status: streamed.status,
+            headers: streamed.headers,
+            body: streamed.body, // Only what was read before the assertions were decided
+            body_truncated: streamed.bodyTruncated,
+            request: {
+                url: streamed.url,
+                method: 'GET',
+                headers: requestHeaders,
+                params
+            }
+        };
+        if (streamed.error) {
+            const e: any = new Error(streamed.error);
+            e.stepResult = resultObject;
+            throw e;
+        }
+        return resultObject;
+    }
 }
@@ -1,37 +1,69 @@
-import { Browser, BrowserContext, devices, Page, FrameLocator } from 'playwright';
-import * as Minio from 'minio';
+import { APIRequestContext, Browser, BrowserContext, devices, Page, FrameLocator, request } from 'playwright';
 import * as fs from 'fs';
 import * as path from 'path';
 import { BrowserManager } from './core/browser-manager';
+import { browserPool } from './core/browser-pool';
+import { artifactUploader } from './core/artifact-uploader';
 import { NetworkInterceptor } from './core/network-interceptor';
+import { NetworkCapture } from './core/network-capture';
 import { TestExecutor } from './core/test-executor';
 
-const MinioClient = (Minio as any).Client || Minio;
+const API_STEP_TYPES = ['http-request', 'feed-check'];
 
-const minioClient = new MinioClient({
-    endPoint: process.env.MINIO_ENDPOINT || 'localhost',
-    port: parseInt(process.env.MINIO_PORT || '9000'),
-    useSSL: false,
-    accessKey: process.env.MINIO_ACCESS_KEY || 'minioadmin',
-    secretKey: process.env.MINIO_SECRET_KEY || 'minioadmin'
+const toCaseResult = (testCase: any, status: string, durationMs: number, error: string | null, lastStepResult: any) => ({
+    test_case_id: testCase.id,
+    test_name: testCase.name, status, duration_ms: durationMs, error,
+    response_status: lastStepResult?.status, response_headers: lastStepResult?.headers, response_body: lastStepResult?.body,
+    response_body_truncated: lastStepResult?.body_truncated || false,
+    request_headers: lastStepResult?.request?.headers, request_body: lastStepResult?.request?.body, request_url: lastStepResult?.request?.url,
+    request_method: lastStepResult?.request?.method, request_params: lastStepResult?.request?.params
 });
 
-const BUCKET_NAME = process.env.MINIO_BUCKET_NAME || 'test-artifacts';
+// Live progress for streaming and callback callers: one event per finished step, never stored
+const stepEvent = (testCase: any, index: number, step: any, status: string, startedAt: number, shard?: { index: number, count: number }) => ({
+    type: 'step',
+    step: {
+        test_case_id: testCase.id, test_name: testCase.name, index, count: (testCase.steps || []).length,
+        type: step.type, status, duration_ms: Date.now() - startedAt, shard: shard || null
+    }
+});
 
 export class PlaywrightRunner {
     private browserManager = new BrowserManager();
 
-    async start(browserType: string = 'chromium') {
-        return this.browserManager.start(browserType);
+    // Runs made only of http-request/feed-check steps never touch a page
+    static isApiOnly(testCases: any[]): boolean {
+        return Array.isArray(testCases) && testCases.length > 0 &&
+            testCases.every(testCase => (testCase.steps || []).every((step: any) => API_STEP_TYPES.includes(step.type)));
+    }
+
+    async start(browserTypes: string[] = ['chromium']) {
+        return browserPool.warm(browserTypes);
     }
 
     async stop() {
-        return this.browserManager.stop();
+        return browserPool.drain();
+    }
+
+    async runTest(runId: number, testCases: any[], browserType: string = 'chromium', globalSettings: any = {}, device?: string, onEvent?: (event: any) => void, shard?: { index: number, count: number }, attempt: number = 1): Promise<any> {
+        if (PlaywrightRunner.isApiOnly(testCases)) {
+            return this.executeApiOnly(testCases, globalSettings, onEvent, shard);
+        }
+
+        // Browsers are pooled per type; every run still gets its own fresh contexts
+        const lease = await browserPool.acquire(browserType);
+        try {
+            const result = await this.execute(lease.browser, runId, testCases, browserType, globalSettings, device, onEvent, shard, attempt);
+            return { ...result, browser_pool: lease.timings };
+        } finally {
+            await lease.release();
+        }
     }
 
-    async runTest(runId: number, testCases: any[], browserType: string = 'chromium', globalSettings: any = {}, device?: string): Promise<any> {
-        const browser = await this.start(browserType);
-        const artifactsDir = process.env.ARTIFACTS_DIR ? path.join(process.env.ARTIFACTS_DIR, String(runId)) : `/tmp/artifacts/${runId}`;
+    private async execute(browser: Browser, runId: number, testCases: any[], browserType: string, globalSettings: any, device: string | undefined, onEvent: ((event: any) => void) | undefined, shard: { index: number, count: number } | undefined, attempt: number): Promise<any> {
+        // Retry attempts and concurrently executing shards of one run each get their own artifacts directory and object prefix
+        const artifactId = [String(runId), attempt > 1 ? `attempt-${attempt}` : null, shard ? `shard-${shard.index}` : null].filter(Boolean).join('/');
+        const artifactsDir = process.env.ARTIFACTS_DIR ? path.join(process.env.ARTIFACTS_DIR, artifactId) : `/tmp/artifacts/${artifactId}`;
         fs.mkdirSync(artifactsDir, { recursive: true });
 
         let contextOptions: any = {
@@ -79,12 +111,11 @@ export class PlaywrightRunner {
         }
 
         const sharedContext = await browser.newContext(contextOptions);
-        const requestStartTimes = new Map<string, number>();
-        const networkEvents: any[] = [];
+        const networkCapture = new NetworkCapture(path.join(artifactsDir, 'network.ndjson'), undefined, globalSettings?.network_capture);
         const testCaseContext = { id: null as number | null, name: null as string | null };
         const sourceDomain = { value: null as string | null };
 
-        await NetworkInterceptor.setupNetworkListeners(sharedContext, requestStartTimes, networkEvents, testCaseContext);
+        await NetworkInterceptor.setupNetworkListeners(sharedContext, networkCapture, testCaseContext);
 
         let currentSettings = {
             headers: globalSettings?.headers || {},
@@ -111,6 +142,17 @@ export class PlaywrightRunner {
         let videoKey: string | null = null;
         let screenshots: string[] = [];
 
+        // Artifacts upload as soon as they are on disk; object keys are deterministic so results never wait for them
+        const uploads = artifactUploader.batch();
+        const uploadNewScreenshots = () => {
+            for (const file of fs.readdirSync(artifactsDir).filter(f => f.endsWith('.png'))) {
+                const filePath = path.join(artifactsDir, file);
+                if (!uploads.has(filePath)) {
+                    screenshots.push(uploads.add(`runs/${artifactId}/screenshots/${file}`, filePath));
+                }
+            }
+        };
+
         try {
             if (!testCases || testCases.length === 0) throw new Error("No test cases provided");
 
@@ -131,6 +173,8 @@ export class PlaywrightRunner {
                         currentSettings.allowed_domains = testCase.settings.allowed_domains || [];
                         currentSettings.domain_settings = testCase.settings.domain_settings || {};
                     }
+                    // Capture level follows the case's suite settings, falling back to the run's
+                    networkCapture.level = NetworkCapture.parseLevel(testCase.settings?.network_capture || globalSettings?.network_capture);
 
                     sourceDomain.value = null;
                     const executionMode = testCase.executionMode || 'continuous';
@@ -140,7 +184,7 @@ export class PlaywrightRunner {
                         await this.browserManager.injectInitScripts(tempContext, browserType, device || null, emulatedAs || null);
                         await tempContext.tracing.start({ screenshots: true, snapshots: true, sources: true });
                         page = await tempContext.newPage();
-                        await NetworkInterceptor.setupNetworkListeners(tempContext, requestStartTimes, networkEvents, testCaseContext);
+                        await NetworkInterceptor.setupNetworkListeners(tempContext, networkCapture, testCaseContext);
                         await NetworkInterceptor.setupRouteInterception(tempContext, currentSettings, sourceDomain);
                     } else {
                         const pages = sharedContext.pages();
@@ -157,27 +201,36 @@ export class PlaywrightRunner {
 
                     let currentContext: Page | FrameLocator = page;
 
-                    for (const step of testCase.steps) {
-                        if (step.type === 'switch-frame') {
-                            const frameSelector = step.selector || step.value;
-                            if (frameSelector === 'main' || frameSelector === 'top') {
-                                currentContext = page;
-                            } else if (frameSelector) {
-                                if (step.options?.strict_lifecycle) {
-                                    const frameElement = currentContext.locator(frameSelector).first();
-                                    await frameElement.waitFor({ state: 'attached', timeout: 30000 });
-                                    const elementHandle = await frameElement.elementHandle();
-                                    const contentFrame = await elementHandle?.contentFrame();
-                                    if (contentFrame) await contentFrame.waitForLoadState('domcontentloaded', { timeout: 30000 });
+                    const steps = testCase.steps || [];
+                    for (let stepIndex = 0; stepIndex < steps.length; stepIndex++) {
+                        const step = steps[stepIndex];
+                        const stepStartTime = Date.now();
+                        try {
+                            if (step.type === 'switch-frame') {
+                                const frameSelector = step.selector || step.value;
+                                if (frameSelector === 'main' || frameSelector === 'top') {
+                                    currentContext = page;
+                                } else if (frameSelector) {
+                                    if (step.options?.strict_lifecycle) {
+                                        const frameElement = currentContext.locator(frameSelector).first();
+                                        await frameElement.waitFor({ state: 'attached', timeout: 30000 });
+                                        const elementHandle = await frameElement.elementHandle();
+                                        const contentFrame = await elementHandle?.contentFrame();
+                                        if (contentFrame) await contentFrame.waitForLoadState('domcontentloaded', { timeout: 30000 });
+                                    }
+                                    currentContext = currentContext.frameLocator(frameSelector);
+                                }
+                            } else {
+                                const stepResponse = await TestExecutor.executeStep(page, currentContext, step, currentSettings, testCaseContext);
+                                if (stepResponse && (step.type === 'http-request' || step.type === 'feed-check')) {
+                                    lastStepResult = stepResponse;
                                 }
-                                currentContext = currentContext.frameLocator(frameSelector);
-                            }
-                        } else {
-                            const stepResponse = await TestExecutor.executeStep(page, currentContext, step, currentSettings, testCaseContext);
-                            if (stepResponse && (step.type === 'http-request' || step.type === 'feed-check')) {
-                                lastStepResult = stepResponse;
                             }
+                        } catch (stepError) {
+                            onEvent?.(stepEvent(testCase, stepIndex, step, 'failed', stepStartTime, shard));
+                            throw stepError;
                         }
+                        onEvent?.(stepEvent(testCase, stepIndex, step, 'passed', stepStartTime, shard));
                     }
                 } catch (e: any) {
                     caseStatus = 'failed';
@@ -188,14 +241,19 @@ export class PlaywrightRunner {
                 } finally {
                     const caseEndTime = Date.now();
                     executionLog.push({ testCaseId: testCase.id, testCaseName: testCase.name, startTime: caseStartTime, endTime: caseEndTime, status: caseStatus, error: caseError });
-                    testResults.push({
-                        test_case_id: testCase.id,
-                        test_name: testCase.name, status: caseStatus, duration_ms: caseEndTime - caseStartTime, error: caseError,
-                        response_status: lastStepResult?.status, response_headers: lastStepResult?.headers, response_body: lastStepResult?.body,
-                        request_headers: lastStepResult?.request?.headers, request_body: lastStepResult?.request?.body, request_url: lastStepResult?.request?.url,
-                        request_method: lastStepResult?.request?.method, request_params: lastStepResult?.request?.params
-                    });
+                    const caseResult = toCaseResult(testCase, caseStatus, caseEndTime - caseStartTime, caseError, lastStepResult);
+                    // Streaming callers get each case as soon as it finishes instead of one final array
+                    if (onEvent) {
+                        onEvent({ type: 'result', result: caseResult });
+                    } else {
+                        testResults.push(caseResult);
+                    }
                     if (tempContext) await tempContext.close();
+                    try {
+                        uploadNewScreenshots();
+                    } catch (uploadError) {
+                        console.error("Error queuing screenshot uploads:", uploadError);
+                    }
                 }
             }
         } catch (e: any) {
@@ -206,29 +264,35 @@ export class PlaywrightRunner {
             await sharedContext.tracing.stop({ path: tracePath });
             await sharedContext.close();
 
+            let network: { events: any[], total: number, spillPath: string | null } = { events: [], total: 0, spillPath: null };
+            let networkLogKey: string | null = null;
+            try {
+                network = await networkCapture.finish();
+            } catch (captureError) {
+                console.error("Error finishing network capture:", captureError);
+            }
+
             try {
                 if (fs.existsSync(artifactsDir)) {
-                    traceKey = `runs/${runId}/trace.zip`;
                     if (fs.existsSync(tracePath)) {
-                        await minioClient.fPutObject(BUCKET_NAME, traceKey, tracePath);
-                    } else {
-                        traceKey = null;
+                        traceKey = uploads.add(`runs/${artifactId}/trace.zip`, tracePath);
                     }
 
-                    const files = fs.readdirSync(artifactsDir);
-                    for (const file of files.filter(f => f.endsWith('.png'))) {
-                        const key = `runs/${runId}/screenshots/${file}`;
-                        await minioClient.fPutObject(BUCKET_NAME, key, path.join(artifactsDir, file));
-                        screenshots.push(key);
+                    uploadNewScreenshots();
+
+                    if (network.spillPath) {
+                        networkLogKey = uploads.add(`runs/${artifactId}/network.ndjson`, network.spillPath);
                     }
 
-                    const videoFile = files.find(f => f.endsWith('.webm'));
+                    const videoFile = fs.readdirSync(artifactsDir).find(f => f.endsWith('.webm'));
                     if (videoFile) {
-                        videoKey = `runs/${runId}/video.webm`;
-                        await minioClient.fPutObject(BUCKET_NAME, videoKey, path.join(artifactsDir, videoFile));
+                        videoKey = uploads.add(`runs/${artifactId}/video.webm`, path.join(artifactsDir, videoFile));
                     }
 
-                    fs.rmSync(artifactsDir, { recursive: true, force: true });
+                    // Remove the local copies once every upload for this run has finished, without holding up the response
+                    uploads.settled()
+                        .then(() => fs.rmSync(artifactsDir, { recursive: true, force: true }))
+                        .catch((e) => console.error("Error removing artifacts directory:", e));
                 }
             } catch (cleanupError) {
                 console.error("Error during artifact cleanup:", cleanupError);
@@ -236,10 +300,79 @@ export class PlaywrightRunner {
 
             return {
                 status, duration_ms: duration, error, trace: traceKey, video: videoKey, screenshots: screenshots,
-                network_events: networkEvents, execution_log: executionLog, results: testResults
+                network_events: network.events, network_events_total: network.total, network_log: networkLogKey, execution_log: executionLog, results: testResults, shard: shard || null
             };
         }
+    }
+
+    // Executes HTTP steps on a Playwright request context instead of a page: no browser lease, contexts, video,
+    // trace or screenshots. The run's request context keeps connections alive across its steps and cases.
+    private async executeApiOnly(testCases: any[], globalSettings: any, onEvent: ((event: any) => void) | undefined, shard: { index: number, count: number } | undefined): Promise<any> {
+        const startTime = Date.now();
+        const executionLog: any[] = [];
+        const testResults: any[] = [];
+        const sharedRequest = await request.newContext();
+        const currentSettings = {
+            headers: globalSettings?.headers || {},
+            params: globalSettings?.params || {}
+        };
+
+        try {
+            for (const testCase of testCases) {
+                const caseStartTime = Date.now();
+                let caseStatus = 'passed';
+                let caseError = null;
+                let lastStepResult: any = null;
+                // 'separate' cases get their own cookie jar, as they get their own browser context otherwise
+                let tempRequest: APIRequestContext | null = null;
+
+                try {
+                    if (testCase.settings) {
+                        currentSettings.headers = testCase.settings.headers || {};
+                        currentSettings.params = testCase.settings.params || {};
+                    }
+                    if ((testCase.executionMode || 'continuous') === 'separate') {
+                        tempRequest = await request.newContext();
+                    }
+                    const steps = testCase.steps || [];
+                    for (let stepIndex = 0; stepIndex < steps.length; stepIndex++) {
+                        const step = steps[stepIndex];
+                        const stepStartTime = Date.now();
+                        console.log(`  Step: ${step.type} ${step.selector || ''} ${step.value || ''}`);
+                        try {
+                            lastStepResult = await TestExecutor.executeApiStep(tempRequest || sharedRequest, step, currentSettings);
+                        } catch (stepError) {
+                            onEvent?.(stepEvent(testCase, stepIndex, step, 'failed', stepStartTime, shard));
+                            throw stepError;
+                        }
+                        onEvent?.(stepEvent(testCase, stepIndex, step, 'passed', stepStartTime, shard));
+                    }
+                } catch (e: any) {
+                    caseStatus = 'failed';
+                    caseError = e.message;
+                    if (e.stepResult) {
+                        lastStepResult = e.stepResult;
+                    }
+                } finally {
+                    const caseEndTime = Date.now();
+                    executionLog.push({ testCaseId: testCase.id, testCaseName: testCase.name, startTime: caseStartTime, endTime: caseEndTime, status: caseStatus, error: caseError });
+                    const caseResult = toCaseResult(testCase, caseStatus, caseEndTime - caseStartTime, caseError, lastStepResult);
+                    if (onEvent) {
+                        onEvent({ type: 'result', result: caseResult });
+                    } else {
+                        testResults.push(caseResult);
+                    }
+                    if (tempRequest) await tempRequest.dispose();
+                }
+            }
+        } finally {
+            await sharedRequest.dispose();
+        }
 
+        return {
+            status: 'passed', duration_ms: Date.now() - startTime, error: null, trace: null, video: null, screenshots: [],
+            network_events: [], network_events_total: 0, network_log: null, execution_log: executionLog, results: testResults,
+            shard: shard || null, api_only: true
+        };
     }
 }
-
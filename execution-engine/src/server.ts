@@ -1,15 +1,17 @@
 import express from 'express';
 import bodyParser from 'body-parser';
 import { PlaywrightRunner } from './runner';
+import { CallbackReporter } from './core/callback-reporter';
+import { browserPool } from './core/browser-pool';
+import { apiRunLimiter, runLimiter } from './core/run-limiter';
 
 const app = express();
 const port = process.env.PORT || 3000;
-const runner = new PlaywrightRunner();
 
 app.use(bodyParser.json());
 
 app.post('/run', async (req, res) => {
-    const { runId, testCases, browser, globalSettings, device } = req.body;
+    const { runId, testCases, browser, globalSettings, device, stream, callbackUrl, callbackToken, shard, attempt } = req.body;
     console.log(`Received run request for runId: ${runId}`);
     console.log(`Test Cases received: ${JSON.stringify(testCases)}`);
     console.log(`Browser: ${browser}`);
@@ -19,14 +21,72 @@ app.post('/run', async (req, res) => {
         return res.status(400).json({ error: 'runId is required' });
     }
 
+    // Backpressure: beyond ENGINE_MAX_CONCURRENT_RUNS running plus ENGINE_MAX_QUEUED_RUNS waiting, reject and let the caller retry
+    const limiter = PlaywrightRunner.isApiOnly(testCases) ? apiRunLimiter : runLimiter;
+    const admission = limiter.tryAdmit();
+    if (!admission) {
+        const retryAfter = limiter.retryAfterSeconds();
+        console.warn(`Rejecting run ${runId}: engine at capacity, retry after ${retryAfter}s`);
+        res.setHeader('Retry-After', String(retryAfter));
+        return res.status(429).json({ error: 'Execution engine at capacity', retryAfter });
+    }
+    // Each run gets its own runner; browsers come from the shared pool, contexts are per run
+    const runner = new PlaywrightRunner();
+
+    if (callbackUrl) {
+        // Fire-and-forget: acknowledge immediately and report progress to the backend as it happens
+        const reporter = new CallbackReporter(callbackUrl, callbackToken || '');
+        res.status(202).json({ accepted: true, runId });
+
+        const release = await admission;
+        try {
+            const result = await runner.runTest(runId, testCases, browser, globalSettings, device, (event) => reporter.emit(event), shard, attempt);
+            await reporter.emit({ type: 'complete', ...result });
+        } catch (e: any) {
+            await reporter.emit({ type: 'error', error: e.message, shard: shard || null });
+        } finally {
+            release();
+        }
+        return;
+    }
+
+    if (stream) {
+        // NDJSON: one `result` event per finished test case, then a final `complete` (or `error`) event
+        res.status(200);
+        res.setHeader('Content-Type', 'application/x-ndjson');
+        res.flushHeaders();
+        const emit = (event: any) => res.write(JSON.stringify(event) + '\n');
+
+        const release = await admission;
+        try {
+            const result = await runner.runTest(runId, testCases, browser, globalSettings, device, emit, shard, attempt);
+            emit({ type: 'complete', ...result });
+        } catch (e: any) {
+            emit({ type: 'error', error: e.message, shard: shard || null });
+        } finally {
+            release();
+        }
+        return res.end();
+    }
+
+    const release = await admission;
     try {
         const result = await runner.runTest(runId, testCases, browser, globalSettings, device);
         res.json(result);
     } catch (e: any) {
         res.status(500).json({ error: e.message });
+    } finally {
+        release();
     }
 });
 
+app.get('/pool', (req, res) => {
+    res.json({ runs: runLimiter.snapshot(), api_runs: apiRunLimiter.snapshot(), browsers: browserPool.snapshot() });
+});
+
 app.listen(port, () => {
     console.log(`Execution Engine listening at http://localhost:${port}`);
+    // Pre-launch browsers so the first runs skip startup (comma-separated browser types, empty to disable)
+    const warmTypes = (process.env.BROWSER_POOL_WARM ?? 'chromium').split(',').map(t => t.trim()).filter(Boolean);
+    new PlaywrightRunner().start(warmTypes);
 });
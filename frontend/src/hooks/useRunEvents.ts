@@ -0,0 +1,95 @@
+import { useEffect, useRef, useState } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import { openRunEvents, runListEventsPath, RunEvent, RUN_EVENT_TYPES, TestRunSummary } from '@/lib/api';
+
+// Reconnect delay after a stream fails, doubled per failure in a row (a 204 or 503 answer also lands here)
+const REOPEN_DELAY_MS = 3000;
+const MAX_REOPEN_DELAY_MS = 60000;
+
+// Subscribes to a run event stream while mounted. Returns whether it is connected,
+// so callers keep polling only while live updates are unavailable.
+export function useRunEvents(path: string | null, onEvent: (event: RunEvent) => void) {
+    const [connected, setConnected] = useState(false);
+    const handler = useRef(onEvent);
+    handler.current = onEvent;
+
+    useEffect(() => {
+        if (!path) return;
+        let source: EventSource | null = null;
+        let reopenTimer: ReturnType<typeof setTimeout> | null = null;
+        let delay = REOPEN_DELAY_MS;
+        let unmounted = false;
+        const listener = (message: MessageEvent) => handler.current(JSON.parse(message.data));
+
+        const reopen = () => {
+            if (unmounted) return;
+            reopenTimer = setTimeout(open, delay);
+            delay = Math.min(delay * 2, MAX_REOPEN_DELAY_MS);
+        };
+        const open = async () => {
+            let opened: EventSource;
+            try {
+                opened = await openRunEvents(path);
+            } catch {
+                return reopen();
+            }
+            if (unmounted) return opened.close();
+            source = opened;
+            source.onopen = () => {
+                delay = REOPEN_DELAY_MS;
+                setConnected(true);
+            };
+            // The server ends streams every few minutes and stream tokens expire, so rather than letting
+            // EventSource retry with the old token, reconnect with a new one and poll in the meantime
+            source.onerror = () => {
+                setConnected(false);
+                opened.close();
+                reopen();
+            };
+            RUN_EVENT_TYPES.forEach(type => opened.addEventListener(type, listener as EventListener));
+        };
+        open();
+
+        return () => {
+            unmounted = true;
+            if (reopenTimer) clearTimeout(reopenTimer);
+            source?.close();
+            setConnected(false);
+        };
+    }, [path]);
+
+    return connected;
+}
+
+type RunsPage = { runs: TestRunSummary[] };
+
+// Keeps every cached ["runs", ...] page current from the run list stream: known runs are
+// patched in place, a run no cached page shows (a new one) refetches the lists at most once a second
+export function useRunListEvents(projectId?: number) {
+    const queryClient = useQueryClient();
+    const refetchTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+    useEffect(() => () => {
+        if (refetchTimer.current) clearTimeout(refetchTimer.current);
+    }, []);
+
+    return useRunEvents(runListEventsPath(projectId), (event) => {
+        if (event.type !== 'status') return;
+        let found = false;
+        queryClient.setQueriesData<RunsPage>({ queryKey: ['runs'] }, (page) => {
+            if (!page?.runs?.some(run => run.id === event.run_id)) return page;
+            found = true;
+            return { ...page, runs: page.runs.map(run => run.id === event.run_id ? { ...run, ...event.run } : run) };
+        });
+        if (['passed', 'failed', 'error'].includes(event.run.status)) {
+            // A finished run has just been added to the daily rollups
+            queryClient.invalidateQueries({ queryKey: ['project-stats', event.project_id] });
+        }
+        if (!found && !refetchTimer.current) {
+            refetchTimer.current = setTimeout(() => {
+                refetchTimer.current = null;
+                queryClient.invalidateQueries({ queryKey: ['runs'] });
+            }, 1000);
+        }
+    });
+}
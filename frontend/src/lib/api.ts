@@ -42,10 +42,7 @@ export interface TestRun {
     error_message?: string;
     ai_analysis?: string;
     response_status?: number;
-    request_headers?: Record<string, string>;
-    response_headers?: Record<string, string>;
-    network_events?: any[];
-    execution_log?: any[];
+    network_log_url?: string;
     browser?: string;
     device?: string;
     screenshots?: string[];
@@ -57,36 +54,45 @@ export interface TestRun {
         error_message?: string;
         screenshots?: string[];
         response_status?: number;
-        response_headers?: Record<string, string>;
-        response_body?: string;
-        request_headers?: Record<string, string>;
-        request_body?: string;
         request_url?: string;
         request_method?: string;
+        test_case_id?: number | null;
     }[];
     user?: {
         id: number;
         email: string;
         full_name: string;
     };
+    // "non_blocking" / "separate" when the owner's quarantine setting applied, "quarantine" for the run of the split-off cases
+    quarantine_mode?: "non_blocking" | "separate" | "quarantine" | null;
+    quarantined_case_ids?: number[] | null;
+    quarantine_of_id?: number | null;
 }
 
+// Row of the runs list; results and logs come from getRun
+export type TestRunSummary = Pick<TestRun,
+    "id" | "created_at" | "status" | "suite_name" | "test_case_name" | "total_tests" | "passed_tests" |
+    "failed_tests" | "duration_ms" | "error_message" | "browser" | "device" | "user" | "quarantine_mode"
+> & { project_id?: number; attempt: number };
+
 export const getRuns = async (
     limit: number = 50,
-    offset: number = 0,
+    cursor?: string,
     search?: string,
     status?: string,
     browser?: string,
-    device?: string
-): Promise<{ runs: TestRun[], total: number, limit: number, offset: number }> => {
+    device?: string,
+    includeTotal: boolean = false
+): Promise<{ runs: TestRunSummary[], next_cursor: string | null, total: number | null, limit: number }> => {
     const params = new URLSearchParams({
         limit: limit.toString(),
-        offset: offset.toString(),
     });
+    if (cursor) params.append('cursor', cursor);
     if (search) params.append('search', search);
     if (status) params.append('status', status);
     if (browser) params.append('browser', browser);
     if (device) params.append('device', device);
+    if (includeTotal) params.append('include_total', 'true');
 
     const response = await api.get(`/runs?${params.toString()}`);
     return response.data;
@@ -100,7 +106,89 @@ export const getRun = async (id: number): Promise<TestRun> => {
     return response.data;
 };
 
-export const triggerRun = async (suiteId: number, caseId?: number, browser: string | string[] = "chromium", device?: string | string[]): Promise<TestRun | TestRun[]> => {
+// Live run progress over Server-Sent Events, pushed as the worker and engine report it
+
+export interface RunStep {
+    test_case_id: number;
+    test_name: string;
+    index: number;
+    count: number;
+    type: string;
+    status: "passed" | "failed";
+    duration_ms: number;
+}
+
+export type RunEvent =
+    | { type: "status"; run_id: number; project_id: number | null; run: Omit<TestRunSummary, "user"> }
+    | { type: "result"; run_id: number; result: NonNullable<TestRun["results"]>[number] }
+    | { type: "step"; run_id: number; step: RunStep };
+
+export const RUN_EVENT_TYPES: RunEvent["type"][] = ["status", "result", "step"];
+
+export const runEventsPath = (runId: number) => `/runs/${runId}/events`;
+
+export const runListEventsPath = (projectId?: number) => projectId ? `/runs/events?project_id=${projectId}` : "/runs/events";
+
+export const getRunEventsToken = async (): Promise<string> => {
+    const response = await api.post("/runs/events/token");
+    return response.data.stream_token;
+};
+
+export const openRunEvents = async (path: string): Promise<EventSource> => {
+    // EventSource cannot send an Authorization header. A short-lived token scoped to event streams goes
+    // in the query string instead of the login token, so access logs and history never hold the latter
+    const token = await getRunEventsToken();
+    const separator = path.includes("?") ? "&" : "?";
+    return new EventSource(`${api.defaults.baseURL}${path}${separator}stream_token=${encodeURIComponent(token)}`);
+};
+
+// Heavy run data is served by dedicated endpoints and fetched only when shown
+
+export interface RunPayload {
+    request_headers: Record<string, string> | null;
+    response_headers: Record<string, string> | null;
+}
+
+export interface ResultPayload {
+    request_headers: Record<string, string> | null;
+    request_body: string | null;
+    response_headers: Record<string, string> | null;
+    response_body: string | null;
+    response_body_truncated: boolean;
+}
+
+export const getRunPayload = async (runId: number): Promise<RunPayload> => {
+    const response = await api.get(`/runs/${runId}/payload`);
+    return response.data;
+};
+
+export const getRunNetworkEvents = async (
+    runId: number,
+    options: { offset?: number, limit?: number, search?: string, testCaseId?: number, failed?: boolean } = {}
+): Promise<{ events: any[], total: number, offset: number, limit: number, network_log_url: string | null }> => {
+    const params = new URLSearchParams({
+        offset: (options.offset || 0).toString(),
+        limit: (options.limit || 100).toString(),
+    });
+    if (options.search) params.append('search', options.search);
+    if (options.testCaseId !== undefined) params.append('test_case_id', options.testCaseId.toString());
+    if (options.failed) params.append('failed', 'true');
+
+    const response = await api.get(`/runs/${runId}/network-events?${params.toString()}`);
+    return response.data;
+};
+
+export const getRunExecutionLog = async (runId: number): Promise<any[]> => {
+    const response = await api.get(`/runs/${runId}/execution-log`);
+    return response.data.entries;
+};
+
+export const getResultPayload = async (runId: number, resultId: number): Promise<ResultPayload> => {
+    const response = await api.get(`/runs/${runId}/results/${resultId}/payload`);
+    return response.data;
+};
+
+export const triggerRun = async (suiteId: number, caseId?: number, browser: string | string[] = "chromium", device?: string | string[], coalesce: boolean = false): Promise<TestRun | TestRun[]> => {
     let url = `/runs?suite_id=${suiteId}`;
 
     if (Array.isArray(browser)) {
@@ -120,6 +208,11 @@ export const triggerRun = async (suiteId: number, caseId?: number, browser: stri
             url += `&device=${encodeURIComponent(device)}`;
         }
     }
+
+    // Attach to an identical run that is still pending instead of queuing a duplicate
+    if (coalesce) {
+        url += `&coalesce=true`;
+    }
     const response = await api.post(url);
     return response.data;
 };
@@ -134,6 +227,33 @@ export const updateTestCase = async (caseId: number, data: any): Promise<any> =>
     return response.data;
 };
 
+// Recent outcome window of a case; quarantined is the effective verdict, override included
+export interface TestCaseFlakiness {
+    test_case_id: number;
+    project_id: number | null;
+    test_name: string | null;
+    outcomes: string;
+    flips: number;
+    flip_rate: number;
+    failure_streak: number;
+    total_outcomes: number;
+    quarantined: boolean;
+    quarantine_override: boolean | null;
+    quarantined_at: string | null;
+    updated_at: string;
+}
+
+export const getTestCaseFlakiness = async (caseId: number): Promise<TestCaseFlakiness> => {
+    const response = await api.get(`/cases/${caseId}/flakiness`);
+    return response.data;
+};
+
+// true / false pins the case in or out of quarantine; null hands it back to the automatic verdict
+export const setTestCaseQuarantine = async (caseId: number, quarantined: boolean | null): Promise<TestCaseFlakiness> => {
+    const response = await api.put(`/cases/${caseId}/quarantine`, { quarantined });
+    return response.data;
+};
+
 export const getArtifactUrl = async (path: string): Promise<string> => {
     // path is like "runs/1/trace.zip"
     const response = await api.get(`/artifacts/${encodeURIComponent(path)}`);
@@ -172,6 +292,7 @@ export interface UserSettings {
     trace_files: boolean;
     retention_period: number;
     auto_cleanup: boolean;
+    quarantine_mode: "off" | "non_blocking" | "separate";
 }
 
 export const getSettings = async (): Promise<UserSettings> => {
@@ -373,6 +494,56 @@ export const getProjects = async (wsId?: number): Promise<Project[]> => {
     return response.data;
 };
 
+// Outcome counts and durations of finished runs, from GET /projects/{id}/stats
+export interface RunStats {
+    total: number;
+    passed: number;
+    failed: number;
+    error: number;
+    pass_rate: number | null;
+    avg_duration_ms: number | null;
+    p50_duration_ms: number | null;
+    p95_duration_ms: number | null;
+}
+
+export interface ProjectStats {
+    project_id: number;
+    since: string;
+    until: string;
+    totals: RunStats;
+    days: (RunStats & { day: string })[];
+    groups?: (RunStats & { key: number | string | null, name: string | null })[];
+}
+
+export const getProjectStats = async (
+    projectId: number,
+    days: number = 30,
+    filters: { testSuiteId?: number, testCaseId?: number, browser?: string, device?: string, groupBy?: "suite" | "case" | "browser" | "device" } = {}
+): Promise<ProjectStats> => {
+    const params = new URLSearchParams({ days: days.toString() });
+    if (filters.testSuiteId) params.append('test_suite_id', filters.testSuiteId.toString());
+    if (filters.testCaseId) params.append('test_case_id', filters.testCaseId.toString());
+    if (filters.browser) params.append('browser', filters.browser);
+    if (filters.device !== undefined) params.append('device', filters.device);
+    if (filters.groupBy) params.append('group_by', filters.groupBy);
+
+    const response = await api.get(`/projects/${projectId}/stats?${params.toString()}`);
+    return response.data;
+};
+
+export const getFlakyCases = async (
+    projectId: number,
+    filters: { quarantinedOnly?: boolean, minFlipRate?: number, limit?: number } = {}
+): Promise<TestCaseFlakiness[]> => {
+    const params = new URLSearchParams();
+    if (filters.quarantinedOnly) params.append('quarantined_only', 'true');
+    if (filters.minFlipRate !== undefined) params.append('min_flip_rate', filters.minFlipRate.toString());
+    if (filters.limit) params.append('limit', filters.limit.toString());
+
+    const response = await api.get(`/projects/${projectId}/flaky-cases?${params.toString()}`);
+    return response.data;
+};
+
 export const createProject = async (data: { name: string, description?: string, workspace_id: number }): Promise<Project> => {
     const response = await api.post("/projects", data);
     return response.data;
@@ -1,29 +1,59 @@
+import { useEffect, useState } from 'react';
 import { useQuery } from '@tanstack/react-query';
-import { getRuns } from '@/lib/api';
+import { getRuns, getProjectStats } from '@/lib/api';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { CheckCircle2, XCircle, Clock, TrendingUp } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 
 import { useAuth } from '@/context/AuthContext';
+import { useRunListEvents } from '@/hooks/useRunEvents';
+
+const STATS_DAYS = 30;
 
 export default function Dashboard() {
     const { user } = useAuth();
     const navigate = useNavigate();
+    // Status changes are pushed; poll only while the live stream is down
+    const live = useRunListEvents();
     const { data: runsData } = useQuery({
         queryKey: ['runs'],
-        queryFn: () => getRuns(),
-        refetchInterval: 2000,
+        queryFn: () => getRuns(50),
+        refetchInterval: live ? false : 2000,
+    });
+
+    const [activeProjectId, setActiveProjectId] = useState<number | null>(() => {
+        const saved = localStorage.getItem('activeProjectId');
+        return saved ? parseInt(saved) : null;
+    });
+
+    useEffect(() => {
+        const handleProjectChange = () => {
+            const saved = localStorage.getItem('activeProjectId');
+            setActiveProjectId(saved ? parseInt(saved) : null);
+        };
+        window.addEventListener('projectChanged', handleProjectChange);
+        return () => window.removeEventListener('projectChanged', handleProjectChange);
+    }, []);
+
+    // Pass rates and durations come from the daily rollups, not from pages of runs
+    const { data: projectStats } = useQuery({
+        queryKey: ['project-stats', activeProjectId, STATS_DAYS],
+        queryFn: () => getProjectStats(activeProjectId!, STATS_DAYS),
+        enabled: !!activeProjectId,
+        refetchInterval: 30000,
     });
 
     const runs = runsData?.runs || [];
+    const totals = projectStats?.totals;
     const stats = {
-        total: runsData?.total || 0,
-        passed: runs.filter(r => r.status === 'passed').length,
-        failed: runs.filter(r => r.status === 'failed').length,
+        total: totals?.total || 0,
+        passed: totals?.passed || 0,
+        failed: (totals?.failed || 0) + (totals?.error || 0),
         running: runs.filter(r => r.status === 'running').length,
     };
 
-    const passRate = stats.total > 0 ? ((stats.passed / stats.total) * 100).toFixed(1) : 0;
+    const passRate = totals?.pass_rate ?? 0;
+    const formatDuration = (ms: number | null | undefined) => ms == null ? '—' : `${(ms / 1000).toFixed(2)}s`;
 
     return (
         <div className="space-y-6">
@@ -41,7 +71,7 @@ export default function Dashboard() {
                     </CardHeader>
                     <CardContent>
                         <div className="text-2xl font-bold">{stats.total}</div>
-                        <p className="text-xs text-muted-foreground mt-1">All test executions</p>
+                        <p className="text-xs text-muted-foreground mt-1">Finished in the last {STATS_DAYS} days</p>
                     </CardContent>
                 </Card>
 
@@ -79,6 +109,34 @@ export default function Dashboard() {
                 </Card>
             </div>
 
+            {/* Trend */}
+            <Card>
+                <CardHeader className="flex flex-row items-center justify-between space-y-0">
+                    <CardTitle>Last {STATS_DAYS} Days</CardTitle>
+                    <p className="text-sm text-muted-foreground">
+                        Duration p50 {formatDuration(totals?.p50_duration_ms)} · p95 {formatDuration(totals?.p95_duration_ms)}
+                    </p>
+                </CardHeader>
+                <CardContent>
+                    <div className="flex items-end gap-1 h-24">
+                        {(projectStats?.days || []).map((day) => (
+                            <div
+                                key={day.day}
+                                className="flex-1 flex flex-col justify-end h-full bg-secondary/40 rounded-sm overflow-hidden"
+                                title={`${day.day}: ${day.total} runs, ${day.pass_rate ?? 0}% passed, p95 ${formatDuration(day.p95_duration_ms)}`}
+                            >
+                                {day.total > 0 && (
+                                    <>
+                                        <div className="bg-red-500/70" style={{ height: `${((day.failed + day.error) / day.total) * 100}%` }} />
+                                        <div className="bg-green-500/70" style={{ height: `${(day.passed / day.total) * 100}%` }} />
+                                    </>
+                                )}
+                            </div>
+                        ))}
+                    </div>
+                </CardContent>
+            </Card>
+
             {/* Recent Runs */}
             <Card>
                 <CardHeader>
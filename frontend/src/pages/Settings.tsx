@@ -11,7 +11,7 @@ import {
     SelectValue,
 } from "@/components/ui/select";
 import { Checkbox } from "@/components/ui/checkbox";
-import { getSettings, updateSettings } from '@/lib/api';
+import { getSettings, updateSettings, UserSettings } from '@/lib/api';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 
 export default function Settings() {
@@ -30,6 +30,7 @@ export default function Settings() {
     const [defaultTimeout, setDefaultTimeout] = useState(30000);
     const [autoRetry, setAutoRetry] = useState(false);
     const [maxRetries, setMaxRetries] = useState(3);
+    const [quarantineMode, setQuarantineMode] = useState<UserSettings['quarantine_mode']>('off');
     const [parallelExecution, setParallelExecution] = useState(false);
     const [maxParallelTests, setMaxParallelTests] = useState(3);
 
@@ -72,6 +73,7 @@ export default function Settings() {
             setDefaultTimeout(settings.default_timeout);
             setAutoRetry(settings.auto_retry);
             setMaxRetries(settings.max_retries);
+            setQuarantineMode(settings.quarantine_mode);
             setParallelExecution(settings.parallel_execution);
             setMaxParallelTests(settings.max_parallel_tests);
             setMultiBrowserEnabled(settings.multi_browser_enabled);
@@ -113,6 +115,7 @@ export default function Settings() {
             default_timeout: defaultTimeout,
             auto_retry: autoRetry,
             max_retries: maxRetries,
+            quarantine_mode: quarantineMode,
             parallel_execution: parallelExecution,
             max_parallel_tests: maxParallelTests,
             multi_browser_enabled: multiBrowserEnabled,
@@ -143,6 +146,7 @@ export default function Settings() {
             setDefaultTimeout(settings.default_timeout);
             setAutoRetry(settings.auto_retry);
             setMaxRetries(settings.max_retries);
+            setQuarantineMode(settings.quarantine_mode);
             setParallelExecution(settings.parallel_execution);
             setMaxParallelTests(settings.max_parallel_tests);
             setMultiBrowserEnabled(settings.multi_browser_enabled);
@@ -385,6 +389,27 @@ export default function Settings() {
                                         </div>
                                     )}
 
+                                    <div>
+                                        <label className="block text-sm font-medium text-gray-700 mb-2">Flaky Test Quarantine</label>
+                                        <Select
+                                            value={quarantineMode}
+                                            onValueChange={(value) => {
+                                                setQuarantineMode(value as UserSettings['quarantine_mode']);
+                                                setHasUnsavedChanges(true);
+                                            }}
+                                        >
+                                            <SelectTrigger className="w-full">
+                                                <SelectValue placeholder="Select mode" />
+                                            </SelectTrigger>
+                                            <SelectContent>
+                                                <SelectItem value="off">Off</SelectItem>
+                                                <SelectItem value="non_blocking">Run them without failing the run</SelectItem>
+                                                <SelectItem value="separate">Run them separately at low priority</SelectItem>
+                                            </SelectContent>
+                                        </Select>
+                                        <p className="text-xs text-gray-500 mt-1">Tests that keep flipping between pass and fail are quarantined automatically and skipped by auto-retry</p>
+                                    </div>
+
                                     <div className="flex items-center justify-between p-4 bg-gray-50 rounded-lg">
                                         <div>
                                             <p className="font-medium text-gray-900">Parallel Execution</p>
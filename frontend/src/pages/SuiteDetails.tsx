@@ -1115,6 +1115,45 @@ export default function SuiteDetails() {
                                     </div>
                                 </div>
 
+                                {/* Network Capture Setting */}
+                                <div className="flex items-center justify-between p-4 bg-muted/30 rounded-lg border border-border">
+                                    <div>
+                                        <h3 className="font-semibold text-foreground">Network Capture</h3>
+                                        <p className="text-sm text-muted-foreground">
+                                            How much network activity is recorded for this module's test runs.
+                                            {suite.inherit_settings && !suite.settings?.network_capture && suite.effective_settings?.network_capture &&
+                                                ` Inherited: ${suite.effective_settings.network_capture}.`}
+                                        </p>
+                                    </div>
+                                    <div className="flex items-center gap-2">
+                                        <Select
+                                            value={suite.settings?.network_capture || 'default'}
+                                            onValueChange={(value) => {
+                                                const newSettings: any = { ...(suite.settings || { headers: {}, params: {} }) };
+                                                if (value === 'default') delete newSettings.network_capture;
+                                                else newSettings.network_capture = value;
+                                                handleUpdateSettings(
+                                                    newSettings,
+                                                    suite.inherit_settings,
+                                                    `Network capture updated to ${value}`
+                                                );
+                                            }}
+                                        >
+                                            <SelectTrigger className="w-[180px]">
+                                                <SelectValue placeholder="Select level" />
+                                            </SelectTrigger>
+                                            <SelectContent>
+                                                <SelectItem value="default">{suite.inherit_settings ? 'Inherit' : 'Default (full)'}</SelectItem>
+                                                <SelectItem value="full">Full</SelectItem>
+                                                <SelectItem value="xhr">XHR / Fetch only</SelectItem>
+                                                <SelectItem value="failures">Failures only</SelectItem>
+                                                <SelectItem value="summary">Summary (no headers)</SelectItem>
+                                                <SelectItem value="off">Off</SelectItem>
+                                            </SelectContent>
+                                        </Select>
+                                    </div>
+                                </div>
+
                                 <div className="grid gap-6 md:grid-cols-2">
                                     <div className="space-y-4">
                                         <h3 className="font-semibold flex items-center gap-2">
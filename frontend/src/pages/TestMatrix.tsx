@@ -1,6 +1,7 @@
 import { useState } from "react";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { getRuns, deleteRun, deleteRuns } from "@/lib/api";
+import { useRunListEvents } from "@/hooks/useRunEvents";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Eye, Clock, CheckCircle2, XCircle, AlertCircle, Trash2, MoreHorizontal, Search } from "lucide-react";
@@ -36,33 +37,39 @@ export default function TestMatrix() {
     const [deleteDialogOpen, setDeleteDialogOpen] = useState(false);
     const [runToDelete, setRunToDelete] = useState<number | null>(null);
     const [isDeletingAll, setIsDeletingAll] = useState(false);
-    const [currentPage, setCurrentPage] = useState(1);
+    // Keyset pagination: the cursor of every page visited so far, the first page has none
+    const [pageCursors, setPageCursors] = useState<(string | undefined)[]>([undefined]);
+    const currentPage = pageCursors.length;
     const [pageSize, setPageSize] = useState(50);
     const [searchTerm, setSearchTerm] = useState('');
     const [statusFilter, setStatusFilter] = useState<string>('');
     const [browserFilter, setBrowserFilter] = useState<string>('');
     const [deviceFilter, setDeviceFilter] = useState<string>('');
 
+    // Status changes are pushed; poll only while the live stream is down
+    const live = useRunListEvents();
     const { data, isLoading } = useQuery({
-        queryKey: ["runs", currentPage, pageSize, searchTerm, statusFilter, browserFilter, deviceFilter],
+        queryKey: ["runs", pageCursors[pageCursors.length - 1], pageSize, searchTerm, statusFilter, browserFilter, deviceFilter],
         queryFn: () => getRuns(
             pageSize,
-            (currentPage - 1) * pageSize,
+            pageCursors[pageCursors.length - 1],
             searchTerm || undefined,
             statusFilter || undefined,
             browserFilter || undefined,
-            deviceFilter || undefined
+            deviceFilter || undefined,
+            true
         ),
-        refetchInterval: 2000,
+        refetchInterval: live ? false : 2000,
     });
 
     const runs = data?.runs || [];
     const total = data?.total || 0;
-    const totalPages = Math.ceil(total / pageSize);
+    const nextCursor = data?.next_cursor || null;
+    const totalPages = Math.max(currentPage, Math.ceil(total / pageSize));
 
     // Reset to page 1 when filters change
     const handleFilterChange = () => {
-        setCurrentPage(1);
+        setPageCursors([undefined]);
     };
 
 
@@ -393,17 +400,17 @@ export default function TestMatrix() {
                     </div>
 
                     {/* Pagination Controls */}
-                    {totalPages > 1 && (
+                    {(currentPage > 1 || nextCursor) && (
                         <div className="flex items-center justify-between px-4 py-3 border-t border-gray-200">
                             <div className="flex items-center gap-2">
                                 <span className="text-sm text-gray-700">
-                                    Showing {((currentPage - 1) * pageSize) + 1} to {Math.min(currentPage * pageSize, total)} of {total} runs
+                                    Showing {((currentPage - 1) * pageSize) + 1} to {((currentPage - 1) * pageSize) + runs.length} of {total} runs
                                 </span>
                                 <Select
                                     value={pageSize.toString()}
                                     onValueChange={(value) => {
                                         setPageSize(Number(value));
-                                        setCurrentPage(1);
+                                        setPageCursors([undefined]);
                                     }}
                                 >
                                     <SelectTrigger className="w-[130px] ml-2 h-8">
@@ -420,7 +427,7 @@ export default function TestMatrix() {
                                 <Button
                                     variant="outline"
                                     size="sm"
-                                    onClick={() => setCurrentPage(1)}
+                                    onClick={() => setPageCursors([undefined])}
                                     disabled={currentPage === 1}
                                 >
                                     First
@@ -428,7 +435,7 @@ export default function TestMatrix() {
                                 <Button
                                     variant="outline"
                                     size="sm"
-                                    onClick={() => setCurrentPage(p => Math.max(1, p - 1))}
+                                    onClick={() => setPageCursors(cursors => cursors.length > 1 ? cursors.slice(0, -1) : cursors)}
                                     disabled={currentPage === 1}
                                 >
                                     Previous
@@ -439,19 +446,11 @@ export default function TestMatrix() {
                                 <Button
                                     variant="outline"
                                     size="sm"
-                                    onClick={() => setCurrentPage(p => Math.min(totalPages, p + 1))}
-                                    disabled={currentPage === totalPages}
+                                    onClick={() => nextCursor && setPageCursors(cursors => [...cursors, nextCursor])}
+                                    disabled={!nextCursor}
                                 >
                                     Next
                                 </Button>
-                                <Button
-                                    variant="outline"
-                                    size="sm"
-                                    onClick={() => setCurrentPage(totalPages)}
-                                    disabled={currentPage === totalPages}
-                                >
-                                    Last
-                                </Button>
                             </div>
                         </div>
                     )}
@@ -1,6 +1,7 @@
-import { useQuery } from "@tanstack/react-query";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import { useParams, Link } from "react-router-dom";
-import { getRun, getArtifactUrl } from "@/lib/api";
+import { getRun, getArtifactUrl, getRunPayload, getRunNetworkEvents, getRunExecutionLog, getResultPayload, runEventsPath, RunStep, TestRun } from "@/lib/api";
+import { useRunEvents } from "@/hooks/useRunEvents";
 import { ArrowLeft, Brain, FileText, Video, ChevronDown, ChevronRight, CheckCircle, XCircle, Copy, Check } from "lucide-react";
 import { useState } from "react";
 import { TraceTimeline } from "@/components/TraceTimeline";
@@ -14,6 +15,8 @@ export default function TestRunDetails() {
     const [showRespHeaders, setShowRespHeaders] = useState(false);
     const [testSearchTerm, setTestSearchTerm] = useState('');
     const [isTestCasesExpanded, setIsTestCasesExpanded] = useState(false);
+    const [currentStep, setCurrentStep] = useState<RunStep | null>(null);
+    const queryClient = useQueryClient();
 
     const { data: run, isLoading } = useQuery({
         queryKey: ["run", runId],
@@ -21,6 +24,47 @@ export default function TestRunDetails() {
         enabled: isValidRunId,
     });
 
+    // Status, counters and finished cases are pushed into the cached run while it executes
+    useRunEvents(isValidRunId ? runEventsPath(runId) : null, (event) => {
+        if (event.type === "step") {
+            setCurrentStep(event.step);
+            return;
+        }
+        if (event.type === "result") {
+            queryClient.setQueryData<TestRun>(["run", runId], (old) => {
+                if (!old) return old;
+                const results = old.results || [];
+                const known = results.some(result => result.id === event.result.id);
+                return { ...old, results: known ? results.map(result => result.id === event.result.id ? event.result : result) : [...results, event.result] };
+            });
+            return;
+        }
+        const previous = queryClient.getQueryData<TestRun>(["run", runId]);
+        queryClient.setQueryData<TestRun>(["run", runId], (old) => old && { ...old, ...event.run, user: old.user });
+        const finished = !["pending", "running"].includes(event.run.status);
+        if (finished) setCurrentStep(null);
+        if (finished && previous && ["pending", "running"].includes(previous.status)) {
+            // Artifacts, logs and payloads are written when the run completes
+            queryClient.invalidateQueries({ queryKey: ["run", runId] });
+            queryClient.invalidateQueries({ queryKey: ["run-payload", runId] });
+            queryClient.invalidateQueries({ queryKey: ["run-network-events", runId] });
+            queryClient.invalidateQueries({ queryKey: ["run-execution-log", runId] });
+        }
+    });
+
+    const { data: runPayload } = useQuery({
+        queryKey: ["run-payload", runId],
+        queryFn: () => getRunPayload(runId),
+        enabled: isValidRunId,
+    });
+
+    // Only the count here; the section pages through the events itself once expanded
+    const { data: networkSummary } = useQuery({
+        queryKey: ["run-network-events", runId, "summary"],
+        queryFn: () => getRunNetworkEvents(runId, { limit: 1 }),
+        enabled: isValidRunId,
+    });
+
     const { data: traceUrl } = useQuery({
         queryKey: ["trace", run?.trace_url],
         queryFn: () => getArtifactUrl(run!.trace_url!),
@@ -33,6 +77,12 @@ export default function TestRunDetails() {
         enabled: !!run?.video_url,
     });
 
+    const { data: executionLog } = useQuery({
+        queryKey: ["run-execution-log", runId],
+        queryFn: () => getRunExecutionLog(runId),
+        enabled: !!traceUrl,
+    });
+
     if (!isValidRunId) return <div className="p-4">Invalid Run ID</div>;
     if (isLoading) return <div className="p-4">Loading...</div>;
     if (!run) return <div className="p-4">Run not found</div>;
@@ -55,6 +105,11 @@ export default function TestRunDetails() {
                     <p className="text-gray-500 mt-1">
                         Status: <span className="font-medium text-gray-900">{run.status}</span>
                     </p>
+                    {run.status === "running" && currentStep && (
+                        <p className="text-sm text-gray-500 mt-1">
+                            {currentStep.test_name}: step {currentStep.index + 1} of {currentStep.count} ({currentStep.type}) {currentStep.status}
+                        </p>
+                    )}
                 </div>
             </div>
 
@@ -107,7 +162,8 @@ export default function TestRunDetails() {
                                     {run.results
                                         .filter(result => result.test_name.toLowerCase().includes(testSearchTerm.toLowerCase()))
                                         .map((result) => (
-                                            <TestCaseResultItem key={result.id} result={result} />
+                                            <TestCaseResultItem key={result.id} runId={run.id} result={result}
+                                                quarantined={!!result.test_case_id && !!run.quarantined_case_ids?.includes(result.test_case_id)} />
                                         ))}
                                     {run.results.filter(result => result.test_name.toLowerCase().includes(testSearchTerm.toLowerCase())).length === 0 && (
                                         <p className="text-center text-gray-500 py-4 italic text-sm">No matching test cases found</p>
@@ -119,6 +175,26 @@ export default function TestRunDetails() {
                 );
             })()}
 
+            {run.quarantine_mode && !!run.quarantined_case_ids?.length && (
+                <div className="bg-amber-50 border border-amber-200 rounded-lg p-4 text-sm text-amber-800">
+                    {run.quarantine_mode === 'non_blocking' && (
+                        <>{run.quarantined_case_ids.length} quarantined test(s) ran in this run; their failures do not fail it.</>
+                    )}
+                    {run.quarantine_mode === 'separate' && (
+                        <>{run.quarantined_case_ids.length} quarantined test(s) were left out of this run and run separately at low priority.</>
+                    )}
+                    {run.quarantine_mode === 'quarantine' && (
+                        <>
+                            This run executes the quarantined tests of{' '}
+                            {run.quarantine_of_id
+                                ? <Link to={`/runs/${run.quarantine_of_id}`} className="font-medium underline">run #{run.quarantine_of_id}</Link>
+                                : 'a deleted run'}
+                            ; its result does not affect that run.
+                        </>
+                    )}
+                </div>
+            )}
+
             {run.error_message && (
                 <div className="bg-red-50 border border-red-200 rounded-lg p-4">
                     <h3 className="text-red-800 font-semibold flex items-center gap-2">
@@ -141,9 +217,21 @@ export default function TestRunDetails() {
                 </div>
             )}
 
-            {(run.network_events && run.network_events.length > 0) ? (
-                <NetworkActivitySection events={run.network_events} />
-            ) : (run.response_status || run.request_headers) && (
+            {run.network_log_url && (
+                <p className="text-sm text-gray-500">
+                    Network activity below is truncated.{" "}
+                    <button
+                        className="text-blue-600 hover:underline"
+                        onClick={async () => window.open(await getArtifactUrl(run.network_log_url!), "_blank")}
+                    >
+                        Download the full network log
+                    </button>
+                </p>
+            )}
+
+            {(networkSummary && networkSummary.total > 0) ? (
+                <NetworkActivitySection runId={run.id} total={networkSummary.total} />
+            ) : (run.response_status || runPayload?.request_headers) && (
                 <div className="bg-gray-50 border border-gray-200 rounded-lg p-4">
                     <h3 className="text-gray-800 font-semibold flex items-center gap-2 mb-3">
                         <FileText size={18} />
@@ -157,7 +245,7 @@ export default function TestRunDetails() {
                             </p>
                         </div>
 
-                        {run.request_headers && (
+                        {runPayload?.request_headers && (
                             <div className="col-span-full border-t pt-4">
                                 <div className="flex items-center justify-between w-full mb-1">
                                     <button
@@ -166,21 +254,21 @@ export default function TestRunDetails() {
                                     >
                                         {showReqHeaders ? <ChevronDown size={16} /> : <ChevronRight size={16} />}
                                         Request Headers
-                                        <span className="text-xs font-normal text-gray-400">({Object.keys(run.request_headers).length} items)</span>
+                                        <span className="text-xs font-normal text-gray-400">({Object.keys(runPayload.request_headers).length} items)</span>
                                     </button>
-                                    {showReqHeaders && <CopyButton text={JSON.stringify(run.request_headers, null, 2)} />}
+                                    {showReqHeaders && <CopyButton text={JSON.stringify(runPayload.request_headers, null, 2)} />}
                                 </div>
                                 {showReqHeaders && (
                                     <pre className="mt-2 text-xs bg-white p-3 rounded border overflow-x-auto font-mono text-gray-800 shadow-inner min-h-[50px]">
-                                        {Object.keys(run.request_headers).length > 0
-                                            ? JSON.stringify(run.request_headers, null, 2)
+                                        {Object.keys(runPayload.request_headers).length > 0
+                                            ? JSON.stringify(runPayload.request_headers, null, 2)
                                             : "No request headers captured"}
                                     </pre>
                                 )}
                             </div>
                         )}
 
-                        {run.response_headers && (
+                        {runPayload?.response_headers && (
                             <div className="col-span-full border-t pt-4">
                                 <div className="flex items-center justify-between w-full mb-1">
                                     <button
@@ -189,14 +277,14 @@ export default function TestRunDetails() {
                                     >
                                         {showRespHeaders ? <ChevronDown size={16} /> : <ChevronRight size={16} />}
                                         Response Headers
-                                        <span className="text-xs font-normal text-gray-400">({Object.keys(run.response_headers).length} items)</span>
+                                        <span className="text-xs font-normal text-gray-400">({Object.keys(runPayload.response_headers).length} items)</span>
                                     </button>
-                                    {showRespHeaders && <CopyButton text={JSON.stringify(run.response_headers, null, 2)} />}
+                                    {showRespHeaders && <CopyButton text={JSON.stringify(runPayload.response_headers, null, 2)} />}
                                 </div>
                                 {showRespHeaders && (
                                     <pre className="mt-2 text-xs bg-white p-3 rounded border overflow-x-auto font-mono text-gray-800 shadow-inner min-h-[50px]">
-                                        {Object.keys(run.response_headers).length > 0
-                                            ? JSON.stringify(run.response_headers, null, 2)
+                                        {Object.keys(runPayload.response_headers).length > 0
+                                            ? JSON.stringify(runPayload.response_headers, null, 2)
                                             : "No response headers captured"}
                                     </pre>
                                 )}
@@ -222,7 +310,7 @@ export default function TestRunDetails() {
                                 Download Full Trace
                             </a>
                         </div>
-                        <TraceTimeline url={traceUrl} executionLog={run.execution_log} />
+                        <TraceTimeline url={traceUrl} executionLog={executionLog} />
                     </div>
                 )}
 
@@ -280,9 +368,21 @@ export default function TestRunDetails() {
     );
 }
 
-function NetworkActivitySection({ events }: { events: any[] }) {
+const NETWORK_PAGE_SIZE = 200;
+
+function NetworkActivitySection({ runId, total }: { runId: number, total: number }) {
     const [isExpanded, setIsExpanded] = useState(false);
     const [searchTerm, setSearchTerm] = useState('');
+    const [limit, setLimit] = useState(NETWORK_PAGE_SIZE);
+
+    // Filtering and paging happen server-side; events are fetched once the section is opened
+    const { data, isFetching } = useQuery({
+        queryKey: ["run-network-events", runId, searchTerm, limit],
+        queryFn: () => getRunNetworkEvents(runId, { search: searchTerm || undefined, limit }),
+        enabled: isExpanded,
+        placeholderData: (previous) => previous,
+    });
+    const events = data?.events || [];
 
     // Group events by testCaseName or testCaseId
     const groupedEvents = events.reduce((acc: any, event: any) => {
@@ -292,17 +392,6 @@ function NetworkActivitySection({ events }: { events: any[] }) {
         return acc;
     }, {});
 
-    // Filter events based on search
-    const filterEvents = (events: any[]) => {
-        if (!searchTerm) return events;
-        const lowerTerm = searchTerm.toLowerCase();
-        return events.filter(e =>
-            e.url.toLowerCase().includes(lowerTerm) ||
-            e.method.toLowerCase().includes(lowerTerm) ||
-            String(e.status).includes(lowerTerm)
-        );
-    };
-
     return (
         <div className="bg-gray-50 border border-gray-200 rounded-lg p-4">
             <div className="flex items-center justify-between mb-3">
@@ -311,7 +400,7 @@ function NetworkActivitySection({ events }: { events: any[] }) {
                     className="flex items-center gap-2 text-gray-800 font-semibold hover:text-primary transition-colors"
                 >
                     <FileText size={18} />
-                    Network Activity ({events.length})
+                    Network Activity ({total})
                     {isExpanded ? <ChevronDown size={20} /> : <ChevronRight size={20} />}
                 </button>
 
@@ -320,7 +409,7 @@ function NetworkActivitySection({ events }: { events: any[] }) {
                         type="text"
                         placeholder="Filter requests..."
                         value={searchTerm}
-                        onChange={(e) => setSearchTerm(e.target.value)}
+                        onChange={(e) => { setSearchTerm(e.target.value); setLimit(NETWORK_PAGE_SIZE); }}
                         className="px-3 py-1 text-sm border rounded-md w-64 focus:outline-none focus:ring-1 focus:ring-primary"
                     />
                 )}
@@ -328,22 +417,28 @@ function NetworkActivitySection({ events }: { events: any[] }) {
 
             {isExpanded && (
                 <div className="space-y-4 animate-in slide-in-from-top-2 fade-in duration-200">
-                    {Object.entries(groupedEvents).map(([groupKey, groupEvents]: [string, any]) => {
-                        const filteredGroupEvents = filterEvents(groupEvents);
-                        if (filteredGroupEvents.length === 0) return null;
-
-                        return (
-                            <NetworkGroup
-                                key={groupKey}
-                                title={groupKey}
-                                events={filteredGroupEvents}
-                                defaultExpanded={false} // Collapsed by default
-                            />
-                        );
-                    })}
-                    {Object.values(groupedEvents).every((g: any) => filterEvents(g).length === 0) && (
+                    {Object.entries(groupedEvents).map(([groupKey, groupEvents]: [string, any]) => (
+                        <NetworkGroup
+                            key={groupKey}
+                            title={groupKey}
+                            events={groupEvents}
+                            defaultExpanded={false} // Collapsed by default
+                        />
+                    ))}
+                    {data && events.length === 0 && (
                         <div className="text-center text-gray-500 py-4 italic">No matching requests found</div>
                     )}
+                    {data && events.length < data.total && (
+                        <div className="text-center">
+                            <button
+                                onClick={() => setLimit(limit + NETWORK_PAGE_SIZE)}
+                                disabled={isFetching}
+                                className="text-sm text-blue-600 hover:text-blue-800 disabled:text-gray-400"
+                            >
+                                Show more ({events.length} of {data.total})
+                            </button>
+                        </div>
+                    )}
                 </div>
             )}
         </div>
@@ -466,17 +561,24 @@ function NetworkEventItem({ event }: { event: any, index?: number }) {
     );
 }
 
-function TestCaseResultItem({ result }: { result: any }) {
+function TestCaseResultItem({ runId, result, quarantined }: { runId: number, result: any, quarantined: boolean }) {
     const [isExpanded, setIsExpanded] = useState(false);
     const [showReqHeaders, setShowReqHeaders] = useState(false);
     const [showRespHeaders, setShowRespHeaders] = useState(false);
     const [showReqParams, setShowReqParams] = useState(false);
     const [showRespBody, setShowRespBody] = useState(false);
 
-    const hasDetails = result.response_status || result.response_body ||
-        (result.response_headers && Object.keys(result.response_headers).length > 0) ||
-        (result.request_headers && Object.keys(result.request_headers).length > 0) ||
-        (result.request_params && Object.keys(result.request_params).length > 0);
+    const { data: payload } = useQuery({
+        queryKey: ["result-payload", runId, result.id],
+        queryFn: () => getResultPayload(runId, result.id),
+        enabled: isExpanded,
+    });
+    const details = { ...result, ...payload };
+
+    const hasDetails = details.response_status || details.response_body ||
+        (details.response_headers && Object.keys(details.response_headers).length > 0) ||
+        (details.request_headers && Object.keys(details.request_headers).length > 0) ||
+        (details.request_params && Object.keys(details.request_params).length > 0);
 
     return (
         <div className={`border rounded-lg overflow-hidden transition-all duration-200 ${isExpanded ? 'border-primary shadow-md' : 'border-gray-200 hover:border-gray-300 bg-white'}`}>
@@ -490,6 +592,11 @@ function TestCaseResultItem({ result }: { result: any }) {
                             'bg-gray-400'
                         }`} />
                     <span className="font-semibold text-sm text-gray-800 truncate" title={result.test_name}>{result.test_name}</span>
+                    {quarantined && (
+                        <span className="font-bold uppercase text-[10px] tracking-wider px-2 py-0.5 rounded bg-amber-100 text-amber-700 shrink-0" title="Known flaky: does not fail the run">
+                            Quarantined
+                        </span>
+                    )}
                 </div>
                 <div className="flex items-center gap-4 text-sm shrink-0">
                     <span className="text-gray-500 font-mono text-xs">{Math.round(result.duration_ms)}ms</span>
@@ -539,7 +646,7 @@ function TestCaseResultItem({ result }: { result: any }) {
 
                             <div className="grid grid-cols-1 lg:grid-cols-2 gap-4">
                                 {/* Request Headers */}
-                                {result.request_headers && Object.keys(result.request_headers).length > 0 && (
+                                {details.request_headers && Object.keys(details.request_headers).length > 0 && (
                                     <div className="space-y-1">
                                         <div className="flex items-center justify-between w-full mb-1">
                                             <button
@@ -547,13 +654,13 @@ function TestCaseResultItem({ result }: { result: any }) {
                                                 className="flex items-center gap-2 text-[10px] font-bold text-gray-500 hover:text-primary transition-colors uppercase tracking-wider"
                                             >
                                                 {showReqHeaders ? <ChevronDown size={14} /> : <ChevronRight size={14} />}
-                                                <span>Request Headers ({Object.keys(result.request_headers).length})</span>
+                                                <span>Request Headers ({Object.keys(details.request_headers).length})</span>
                                             </button>
-                                            {showReqHeaders && <CopyButton text={JSON.stringify(result.request_headers, null, 2)} />}
+                                            {showReqHeaders && <CopyButton text={JSON.stringify(details.request_headers, null, 2)} />}
                                         </div>
                                         {showReqHeaders && (
                                             <pre className="text-[10px] bg-gray-50 p-2.5 rounded-lg border border-gray-200 overflow-x-auto font-mono text-gray-700 shadow-inner max-h-48">
-                                                {JSON.stringify(result.request_headers, null, 2)}
+                                                {JSON.stringify(details.request_headers, null, 2)}
                                             </pre>
                                         )}
                                     </div>
@@ -581,7 +688,7 @@ function TestCaseResultItem({ result }: { result: any }) {
                                 )}
 
                                 {/* Response Headers */}
-                                {result.response_headers && Object.keys(result.response_headers).length > 0 && (
+                                {details.response_headers && Object.keys(details.response_headers).length > 0 && (
                                     <div className="space-y-1">
                                         <div className="flex items-center justify-between w-full mb-1">
                                             <button
@@ -589,13 +696,13 @@ function TestCaseResultItem({ result }: { result: any }) {
                                                 className="flex items-center gap-2 text-[10px] font-bold text-gray-500 hover:text-primary transition-colors uppercase tracking-wider"
                                             >
                                                 {showRespHeaders ? <ChevronDown size={14} /> : <ChevronRight size={14} />}
-                                                <span>Response Headers ({Object.keys(result.response_headers).length})</span>
+                                                <span>Response Headers ({Object.keys(details.response_headers).length})</span>
                                             </button>
-                                            {showRespHeaders && <CopyButton text={JSON.stringify(result.response_headers, null, 2)} />}
+                                            {showRespHeaders && <CopyButton text={JSON.stringify(details.response_headers, null, 2)} />}
                                         </div>
                                         {showRespHeaders && (
                                             <pre className="text-[10px] bg-gray-50 p-2.5 rounded-lg border border-gray-200 overflow-x-auto font-mono text-gray-700 shadow-inner max-h-48">
-                                                {JSON.stringify(result.response_headers, null, 2)}
+                                                {JSON.stringify(details.response_headers, null, 2)}
                                             </pre>
                                         )}
                                     </div>
@@ -603,7 +710,7 @@ function TestCaseResultItem({ result }: { result: any }) {
                             </div>
 
                             {/* Response Body */}
-                            {result.response_body && (
+                            {details.response_body && (
                                 <div className="space-y-1">
                                     <div className="flex items-center justify-between w-full mb-1">
                                         <button
@@ -615,21 +722,26 @@ function TestCaseResultItem({ result }: { result: any }) {
                                         </button>
                                         {showRespBody && <CopyButton text={(() => {
                                             try {
-                                                const parsed = JSON.parse(result.response_body);
+                                                const parsed = JSON.parse(details.response_body);
                                                 return JSON.stringify(parsed, null, 2);
                                             } catch (e) {
-                                                return result.response_body;
+                                                return details.response_body;
                                             }
                                         })()} />}
                                     </div>
+                                    {showRespBody && details.response_body_truncated && (
+                                        <p className="text-[10px] text-amber-600">
+                                            Partial body: only the part read before the assertions were decided was kept.
+                                        </p>
+                                    )}
                                     {showRespBody && (
                                         <pre className="text-xs bg-gray-900 text-gray-100 p-4 rounded-lg border border-gray-800 overflow-x-auto font-mono shadow-lg max-h-96 custom-scrollbar">
                                             {(() => {
                                                 try {
-                                                    const parsed = JSON.parse(result.response_body);
+                                                    const parsed = JSON.parse(details.response_body);
                                                     return JSON.stringify(parsed, null, 2);
                                                 } catch (e) {
-                                                    return result.response_body;
+                                                    return details.response_body;
                                                 }
                                             })()}
                                         </pre>